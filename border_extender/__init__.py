@@ -1,18 +1,18 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-import pymysql
 import config
 
-# 因MySQLDB不支持Python3，使用pymysql扩展库代替MySQLDB库
-pymysql.install_as_MySQLdb()
-
 # 初始化web应用
 # app = Flask(__name__, instance_relative_config=True)
 app = Flask(__name__, instance_relative_config=True,static_folder='static',static_url_path='/static')
 app.config['DEBUG'] = config.DEBUG
 
-# 设定数据库链接
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql://{}:{}@{}/flask_demo'.format(config.username, config.password,
+# 大文件上传直接落盘，不占用 worker 内存
+from border_extender.upload_guard import SpooledUploadRequest
+app.request_class = SpooledUploadRequest
+
+# 设定数据库链接（因MySQLDB不支持Python3，使用pymysql驱动；由SQLAlchemy在首次连接时导入）
+app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://{}:{}@{}/flask_demo'.format(config.username, config.password,
                                                                              config.db_address)
 
 # 初始化DB操作对象
@@ -23,3 +23,21 @@ from border_extender import views
 
 # 加载配置
 app.config.from_object('config')
+
+# 以下只在 web 进程中执行：process_pool 以 spawn 启动的渲染子进程也会导入本包，
+# 不需要预加载字体，也不能各自启动一个清理线程
+import multiprocessing
+import os
+
+if multiprocessing.parent_process() is None:
+    # 预加载字体（字体缺失时只记录日志）
+    from border_extender.add_bd import preload_fonts
+    preload_fonts(app.config.get('FONT_PRELOAD_LENGTHS', (2400,)))
+
+
+@app.before_first_request
+def start_storage_sweeper():
+    # temp_images 后台清理（TTL + 总大小上限）；在第一个请求时启动，
+    # 使用 --preload 的 gunicorn 等 fork 模型下线程也运行在真正处理请求的 worker 中
+    from border_extender.storage import get_storage
+    get_storage(app.config, os.path.join(app.static_folder, views.temp_image_dir)).start()
@@ -1,12 +1,8 @@
-from PIL import Image,ImageDraw,ImageFont,ImageOps
-from PIL import ImageEnhance
-from PIL.ExifTags import TAGS
-import piexif
-import numpy as np
+from PIL import Image, ImageOps
+from dataclasses import dataclass
+import importlib
 import logging
 
-from .color_extract import extract_main_colors
-
 logging.basicConfig(
     format='[%(asctime)s] %(message)s',
     level=logging.INFO,
@@ -23,62 +19,108 @@ infor_area=int(0.12*tgt_size)
 font_size=int(infor_area*0.2)
 cc_name='Credit Name'
 
+@dataclass(frozen=True)
+class LayoutMetrics:
+    """Per-request layout sizes; passed to format handlers instead of module globals."""
+    tgt_size: int
+    border_size: int
+    border_color: str
+    exterior: int
+    infor_area: int
+    font_size: int
+
+
+def compute_layout_metrics(max_length, add_black_border=True) -> LayoutMetrics:
+    tgt=max_length
+    infor=int(0.12*tgt)
+    return LayoutMetrics(
+        tgt_size=tgt,
+        border_size=int(0.01*tgt) if add_black_border else int(0.0001*tgt),
+        border_color='black',
+        exterior=int(0.03*tgt),
+        infor_area=infor,
+        font_size=int(infor*0.2),
+    )
+
+
+def current_layout_metrics() -> LayoutMetrics:
+    """Snapshot of the legacy module-level sizes (set by update_tgt_size)."""
+    return LayoutMetrics(tgt_size, border_size, border_color, exterior, infor_area, font_size)
+
+
 def update_tgt_size(max_length,add_black_border=True):
+    """Legacy global setter; request handling uses compute_layout_metrics instead."""
     global border_size,border_color,exterior,infor_area,font_size,tgt_size
-    tgt_size=max_length
-    border_size=int(0.01*tgt_size) if add_black_border else int(0.0001*tgt_size)
-    border_color='black'
-    exterior=int(0.03*tgt_size)
-    infor_area=int(0.12*tgt_size)
-    font_size=int(infor_area*0.2)
+    m=compute_layout_metrics(max_length,add_black_border)
+    tgt_size=m.tgt_size
+    border_size=m.border_size
+    border_color=m.border_color
+    exterior=m.exterior
+    infor_area=m.infor_area
+    font_size=m.font_size
 
 
-def rotate_image_90_no_crop(image_data,reverse=False):
-    # 打开图像
-    image=image_data
-    width, height = image.size
-
-    # 创建一个新的背景图像，尺寸为原图像的对角线长度
-    new_size = int((width ** 2 + height ** 2) ** 0.5)
-    new_image = Image.new("RGB", (new_size, new_size), (0, 0,0))
+def preload_fonts(max_lengths=(2400,)):
+    """Load the text fonts for the common output sizes at worker start (no font I/O on requests)."""
+    from .effects.asset_cache import preload_fonts as _preload
+    sizes=set()
+    for length in max_lengths:
+        fs=compute_layout_metrics(length).font_size
+        sizes.update((fs,int(fs*0.9),int(fs*0.8)))
+    return _preload([using_font],sorted(sizes))
 
-    # 将原图像粘贴到背景图像的中心
-    new_image.paste(image, ((new_size - width) // 2, (new_size - height) // 2))
 
-    # 旋转图像90度
-    if not reverse:
-        rotated_image = new_image.rotate(90, expand=True)
-    else:
-        rotated_image = new_image.rotate(270, expand=True)
+def rotate_image_90_no_crop(image_data,reverse=False):
+    """
+    逆时针旋转 90 度（reverse=True 时顺时针），输出 RGB。
+    直接用 transpose 交换行列：不再分配对角线尺寸的画布、旋转后再 getbbox 裁剪，
+    结果与原实现一致（原实现还会误裁掉照片边缘的纯黑行列）。
+    """
+    image=image_data
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    method = Image.Transpose.ROTATE_270 if reverse else Image.Transpose.ROTATE_90
+    return image.transpose(method)
 
-    # 裁剪掉多余的透明部分
-    bbox = rotated_image.getbbox()
-    cropped_image = rotated_image.crop(bbox)
 
-    return cropped_image
+def apply_exif_orientation(image_data):
+    """按 EXIF Orientation 摆正图像；无需旋转时原样返回（不复制）。"""
+    orientation = image_data.getexif().get(0x0112, 1)
+    if orientation in (None, 1):
+        return image_data
+    return ImageOps.exif_transpose(image_data)
 
 
 # -----------------------------
 # Delegation to effects package
 # -----------------------------
-from .effects.filters import (
-    apply_filter as _effects_apply_filter,
-    AVAILABLE_FILTER_KEYS as AVAILABLE_FILTER_KEYS,
-    FILTER_HANDLERS as FILTER_HANDLERS,
-)
-from .effects.formats import (
-    process_one_image as _effects_process_one_image,
-    AVAILABLE_FORMAT_KEYS as AVAILABLE_FORMAT_KEYS,
-    FORMAT_HANDLERS as FORMAT_HANDLERS,
-)
+# 滤镜/格式注册表在第一次使用时才导入（numpy、LUT 引擎等不进入冷启动路径）
+_LAZY_REGISTRY = {
+    'AVAILABLE_FILTER_KEYS': '.effects.filters',
+    'FILTER_HANDLERS': '.effects.filters',
+    'AVAILABLE_FORMAT_KEYS': '.effects.formats',
+    'FORMAT_HANDLERS': '.effects.formats',
+}
+
+
+def __getattr__(name):
+    module = _LAZY_REGISTRY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __package__), name)
+    globals()[name] = value
+    return value
+
 
 def apply_filter(img_input, filter_key: str, strength: float = 0.5):
     """Delegate to effects.filters.apply_filter"""
+    from .effects.filters import apply_filter as _effects_apply_filter
     return _effects_apply_filter(img_input, filter_key, strength)
 
 
 def process_one_image(img_input, text, logo_file, *args, format='basic3', suppli_info='', max_length=2400, add_black_border=True, square=False, film_file='', film_name=''):
     """Delegate to effects.formats.process_one_image"""
+    from .effects.formats import process_one_image as _effects_process_one_image
     film_logo_file = film_file or film_name
     return _effects_process_one_image(
         img_input, text, logo_file, *args,
@@ -1,34 +1,154 @@
+from collections import OrderedDict
+import hashlib
+import threading
+
 from PIL import Image
 import numpy as np
-from sklearn.cluster import KMeans
-
-
-def extract_main_colors(image, num_colors=3):
-    # 打开图像并转换为RGB模式
-
-    # 缩小图像尺寸
-    image = image.resize((256, 256))
-
-    # 将图像转换为numpy数组
-    image_np = np.array(image)
 
-    # 将图像数据重塑为二维数组
-    pixels = image_np.reshape(-1, 3)
-
-    # 使用KMeans聚类算法提取主要颜色+1 用于筛除不那么重要的主要颜色
-    kmeans = KMeans(n_clusters=num_colors+1, max_iter=10000000, n_init=1)
+# 主色提取后端：
+# - quantize:  Pillow C 实现的 octree 量化到 QUANTIZE_COLORS 色，再在调色板上做加权 k-means，默认
+# - histogram: 每通道 HIST_BITS 位直方图分箱，再在非空箱的均值上做加权 k-means
+# - kmeans:    原 sklearn KMeans 实现，作为参考
+# 两个快速后端都只在几十到几千个加权代表色上迭代，而不是 65536 个像素
+PALETTE_BACKENDS = ('quantize', 'histogram', 'kmeans')
+DEFAULT_PALETTE_BACKEND = 'quantize'
+
+QUANTIZE_COLORS = 64
+HIST_BITS = 4
+REFINE_ITERS = 12
+SEED_MIN_DIST2 = 3 * 16 ** 2
+
+# 主色结果缓存：键为 256x256 缩略图像素的 blake2b 摘要 + num_colors + 后端。
+# 同一张图依次渲染 basic1/basic2/basic3 时直接命中，不再重复聚类。
+PALETTE_CACHE_MAX = 256
+KMEANS_SEED = 0
+_PALETTE_CACHE: OrderedDict = OrderedDict()
+_PALETTE_LOCK = threading.Lock()
+
+
+def set_default_palette_backend(backend: str) -> None:
+    global DEFAULT_PALETTE_BACKEND
+    if backend not in PALETTE_BACKENDS:
+        raise ValueError(f'unknown palette backend: {backend}')
+    DEFAULT_PALETTE_BACKEND = backend
+
+
+def _pad_centers(centers: np.ndarray, k: int) -> np.ndarray:
+    # 图像颜色数少于 k 时重复最后一个颜色，保证输出行数不变
+    if len(centers) >= k:
+        return centers[:k]
+    if len(centers) == 0:
+        return np.zeros((k, 3), dtype=np.float64)
+    return np.concatenate([centers, np.repeat(centers[-1:], k - len(centers), axis=0)])
+
+
+def _weighted_kmeans(points: np.ndarray, weights: np.ndarray, k: int) -> np.ndarray:
+    """在少量加权代表色上做 Lloyd 迭代；初始中心按权重从大到小选取并跳过过近的颜色。"""
+    if len(points) <= k:
+        return _pad_centers(points[np.argsort(-weights)], k)
+
+    order = np.argsort(-weights)
+    chosen = [order[0]]
+    for i in order[1:]:
+        if len(chosen) == k:
+            break
+        if np.min(((points[chosen] - points[i]) ** 2).sum(axis=1)) > SEED_MIN_DIST2:
+            chosen.append(i)
+    for i in order:
+        if len(chosen) == k:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    centers = points[chosen].astype(np.float64)
+
+    for _ in range(REFINE_ITERS):
+        d2 = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        label = d2.argmin(axis=1)
+        w = np.bincount(label, weights=weights, minlength=k)
+        new = np.stack([np.bincount(label, weights=weights * points[:, c], minlength=k) for c in range(3)], axis=1)
+        keep = w > 0
+        new[keep] /= w[keep, None]
+        new[~keep] = centers[~keep]
+        done = np.allclose(new, centers, atol=0.5)
+        centers = new
+        if done:
+            break
+    return centers
+
+
+def _centers_quantize(image: Image.Image, k: int) -> np.ndarray:
+    q = image.quantize(colors=QUANTIZE_COLORS, method=Image.Quantize.FASTOCTREE)
+    colors = q.getcolors(QUANTIZE_COLORS)
+    palette = np.array(q.getpalette()[:3 * QUANTIZE_COLORS], dtype=np.float64).reshape(-1, 3)
+    weights = np.array([c for c, _ in colors], dtype=np.float64)
+    points = palette[[i for _, i in colors]]
+    return _weighted_kmeans(points, weights, k)
+
+
+def _centers_histogram(pixels: np.ndarray, k: int) -> np.ndarray:
+    shift = 8 - HIST_BITS
+    q = (pixels >> shift).astype(np.int64)
+    idx = (q[:, 0] << (2 * HIST_BITS)) | (q[:, 1] << HIST_BITS) | q[:, 2]
+    nbins = 1 << (3 * HIST_BITS)
+    counts = np.bincount(idx, minlength=nbins)
+    sums = np.stack([np.bincount(idx, weights=pixels[:, c], minlength=nbins) for c in range(3)], axis=1)
+    nz = counts > 0
+    weights = counts[nz].astype(np.float64)
+    return _weighted_kmeans(sums[nz] / weights[:, None], weights, k)
+
+
+def _centers_kmeans(pixels: np.ndarray, k: int) -> np.ndarray:
+    from sklearn.cluster import KMeans
+
+    kmeans = KMeans(n_clusters=k, max_iter=10000000, n_init=1, random_state=KMEANS_SEED)
     kmeans.fit(pixels)
-
-    # 获取聚类中心（主要颜色）
-    main_colors = kmeans.cluster_centers_.astype(int)
-    sort_ind=main_colors.sum(axis=1).argsort()[::-1]
-    # np.argsort
-    main_colors=main_colors[sort_ind]
-    # print(main_colors[:-1])
-    
-
-
-    return main_colors[:-1]
+    return kmeans.cluster_centers_
+
+
+def extract_main_colors(image, num_colors=3, backend=None):
+    name = backend or DEFAULT_PALETTE_BACKEND
+    if name not in PALETTE_BACKENDS:
+        raise ValueError(f'unknown palette backend: {name}')
+
+    # 缩小图像尺寸（reducing_gap 先做整数倍 box 缩小，大图上快约 3 倍；缓存命中时这是唯一的开销）
+    image = image.resize((256, 256), reducing_gap=2.0)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    key = (hashlib.blake2b(image.tobytes(), digest_size=16).digest(), num_colors, name)
+    with _PALETTE_LOCK:
+        cached = _PALETTE_CACHE.get(key)
+        if cached is not None:
+            _PALETTE_CACHE.move_to_end(key)
+            return cached.copy()
+
+    # 提取主要颜色+1 用于筛除不那么重要的主要颜色
+    k = num_colors + 1
+    if name == 'quantize':
+        centers = _centers_quantize(image, k)
+    else:
+        pixels = np.asarray(image).reshape(-1, 3)
+        if name == 'histogram':
+            centers = _centers_histogram(pixels, k)
+        else:
+            centers = _centers_kmeans(pixels, k)
+
+    # 按亮度（RGB 之和）降序排列，丢弃最暗的一个
+    main_colors = np.asarray(centers).astype(int)
+    sort_ind = main_colors.sum(axis=1).argsort()[::-1]
+    main_colors = main_colors[sort_ind][:-1]
+
+    with _PALETTE_LOCK:
+        _PALETTE_CACHE[key] = main_colors
+        _PALETTE_CACHE.move_to_end(key)
+        while len(_PALETTE_CACHE) > PALETTE_CACHE_MAX:
+            _PALETTE_CACHE.popitem(last=False)
+    return main_colors.copy()
+
+
+def clear_palette_cache() -> None:
+    with _PALETTE_LOCK:
+        _PALETTE_CACHE.clear()
 
 
 def plot_colors(colors):
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from functools import lru_cache
+import logging
+import os
+import threading
+
+from PIL import Image, ImageFont
+
+__all__ = [
+    'load_logo',
+    'logo_size',
+    'path_exists',
+    'get_font',
+    'preload_fonts',
+    'clear_asset_caches',
+]
+
+# Decoded, converted and resized logos keyed by (path, mode, size). Entries are
+# shared between requests: callers may paste them but must not modify them.
+LOGO_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# FreeType fonts keyed by (path, size). Faces are opened from the file path so
+# FreeType maps the file and every size shares the page cache; building them
+# from a bytes object would make Pillow copy the whole file into each face (CJK
+# fonts are 10-20 MB). Each face is charged FONT_FACE_BYTES (measured ~40 KB
+# of face and glyph state after rendering a caption), so the number of sizes
+# per font -- which follows the client's max_length -- stays bounded.
+FONT_FACE_BYTES = 64 * 1024
+FONT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+class _ByteLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, nbytes: int) -> None:
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return
+            self._items[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and self._items:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_LOGO_CACHE = _ByteLRU(LOGO_CACHE_MAX_BYTES)
+_FONT_CACHE = _ByteLRU(FONT_CACHE_MAX_BYTES)
+
+
+def _image_nbytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+@lru_cache(maxsize=1024)
+def path_exists(path: str) -> bool:
+    """Memoized os.path.exists for bundled, read-only assets (logos, films, fonts)."""
+    return bool(path) and os.path.exists(path)
+
+
+@lru_cache(maxsize=512)
+def logo_size(path: str) -> tuple[int, int]:
+    """(width, height) from the image header, without decoding pixels."""
+    with Image.open(path) as probe:
+        return probe.size
+
+
+def load_logo(path: str, mode: str = 'RGB', size: tuple[int, int] | None = None) -> Image.Image:
+    """Return ``Image.open(path).convert(mode).resize(size)`` from a shared LRU cache."""
+    key = (path, mode, tuple(size) if size is not None else None)
+    cached = _LOGO_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    with Image.open(path) as src:
+        img = src.convert(mode)
+    if size is not None and img.size != tuple(size):
+        img = img.resize(tuple(size))
+    _LOGO_CACHE.put(key, img, _image_nbytes(img))
+    return img
+
+
+def get_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Shared ``ImageFont.truetype(path, size)``; each (path, size) face is built once."""
+    key = (path, int(size))
+    font = _FONT_CACHE.get(key)
+    if font is not None:
+        return font
+    font = ImageFont.truetype(path, int(size))
+    _FONT_CACHE.put(key, font, FONT_FACE_BYTES)
+    return font
+
+
+def preload_fonts(paths, sizes) -> int:
+    """Warm the font registry at worker start; missing fonts are logged, not raised."""
+    loaded = 0
+    for path in paths:
+        for size in sizes:
+            try:
+                get_font(path, size)
+                loaded += 1
+            except OSError as e:
+                logging.warning(f'preload_fonts: failed to load {path} at {size}px: {e}')
+                break
+    return loaded
+
+
+def clear_asset_caches() -> None:
+    _LOGO_CACHE.clear()
+    _FONT_CACHE.clear()
+    path_exists.cache_clear()
+    logo_size.cache_clear()
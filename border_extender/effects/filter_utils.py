@@ -1,12 +1,29 @@
-from PIL import Image
+from PIL import Image, ImageFilter
 from pathlib import Path
+from collections import OrderedDict
+import threading
 import numpy as np
 import time
-from .lut_utils import load_cube_lut, apply_cube_lut_float_rgb
+from .lut_utils import load_cube_lut, apply_cube_lut_float_rgb, bake_cube_lut, DEFAULT_INTERPOLATION
+from .lut_utils import apply_cube_lut_u8, LUT_CHUNK_PIXELS
 
 
 _PYLUT_LUT_CACHE = {}
 
+# Baked LUTs for procedural filters, keyed by (filter key, quantized strength).
+# 52 nodes per axis land exactly on uint8 levels (255 / 51 == 5).
+BAKED_LUT_SIZE = 52
+BAKED_STRENGTH_STEP = 0.05
+BAKED_LUT_CACHE_MAX = 24
+_BAKED_LUT_CACHE: 'OrderedDict[tuple, object]' = OrderedDict()
+_BAKED_LUT_LOCK = threading.Lock()
+
+# LUT backends: 'pillow' runs ImageFilter.Color3DLUT (C, uint8 in/out, trilinear);
+# 'numpy' is the float path in lut_utils and the fallback whenever Pillow cannot
+# express the request (non-unit domain, size outside 2..65, tetrahedral).
+LUT_BACKENDS = ('pillow', 'numpy')
+DEFAULT_LUT_BACKEND = 'pillow'
+
 
 def clamp01(x: float) -> float:
     return 0.0 if x < 0 else 1.0 if x > 1 else x
@@ -164,17 +181,60 @@ def apply_vignette(arr_t: np.ndarray, s: float, inner: float = 0.2, outer: float
     return np.clip(arr_t * v_mult[..., None], 0.0, 1.0)
 
 
-def apply_lut(img: Image.Image, s: float, cube_rel_path: str) -> Image.Image:
-    base = img.convert('RGB')
-    arr = np.array(base, dtype=np.float32) / 255.0
-    arr = np.clip(arr, 0.0, 1.0)
+def _resolve_lut_path(cube_rel_path: str) -> Path:
     this_file = Path(__file__).resolve()
     repo_root = this_file.parents[2]
-    lut_path = repo_root / cube_rel_path
-    lut = load_cube_lut(lut_path)
-    arr_lut = apply_cube_lut_float_rgb(arr, lut)
-    out = np.clip(arr * (1.0 - s) + arr_lut * s, 0.0, 1.0)
-    out_u8 = (out * 255.0 + 0.5).astype('uint8')
+    return repo_root / cube_rel_path
+
+
+def set_default_lut_backend(backend: str) -> None:
+    global DEFAULT_LUT_BACKEND
+    if backend not in LUT_BACKENDS:
+        raise ValueError(f'unknown LUT backend: {backend}')
+    DEFAULT_LUT_BACKEND = backend
+
+
+def _pillow_supports(lut) -> bool:
+    if not hasattr(ImageFilter, 'Color3DLUT'):
+        return False
+    if not (2 <= lut.size <= 65):
+        return False
+    return bool(np.all(lut.domain_min == 0.0) and np.all(lut.domain_max == 1.0))
+
+
+def _resolve_backend(lut, backend, interpolation=None) -> str:
+    name = backend or DEFAULT_LUT_BACKEND
+    if name not in LUT_BACKENDS:
+        raise ValueError(f'unknown LUT backend: {name}')
+    if name == 'pillow':
+        if not _pillow_supports(lut):
+            return 'numpy'
+        if (interpolation or DEFAULT_INTERPOLATION) != 'trilinear':
+            return 'numpy'
+    return name
+
+
+def lut_image(img: Image.Image, lut, backend: str = None, interpolation: str = None) -> Image.Image:
+    """Map an RGB image through ``lut`` at full strength with the selected backend."""
+    base = img.convert('RGB')
+    if _resolve_backend(lut, backend, interpolation) == 'pillow':
+        # Color3DLUT takes the table in the same R-fastest order as .cube / CubeLUT.table.
+        return base.filter(ImageFilter.Color3DLUT(lut.size, lut.table, channels=3))
+    return Image.fromarray(apply_cube_lut_u8(np.asarray(base), lut, 1.0, interpolation), mode='RGB')
+
+
+def apply_lut(img: Image.Image, s: float, cube_rel_path: str, backend: str = None, interpolation: str = None) -> Image.Image:
+    lut = load_cube_lut(_resolve_lut_path(cube_rel_path))
+    base = img.convert('RGB')
+    if _resolve_backend(lut, backend, interpolation) == 'pillow':
+        if s <= 0:
+            return base
+        mapped = lut_image(base, lut, 'pillow')
+        return mapped if s >= 1 else Image.blend(base, mapped, s)
+
+    # Streams fixed-size pixel chunks through the LUT into a uint8 output,
+    # so no frame-sized float temporaries are allocated.
+    out_u8 = apply_cube_lut_u8(np.asarray(base), lut, s, interpolation)
     return Image.fromarray(out_u8, mode='RGB')
 
 def apply_lut_bug(img: Image.Image, s: float, cube_rel_path: str) -> Image.Image:
@@ -198,39 +258,123 @@ def apply_lut_bug(img: Image.Image, s: float, cube_rel_path: str) -> Image.Image
     print(f"[apply_lut] blend/convert done in {t4 - t3:.3f}s (total {t4 - t0:.3f}s)")
     return Image.fromarray(out_u8, mode='RGB')
 
-def apply_pylut(img: Image.Image, s: float, cube_rel_path: str):
-    import pylut
+def pylut_map_float_rgb(arr: np.ndarray, lut, chunk_pixels: int = LUT_CHUNK_PIXELS) -> np.ndarray:
+    """
+    Vectorized pylut ``LUT.ColorFromColor``: clamp to [0,1], ignore DOMAIN_*,
+    lower = floor, upper = min(lower + 1, n - 1), weight = 1 - (upper - point),
+    lerp R, then B, then G in float64 without clamping the result.
+    """
+    n = lut.size
+    t = np.asarray(lut.table, dtype=np.float64).reshape(-1, 3)
+    flat = arr.reshape(-1, 3)
+    out = np.empty(flat.shape, dtype=np.float64)
+    step = max(1, int(chunk_pixels)) if chunk_pixels else max(1, flat.shape[0])
+    for start in range(0, flat.shape[0], step):
+        p = np.clip(flat[start:start + step].astype(np.float64), 0.0, 1.0) * (n - 1)
+        lo = np.floor(p).astype(np.intp)
+        hi = np.minimum(lo + 1, n - 1)
+        w = 1.0 - (hi - p)
+        wr, wg, wb = w[:, 0:1], w[:, 1:2], w[:, 2:3]
+
+        def c(r, g, b):
+            # CubeLUT.table is [B][G][R]; pylut's lattice is [R][G][B].
+            return t[(b * n + g) * n + r]
+
+        r0, g0, b0 = lo[:, 0], lo[:, 1], lo[:, 2]
+        r1, g1, b1 = hi[:, 0], hi[:, 1], hi[:, 2]
+        c00 = c(r0, g0, b0) + (c(r1, g0, b0) - c(r0, g0, b0)) * wr
+        c10 = c(r0, g0, b1) + (c(r1, g0, b1) - c(r0, g0, b1)) * wr
+        c01 = c(r0, g1, b0) + (c(r1, g1, b0) - c(r0, g1, b0)) * wr
+        c11 = c(r0, g1, b1) + (c(r1, g1, b1) - c(r0, g1, b1)) * wr
+        c0 = c00 + (c10 - c00) * wb
+        c1 = c01 + (c11 - c01) * wb
+        out[start:start + step] = c0 + (c1 - c0) * wg
+    return out.reshape(arr.shape)
+
 
+def apply_pylut(img: Image.Image, s: float, cube_rel_path: str):
+    """pylut-compatible LUT application at numpy speed (see ``pylut_map_float_rgb``)."""
     base = img.convert('RGB')
     arr = np.array(base, dtype=np.float32) / 255.0
     arr = np.clip(arr, 0.0, 1.0)
-    this_file = Path(__file__).resolve()
-    repo_root = this_file.parents[2]
-    lut_path = repo_root / cube_rel_path
-
-    key = str(lut_path)
-    lut = _PYLUT_LUT_CACHE.get(key)
-    if lut is None:
-        lut = pylut.LUT.FromCubeFile(key)
-        _PYLUT_LUT_CACHE[key] = lut
-
-    h, w, _ = arr.shape
-    flat = arr.reshape(-1, 3)
-    out_flat = np.empty((flat.shape[0], 3), dtype=np.float32)
-    color_from_arr = pylut.Color.FromFloatArray
-    color_from_color = lut.ColorFromColor
-    for i, rgb in enumerate(flat):
-        c = color_from_arr(rgb)
-        c2 = color_from_color(c)
-        out_flat[i] = c2.ToFloatArray()
-    arr_lut = out_flat.reshape(h, w, 3)
+    lut = load_cube_lut(_resolve_lut_path(cube_rel_path))
+    arr_lut = pylut_map_float_rgb(arr, lut)
     out = np.clip(arr * (1.0 - s) + arr_lut * s, 0.0, 1.0)
     out_u8 = (out * 255.0 + 0.5).astype('uint8')
     return Image.fromarray(out_u8, mode='RGB')
 
-def make_lut_filter(cube_filename: str):
+
+def pylut_parity(img: Image.Image, cube_rel_path: str, max_pixels: int = 4096) -> float:
+    """
+    Max abs difference between ``pylut_map_float_rgb`` and pylut itself on a pixel
+    sample of ``img``. This is the only place pylut is still imported.
+    """
+    import pylut
+
+    if not hasattr(pylut, 'LUT'):
+        raise ImportError('pylut is installed but does not expose LUT on this Python version')
+
+    key = str(_resolve_lut_path(cube_rel_path))
+    ref = _PYLUT_LUT_CACHE.get(key)
+    if ref is None:
+        ref = pylut.LUT.FromCubeFile(key)
+        _PYLUT_LUT_CACHE[key] = ref
+
+    flat = (np.asarray(img.convert('RGB'), dtype=np.float32) / 255.0).reshape(-1, 3)
+    if flat.shape[0] > max_pixels:
+        idx = np.random.default_rng(0).choice(flat.shape[0], size=max_pixels, replace=False)
+        flat = flat[idx]
+    expected = np.array([ref.ColorFromColor(pylut.Color.FromFloatArray(rgb)).ToFloatArray() for rgb in flat])
+    got = pylut_map_float_rgb(flat.reshape(-1, 1, 3), load_cube_lut(key)).reshape(-1, 3)
+    return float(np.abs(got - expected).max())
+
+def quantize_strength(strength: float, step: float = BAKED_STRENGTH_STEP) -> float:
+    s = clamp01(strength)
+    return round(round(s / step) * step, 6)
+
+
+def get_baked_lut(key: str, color_fn, strength: float):
+    """
+    Return the CubeLUT sampled from ``color_fn(img, s)`` at the quantized strength.
+    ``color_fn`` must be a pure per-pixel transform returning an HxWx3 float array.
+    """
+    qs = quantize_strength(strength)
+    cache_key = (key, qs)
+    with _BAKED_LUT_LOCK:
+        lut = _BAKED_LUT_CACHE.get(cache_key)
+        if lut is not None:
+            _BAKED_LUT_CACHE.move_to_end(cache_key)
+            return lut
+
+    lut = bake_cube_lut(lambda u8: color_fn(Image.fromarray(u8, mode='RGB'), qs), BAKED_LUT_SIZE)
+
+    with _BAKED_LUT_LOCK:
+        _BAKED_LUT_CACHE[cache_key] = lut
+        _BAKED_LUT_CACHE.move_to_end(cache_key)
+        while len(_BAKED_LUT_CACHE) > BAKED_LUT_CACHE_MAX:
+            _BAKED_LUT_CACHE.popitem(last=False)
+    return lut
+
+
+def apply_baked_color(img: Image.Image, key: str, color_fn, strength: float, backend: str = None) -> np.ndarray:
+    """
+    Run the color part of a procedural filter through its baked LUT, returning float RGB.
+    Baking only pays off with Color3DLUT: on 2400x1600 the numpy LUT path measured
+    560-700 ms against 470-900 ms for the direct transform, so without Pillow the
+    exact ``color_fn`` is used instead.
+    """
+    base = img.convert('RGB')
+    if (backend or DEFAULT_LUT_BACKEND) != 'pillow' or not hasattr(ImageFilter, 'Color3DLUT'):
+        return color_fn(base, strength)
+    lut = get_baked_lut(key, color_fn, strength)
+    return image_to_float_rgb(lut_image(base, lut, 'pillow'))
+
+
+def make_lut_filter(cube_filename: str, backend: str = None, interpolation: str = None):
     def _f(img: Image.Image, strength: float) -> Image.Image:
-        return apply_lut(img, clamp01(strength), f'cubes/{cube_filename}')
+        return apply_lut(img, clamp01(strength), f'cubes/{cube_filename}', backend=backend, interpolation=interpolation)
+    # strength only enters the final base/mapped blend, so any strength is a blend of the s=0 and s=1 outputs
+    _f.linear_strength = True
     return _f
 
 
@@ -24,6 +24,7 @@ from .filter_utils import blue_dominance_mask
 from .filter_utils import green_dominance_mask
 from .filter_utils import red_dominance_mask
 from .filter_utils import yellow_dominance_mask, make_lut_filter,apply_lut
+from .filter_utils import apply_baked_color as _apply_baked_color
 
 __all__ = [
     'apply_filter',
@@ -111,10 +112,7 @@ def _filter_film(img: Image.Image, strength: float) -> Image.Image:
     return out
 
 
-def _filter_film_kodak_5219(img: Image.Image, strength: float) -> Image.Image:
-    s = _clamp01(strength)
-    if s <= 0:
-        return img
+def _film_kodak_5219_color(img: Image.Image, s: float) -> np.ndarray:
     color_f = _scale_factor(0.80, s)
     base = ImageEnhance.Color(img).enhance(color_f)
     arr = image_to_float_rgb(base)
@@ -159,15 +157,19 @@ def _filter_film_kodak_5219(img: Image.Image, strength: float) -> Image.Image:
         [0.000, -0.015 * s, 1.0],
     ], dtype=np.float32)
     arr_t = apply_matrix_3x3(arr_t, m)
-    arr_t = np.clip(arr_t, 0.0, 1.0)
-    arr_t = _apply_film_grain(arr_t, s, mid=0.5, sigma_base=0.015, sigma_slope=0.012, cw=[0.96, 1.00, 1.08])
-    return float_rgb_to_image(arr_t)
+    return np.clip(arr_t, 0.0, 1.0)
 
 
-def _filter_film_kodak_e100(img: Image.Image, strength: float) -> Image.Image:
+def _filter_film_kodak_5219(img: Image.Image, strength: float) -> Image.Image:
     s = _clamp01(strength)
     if s <= 0:
         return img
+    arr_t = _apply_baked_color(img, 'film_kodak_5219', _film_kodak_5219_color, s)
+    arr_t = _apply_film_grain(arr_t, s, mid=0.5, sigma_base=0.015, sigma_slope=0.012, cw=[0.96, 1.00, 1.08])
+    return float_rgb_to_image(arr_t)
+
+
+def _film_kodak_e100_color(img: Image.Image, s: float) -> np.ndarray:
     color_f = _scale_factor(0.95, s)
     base = ImageEnhance.Color(img).enhance(color_f)
     arr = image_to_float_rgb(base)
@@ -198,7 +200,14 @@ def _filter_film_kodak_e100(img: Image.Image, strength: float) -> Image.Image:
     c_boost = 0.20 * s
     arr_t = np.clip((arr_t - 0.5) * (1.0 + c_boost) + 0.5, 0.0, 1.0)
     arr_t = apply_scalar_gain_mask(arr_t, (1.0 + 0.10 * s * hl3))
-    arr_t = apply_scalar_gain_mask(arr_t, (1.0 - 0.10 * s * sh3))
+    return apply_scalar_gain_mask(arr_t, (1.0 - 0.10 * s * sh3))
+
+
+def _filter_film_kodak_e100(img: Image.Image, strength: float) -> Image.Image:
+    s = _clamp01(strength)
+    if s <= 0:
+        return img
+    arr_t = _apply_baked_color(img, 'film_kodak_e100', _film_kodak_e100_color, s)
     arr_t = _apply_film_grain(arr_t, s, mid=0.5, sigma_base=0.008, sigma_slope=0.015, cw=[0.98, 1.00, 1.05])
     return float_rgb_to_image(arr_t)
 
@@ -206,10 +215,7 @@ def _filter_film_kodak_e100(img: Image.Image, strength: float) -> Image.Image:
 
 
 
-def _filter_film_fuji_c100(img: Image.Image, strength: float) -> Image.Image:
-    s = _clamp01(strength)
-    if s <= 0:
-        return img
+def _film_fuji_c100_color(img: Image.Image, s: float) -> np.ndarray:
     # Slightly lower global saturation first; we'll re-emphasize greens selectively
     color_f = _scale_factor(0.90, s)
     base = ImageEnhance.Color(img).enhance(color_f)
@@ -262,17 +268,21 @@ def _filter_film_fuji_c100(img: Image.Image, strength: float) -> Image.Image:
     # Shadows tint slightly green
     tint_sh = np.array([185.0/255.0, 215.0/255.0, 185.0/255.0], dtype=np.float32)
     a_sh = 0.32 * s
-    arr_t = apply_tint_mask(arr_t, tint_sh, (a_sh * sh))
+    return apply_tint_mask(arr_t, tint_sh, (a_sh * sh))
+
+
+def _filter_film_fuji_c100(img: Image.Image, strength: float) -> Image.Image:
+    s = _clamp01(strength)
+    if s <= 0:
+        return img
+    arr_t = _apply_baked_color(img, 'film_fuji_c100', _film_fuji_c100_color, s)
 
     # Fine film-like grain slightly stronger in mid/highs and a touch cooler
     arr_t = _apply_film_grain(arr_t, s, mid=0.55, sigma_base=0.016, sigma_slope=0.024, cw=[0.96, 1.00, 1.08])
 
     return float_rgb_to_image(arr_t)
 
-def _filter_film_kodak_g200(img: Image.Image, strength: float) -> Image.Image:
-    s = _clamp01(strength)
-    if s <= 0:
-        return img
+def _film_kodak_g200_color(img: Image.Image, s: float) -> np.ndarray:
     color_f = _scale_factor(1.08, s)
     base = ImageEnhance.Color(img).enhance(color_f)
     arr = image_to_float_rgb(base)
@@ -305,7 +315,14 @@ def _filter_film_kodak_g200(img: Image.Image, strength: float) -> Image.Image:
     boost_red = 0.25 * s * red_rel
     boost_yel = 0.22 * s * yellow_rel
     arr_t = apply_channel_mul(arr_t, 0, (1.0 + boost_red + 0.5 * boost_yel))
-    arr_t = apply_channel_mul(arr_t, 1, (1.0 + boost_yel * 0.8))
+    return apply_channel_mul(arr_t, 1, (1.0 + boost_yel * 0.8))
+
+
+def _filter_film_kodak_g200(img: Image.Image, strength: float) -> Image.Image:
+    s = _clamp01(strength)
+    if s <= 0:
+        return img
+    arr_t = _apply_baked_color(img, 'film_kodak_g200', _film_kodak_g200_color, s)
     arr_t = _apply_film_grain(arr_t, s, mid=0.5, sigma_base=0.02, sigma_slope=0.03, cw=[1.02, 1.00, 0.98])
     return float_rgb_to_image(arr_t)
 
@@ -331,7 +348,6 @@ _lut_handlers = {
     for i in range(1, 16)
 }
 FILTER_HANDLERS.update(_lut_handlers)
-print(FILTER_HANDLERS)
 
 AVAILABLE_FILTER_KEYS = set(FILTER_HANDLERS.keys())
 
@@ -336,7 +336,6 @@ _lut_handlers = {
     for i in range(1, 16)
 }
 FILTER_HANDLERS.update(_lut_handlers)
-print(FILTER_HANDLERS)
 
 AVAILABLE_FILTER_KEYS = set(FILTER_HANDLERS.keys())
 
@@ -1,14 +1,14 @@
 from typing import Dict, Callable
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageOps
 import numpy as np
-import piexif
-import os
 from PIL.ExifTags import TAGS
 
 # Import shared sizing, style and utils from core module to avoid duplication
 from border_extender import add_bd as core
 from border_extender.color_extract import extract_main_colors
 from border_extender.assets_data import film_logs, logo_dict
+from border_extender.effects.asset_cache import load_logo, logo_size, path_exists, get_font
 
 __all__ = [
     'process_one_image',
@@ -16,17 +16,19 @@ __all__ = [
     'AVAILABLE_FORMAT_KEYS',
 ]
 
+@lru_cache(maxsize=256)
 def _resolve_film_logo_path(film_file: str) -> str:
     if not film_file:
         return ''
-    if os.path.exists(film_file):
+    if path_exists(film_file):
         return film_file
     candidate = film_logs.get(film_file, '')
-    if candidate and os.path.exists(candidate):
+    if candidate and path_exists(candidate):
         return candidate
     return film_file
 
-def _format_basic1(img: Image.Image, text: str, logo_file: str, suppli_info: str = '', *, square: bool = False, film_file: str = '', **kwargs) -> Image.Image:
+def _format_basic1(img: Image.Image, text: str, logo_file: str, suppli_info: str = '', *, square: bool = False, film_file: str = '', metrics: core.LayoutMetrics = None, **kwargs) -> Image.Image:
+    m = metrics if metrics is not None else core.current_layout_metrics()
     suppli_line = suppli_info
     # 自动读取 EXIF 信息
     if text == '':
@@ -45,6 +47,7 @@ def _format_basic1(img: Image.Image, text: str, logo_file: str, suppli_info: str
             text = camera_mk + ' ' + camera_m + '\n\n'
             logo_file = logo_dict[camera_mk]
             try:
+                import piexif  # 仅在自动识别 EXIF 时才需要
                 exif_dict = piexif.load(img.info['exif'])
                 focal_length = exif_dict['Exif'][piexif.ExifIFD.FocalLength]
                 F_value = exif_dict['Exif'][piexif.ExifIFD.FNumber]
@@ -66,42 +69,40 @@ def _format_basic1(img: Image.Image, text: str, logo_file: str, suppli_info: str
         img = core.rotate_image_90_no_crop(img, reverse=True)
 
     wh, ht = img.width, img.height
-    new_width = core.tgt_size
+    new_width = m.tgt_size
     new_height = int(ht * new_width / wh)
     img = img.resize((new_width, new_height))
 
     # calculate bg size
-    background = Image.new('RGB', (core.tgt_size + 2 * core.border_size + 2 * core.exterior, new_height + 2 * core.border_size + 3 * core.exterior + core.infor_area), (255, 255, 255))
+    background = Image.new('RGB', (m.tgt_size + 2 * m.border_size + 2 * m.exterior, new_height + 2 * m.border_size + 3 * m.exterior + m.infor_area), (255, 255, 255))
     # add border 1
-    img = ImageOps.expand(img, border=core.border_size, fill=core.border_color)
+    img = ImageOps.expand(img, border=m.border_size, fill=m.border_color)
 
     # 将原始图片粘贴到白色背景图上
-    background.paste(img, (core.exterior, core.exterior))
+    background.paste(img, (m.exterior, m.exterior))
 
     # add logo
     film_logo_path = _resolve_film_logo_path(film_file)
     if film_logo_path != '':
-      if film_logo_path and os.path.exists(film_logo_path):
-        # 打开两个logo
-        film_logo_img = Image.open(film_logo_path).convert('RGB')
-        camera_logo_img = Image.open(logo_file).convert('RGB')
-        
+      if film_logo_path and path_exists(film_logo_path):
         # 统一高度，以原有logo的高度标准
-        logo_height = core.infor_area * 0.8
+        logo_height = m.infor_area * 0.8
         
-        # 调整两个logo尺寸
-        camera_logo_width = int(camera_logo_img.width * logo_height / camera_logo_img.height)
-        camera_logo_img = camera_logo_img.resize((camera_logo_width, int(logo_height)))
+        # 调整两个logo尺寸（缓存中按目标尺寸取已解码的logo）
+        camera_w, camera_h = logo_size(logo_file)
+        camera_logo_width = int(camera_w * logo_height / camera_h)
+        camera_logo_img = load_logo(logo_file, 'RGB', (camera_logo_width, int(logo_height)))
         
-        film_logo_width = int(film_logo_img.width * logo_height / film_logo_img.height)
-        film_logo_img = film_logo_img.resize((film_logo_width, int(logo_height)))
+        film_w, film_h = logo_size(film_logo_path)
+        film_logo_width = int(film_w * logo_height / film_h)
+        film_logo_img = load_logo(film_logo_path, 'RGB', (film_logo_width, int(logo_height)))
         
         # 计算位置：原有logo在右边的位置
-        camera_logo_x = int(core.tgt_size + 2 * core.border_size + core.exterior - camera_logo_width)
-        logo_y = int(new_height + 2 * core.border_size + 2 * core.exterior)
+        camera_logo_x = int(m.tgt_size + 2 * m.border_size + m.exterior - camera_logo_width)
+        logo_y = int(new_height + 2 * m.border_size + 2 * m.exterior)
         
-        # film logo在左边，间距为core.exterior
-        film_logo_x = camera_logo_x - core.exterior - film_logo_width
+        # film logo在左边，间距为m.exterior
+        film_logo_x = camera_logo_x - m.exterior - film_logo_width
         
         # 粘贴两个logo
         background.paste(film_logo_img, (film_logo_x, logo_y))
@@ -110,22 +111,22 @@ def _format_basic1(img: Image.Image, text: str, logo_file: str, suppli_info: str
         draw = ImageDraw.Draw(background)
       else:
         # 如果film logo不存在，退回到只显示原有logo
-        logo_img = Image.open(logo_file).convert('RGB')
-        logo_height = core.infor_area * 0.8
-        logo_img = logo_img.resize((int(logo_img.width * logo_height / logo_img.height), int(logo_height)))
-        background.paste(logo_img, (int(core.tgt_size + 2 * core.border_size + core.exterior - logo_img.width * logo_height / logo_img.height), int(new_height + 2 * core.border_size + 2 * core.exterior)))
+        logo_height = m.infor_area * 0.8
+        logo_w, logo_h = logo_size(logo_file)
+        logo_img = load_logo(logo_file, 'RGB', (int(logo_w * logo_height / logo_h), int(logo_height)))
+        background.paste(logo_img, (int(m.tgt_size + 2 * m.border_size + m.exterior - logo_img.width * logo_height / logo_img.height), int(new_height + 2 * m.border_size + 2 * m.exterior)))
         draw = ImageDraw.Draw(background)
     else:
       # logo_file=logo_file
-      logo_img = Image.open(logo_file).convert('RGB')
-      logo_height = core.infor_area * 0.8
-      logo_img = logo_img.resize((int(logo_img.width * logo_height / logo_img.height), int(logo_height)))
-      background.paste(logo_img, (int(core.tgt_size + 2 * core.border_size + core.exterior - logo_img.width * logo_height / logo_img.height), int(new_height + 2 * core.border_size + 2 * core.exterior)))
+      logo_height = m.infor_area * 0.8
+      logo_w, logo_h = logo_size(logo_file)
+      logo_img = load_logo(logo_file, 'RGB', (int(logo_w * logo_height / logo_h), int(logo_height)))
+      background.paste(logo_img, (int(m.tgt_size + 2 * m.border_size + m.exterior - logo_img.width * logo_height / logo_img.height), int(new_height + 2 * m.border_size + 2 * m.exterior)))
       draw = ImageDraw.Draw(background)
 
     # add text 1 the camera
-    font = ImageFont.truetype(core.using_font, core.font_size)
-    posi = (int(core.exterior * 1.01), 2 * core.exterior + new_height + 2 * core.border_size)
+    font = get_font(core.using_font, m.font_size)
+    posi = (int(m.exterior * 1.01), 2 * m.exterior + new_height + 2 * m.border_size)
     text_1 = text.split('\n\n')[0].strip('\0')
     draw.text(posi, text_1, fill=(0, 0, 0), font=font)
     bold_offset = 1
@@ -133,25 +134,25 @@ def _format_basic1(img: Image.Image, text: str, logo_file: str, suppli_info: str
         draw.text((posi[0] + offset[0], posi[1] + offset[1]), text_1, font=font, fill=(0, 0, 0))
 
     # add text 2 the lens
-    font = ImageFont.truetype(core.using_font, int(core.font_size * 0.9))
-    posi = (int(core.exterior * 1.01), 2 * core.exterior + new_height + 2 * core.border_size + 1.6 * core.font_size)
+    font = get_font(core.using_font, int(m.font_size * 0.9))
+    posi = (int(m.exterior * 1.01), 2 * m.exterior + new_height + 2 * m.border_size + 1.6 * m.font_size)
     text_2 = text.split('\n\n')[1].strip('\0')
     draw.text(posi, text_2, fill=(0, 0, 0), font=font)
 
     # add main_color
     main_c = extract_main_colors(img, num_colors=4)
-    color_image = np.zeros((int(0.8 * core.font_size), int(15 * core.font_size), 3), dtype=int)
+    color_image = np.zeros((int(0.8 * m.font_size), int(15 * m.font_size), 3), dtype=int)
     block_width = color_image.shape[1] // len(main_c) + 1
     for i, color in enumerate(main_c):
         color_image[:, i * block_width:(i + 1) * block_width] = color
     color_pad = Image.fromarray(color_image.astype('uint8'))
-    posi_mc = (int(core.exterior * 1.01), int(2 * core.exterior + new_height + 2 * core.border_size + 3.0 * core.font_size))
+    posi_mc = (int(m.exterior * 1.01), int(2 * m.exterior + new_height + 2 * m.border_size + 3.0 * m.font_size))
     background.paste(color_pad, posi_mc)
 
     # add supplementary_line in the last line
     if suppli_line:
-        font = ImageFont.truetype(core.using_font, int(core.font_size * 0.8))
-        posi = (int(core.exterior * 1.01), 2 * core.exterior + new_height + 2 * core.border_size + 4.2 * core.font_size)
+        font = get_font(core.using_font, int(m.font_size * 0.8))
+        posi = (int(m.exterior * 1.01), 2 * m.exterior + new_height + 2 * m.border_size + 4.2 * m.font_size)
         draw.text(posi, suppli_line.strip('\0'), fill=(80, 80, 80), font=font)
 
     # rotate back and save
@@ -169,7 +170,7 @@ def _format_basic1(img: Image.Image, text: str, logo_file: str, suppli_info: str
 
     return background
 
-def _format_basic2(img, text, logo_file, suppli_info='', *, square=False, film_file: str = '', **kwargs):
+def _format_basic2(img, text, logo_file, suppli_info='', *, square=False, film_file: str = '', metrics: core.LayoutMetrics = None, **kwargs):
     """
     Format with all elements centered vertically:
     - Logo (top)
@@ -178,6 +179,7 @@ def _format_basic2(img, text, logo_file, suppli_info='', *, square=False, film_f
     - Text (camera + lens)
     - Supplementary info (bottom)
     """
+    m = metrics if metrics is not None else core.current_layout_metrics()
     suppli_line = suppli_info
     text_1, text_2 = (text.split('\n\n') + ['', ''])[:2]  # Ensure we have at least 2 elements
     text_1 = text_1.strip('\0')
@@ -190,68 +192,67 @@ def _format_basic2(img, text, logo_file, suppli_info='', *, square=False, film_f
     
     # Resize image
     wh, ht = img.width, img.height
-    new_width = core.tgt_size
+    new_width = m.tgt_size
     new_height = int(ht * new_width / wh)
     img = img.resize((new_width, new_height))
     
     # Calculate total height needed
-    logo_height = core.infor_area * 0.6
-    color_swatch_h = int(0.8 * core.font_size)
-    text1_h = core.font_size
-    text2_h = int(core.font_size * 0.9)
-    suppli_h = int(core.font_size * 0.8) if suppli_line else 0
+    logo_height = m.infor_area * 0.6
+    color_swatch_h = int(0.8 * m.font_size)
+    text1_h = m.font_size
+    text2_h = int(m.font_size * 0.9)
+    suppli_h = int(m.font_size * 0.8) if suppli_line else 0
     
     # Calculate spacing
-    spacing = core.exterior // 2
+    spacing = m.exterior // 2
     max_text_h = max(text1_h, text2_h)
-    total_h = (logo_height + spacing * 3 + (new_height + 2 * core.border_size) + spacing * 2 + 
+    total_h = (logo_height + spacing * 3 + (new_height + 2 * m.border_size) + spacing * 2 + 
               color_swatch_h + spacing * 2 + 
               max_text_h + spacing * 2 + 
               suppli_h)
     # Create background
-    bg_width = core.tgt_size + 2 * core.border_size + 2 * core.exterior
-    background = Image.new('RGB', (bg_width, int(total_h + 2 * core.exterior)), (255, 255, 255))
+    bg_width = m.tgt_size + 2 * m.border_size + 2 * m.exterior
+    background = Image.new('RGB', (bg_width, int(total_h + 2 * m.exterior)), (255, 255, 255))
     draw = ImageDraw.Draw(background)
     
     # Add logo (centered)
     film_logo_path = _resolve_film_logo_path(film_file)
-    if film_logo_path != '' and os.path.exists(film_logo_path):
+    if film_logo_path != '' and path_exists(film_logo_path):
         # 双logo模式：film logo + camera logo
-        film_logo_img = Image.open(film_logo_path).convert('RGB')
-        camera_logo_img = Image.open(logo_file).convert('RGB')
-        
         # 调整两个logo尺寸到相同高度
-        camera_logo_width = int(camera_logo_img.width * logo_height / camera_logo_img.height)
-        camera_logo_img = camera_logo_img.resize((camera_logo_width, int(logo_height)))
+        camera_w, camera_h = logo_size(logo_file)
+        camera_logo_width = int(camera_w * logo_height / camera_h)
+        camera_logo_img = load_logo(logo_file, 'RGB', (camera_logo_width, int(logo_height)))
         
-        film_logo_width = int(film_logo_img.width * logo_height / film_logo_img.height)
-        film_logo_img = film_logo_img.resize((film_logo_width, int(logo_height)))
+        film_w, film_h = logo_size(film_logo_path)
+        film_logo_width = int(film_w * logo_height / film_h)
+        film_logo_img = load_logo(film_logo_path, 'RGB', (film_logo_width, int(logo_height)))
         
         # 计算两个logo的总宽度（包括间距）
-        total_logos_width = film_logo_width + core.exterior + camera_logo_width
+        total_logos_width = film_logo_width + m.exterior + camera_logo_width
         
         # 计算起始位置使两个logo整体居中
         start_x = (bg_width - total_logos_width) // 2
         
         # 粘贴film logo（左）和camera logo（右）
-        background.paste(film_logo_img, (start_x, core.exterior))
-        background.paste(camera_logo_img, (start_x + film_logo_width + core.exterior, core.exterior))
-    elif os.path.exists(logo_file):
+        background.paste(film_logo_img, (start_x, m.exterior))
+        background.paste(camera_logo_img, (start_x + film_logo_width + m.exterior, m.exterior))
+    elif path_exists(logo_file):
         # 单logo模式
-        logo_img = Image.open(logo_file).convert('RGB')
-        logo_img = logo_img.resize((int(logo_img.width * logo_height / logo_img.height), int(logo_height)))
+        logo_w, logo_h = logo_size(logo_file)
+        logo_img = load_logo(logo_file, 'RGB', (int(logo_w * logo_height / logo_h), int(logo_height)))
         logo_x = (bg_width - logo_img.width) // 2
-        background.paste(logo_img, (logo_x, core.exterior))
+        background.paste(logo_img, (logo_x, m.exterior))
     
     # Add image with border
-    img_with_border = ImageOps.expand(img, border=core.border_size, fill=core.border_color)
+    img_with_border = ImageOps.expand(img, border=m.border_size, fill=m.border_color)
     img_x = (bg_width - img_with_border.width) // 2
-    img_y = int(core.exterior + logo_height + spacing * 2)
+    img_y = int(m.exterior + logo_height + spacing * 2)
     background.paste(img_with_border, (img_x, img_y))
     
     # Add main colors
     main_c = extract_main_colors(img, num_colors=4)
-    color_swatch_w = int(15 * core.font_size)
+    color_swatch_w = int(15 * m.font_size)
     color_image = np.zeros((color_swatch_h, color_swatch_w, 3), dtype=int)
     block_width = color_swatch_w // len(main_c) + 1
     for i, color in enumerate(main_c):
@@ -262,14 +263,14 @@ def _format_basic2(img, text, logo_file, suppli_info='', *, square=False, film_f
     background.paste(color_pad, (color_x, color_y))
     
     # Add text (camera + lens)
-    font = ImageFont.truetype(core.using_font, core.font_size)
+    font = get_font(core.using_font, m.font_size)
     text_y = color_y + color_swatch_h + spacing * 2
     
     # Text 1 (camera)
-    font_small = ImageFont.truetype(core.using_font, int(core.font_size * 0.9))
+    font_small = get_font(core.using_font, int(m.font_size * 0.9))
     w1 = draw.textlength(text_1, font=font)
     w2 = draw.textlength(text_2, font=font_small)
-    gap = int(0.5 * core.font_size)
+    gap = int(0.5 * m.font_size)
     combined_w = int(w1 + gap + w2)
     x_start = (bg_width - combined_w) // 2
     draw.text((x_start, text_y), text_1, fill=(0, 0, 0), font=font)
@@ -279,7 +280,7 @@ def _format_basic2(img, text, logo_file, suppli_info='', *, square=False, film_f
     
     # Add supplementary info
     if suppli_line:
-        font_suppli = ImageFont.truetype(core.using_font, int(core.font_size * 0.8))
+        font_suppli = get_font(core.using_font, int(m.font_size * 0.8))
         suppli_x = (bg_width - draw.textlength(suppli_line, font=font_suppli)) // 2
         suppli_y = text_y + max_text_h + spacing
         draw.text((suppli_x, suppli_y), suppli_line, fill=(80, 80, 80), font=font_suppli)
@@ -298,7 +299,7 @@ def _format_basic2(img, text, logo_file, suppli_info='', *, square=False, film_f
 
 
 
-def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str = '', *, square: bool = False, film_file: str = '', **kwargs) -> Image.Image:
+def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str = '', *, square: bool = False, film_file: str = '', metrics: core.LayoutMetrics = None, **kwargs) -> Image.Image:
     """
     Layout:
     +----------------+ +------------+
@@ -314,6 +315,7 @@ def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str
     | SUPPLEMENTARY  | |            |
     +----------------+ +------------+
     """
+    m = metrics if metrics is not None else core.current_layout_metrics()
     # Split text into parts
     text_parts = text.split('\n\n')
     text1 = text_parts[0].strip('\0') if len(text_parts) > 0 else ''
@@ -325,16 +327,16 @@ def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str
     #     img = core.rotate_image_90_no_crop(img, reverse=True)
     
     # Calculate dimensions (right image target size)
-    img_width = core.tgt_size
+    img_width = m.tgt_size
     img_ratio = img.height / img.width
     img_height = int(img_width * img_ratio)
-    img_total_h = img_height + 2 * core.border_size
+    img_total_h = img_height + 2 * m.border_size
     
     # Dynamically determine left info panel width from text lengths
-    inner_pad = core.exterior
-    font1 = ImageFont.truetype(core.using_font, core.font_size)
-    font2 = ImageFont.truetype(core.using_font, int(core.font_size * 0.9))
-    font_suppli = ImageFont.truetype(core.using_font, int(core.font_size * 0.8)) if suppli_info else None
+    inner_pad = m.exterior
+    font1 = get_font(core.using_font, m.font_size)
+    font2 = get_font(core.using_font, int(m.font_size * 0.9))
+    font_suppli = get_font(core.using_font, int(m.font_size * 0.8)) if suppli_info else None
     _dummy_draw = ImageDraw.Draw(Image.new('RGB', (1, 1), (255, 255, 255)))
     desired_inner_w = 0
     desired_inner_w = max(desired_inner_w, int(_dummy_draw.textlength(text1, font=font1)))
@@ -357,7 +359,7 @@ def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str
         for line in suppli_lines:
             desired_inner_w = max(desired_inner_w, int(_dummy_draw.textlength(line, font=font_suppli)))
     # Enforce a minimal inner width for a reasonable color swatch
-    min_inner = int(12 * core.font_size)
+    min_inner = int(12 * m.font_size)
     desired_inner_w = max(desired_inner_w, min_inner)
     left_panel_width = desired_inner_w + 2 * inner_pad
     
@@ -367,40 +369,37 @@ def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str
     logo_block_h = 0
     # 检查是否需要双logo模式
     film_logo_path = _resolve_film_logo_path(film_file)
-    if film_logo_path != '' and os.path.exists(film_logo_path) and os.path.exists(logo_file):
+    if film_logo_path != '' and path_exists(film_logo_path) and path_exists(logo_file):
         try:
             # 双logo模式：宽度比例改为0.5，垂直堆叠
             logo_w_target = max(1, int(content_w_for_logo * 0.5))
-            _camera_probe = Image.open(logo_file)
-            _film_probe = Image.open(film_logo_path)
-            # 计算两个logo各自的高度（基于相同的目标宽度）
-            _camera_ratio = _camera_probe.height / max(1, _camera_probe.width)
-            _film_ratio = _film_probe.height / max(1, _film_probe.width)
+            # 计算两个logo各自的高度（基于相同的目标宽度，仅读取文件头）
+            _camera_w, _camera_h = logo_size(logo_file)
+            _film_w, _film_h = logo_size(film_logo_path)
+            _camera_ratio = _camera_h / max(1, _camera_w)
+            _film_ratio = _film_h / max(1, _film_w)
             # 垂直堆叠：总高度 = camera_h + border_size + film_h
             camera_h = int(logo_w_target * _camera_ratio)
             film_h = int(logo_w_target * _film_ratio)
-            logo_block_h = camera_h + core.border_size + film_h
-            _camera_probe.close()
-            _film_probe.close()
+            logo_block_h = camera_h + m.border_size + film_h
         except Exception:
             logo_block_h = 0
-    elif os.path.exists(logo_file):
+    elif path_exists(logo_file):
         try:
             # 单logo模式：宽度比例使用0.66
             logo_w_target = max(1, int(content_w_for_logo * 0.66))
-            _logo_probe = Image.open(logo_file)
-            _ratio = _logo_probe.height / max(1, _logo_probe.width)
-            _logo_probe.close()
+            _logo_w, _logo_h = logo_size(logo_file)
+            _ratio = _logo_h / max(1, _logo_w)
             logo_block_h = int(logo_w_target * _ratio)
         except Exception:
             logo_block_h = 0
     else:
         logo_w_target = max(1, int(content_w_for_logo * 0.66))
-    color_swatch_h = int(0.8 * core.font_size)
-    text1_h = core.font_size * 2  # Some extra space for text
-    text2_h = int(core.font_size * 0.9) * 2
-    suppli_h = int(core.font_size * 0.8) * 2 if suppli_info else 0
-    spacing = core.exterior
+    color_swatch_h = int(0.8 * m.font_size)
+    text1_h = m.font_size * 2  # Some extra space for text
+    text2_h = int(m.font_size * 0.9) * 2
+    suppli_h = int(m.font_size * 0.8) * 2 if suppli_info else 0
+    spacing = m.exterior
     
     # Calculate total height needed for left panel
     left_panel_height = (logo_block_h + spacing * 2 + 
@@ -418,60 +417,60 @@ def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str
         total_height = img_total_h
     
     # Create background with reduced horizontal outer padding (1*exterior each side)
-    bg_width = left_panel_width + (img_width + 2 * core.border_size) + 2 * core.exterior
-    bg_height = total_height + 2 * core.exterior
+    bg_width = left_panel_width + (img_width + 2 * m.border_size) + 2 * m.exterior
+    bg_height = total_height + 2 * m.exterior
     background = Image.new('RGB', (bg_width, bg_height), (255, 255, 255))
     draw = ImageDraw.Draw(background)
     
     # # Draw dividing line
-    # line_x = left_panel_width + core.exterior
+    # line_x = left_panel_width + m.exterior
     # draw.line([(line_x, 0), (line_x, bg_height)], fill=(200, 200, 200), width=1)
     # Compute vertical centering for the whole left block (logo + colors + text)
-    suppli_line_h = int(core.font_size * 1.2)
+    suppli_line_h = int(m.font_size * 1.2)
     text_block_h = text1_h + spacing + text2_h
     if suppli_info:
         text_block_h += spacing + len(suppli_lines) * suppli_line_h
     left_block_h = logo_block_h + spacing * 2 + color_swatch_h + spacing * 2 + text_block_h
-    current_y = core.exterior + max(0, (total_height - left_block_h) // 2)
+    current_y = m.exterior + max(0, (total_height - left_block_h) // 2)
 
     # Add logo
-    if film_logo_path != '' and os.path.exists(film_logo_path) and os.path.exists(logo_file) and logo_block_h > 0:
+    if film_logo_path != '' and path_exists(film_logo_path) and path_exists(logo_file) and logo_block_h > 0:
         try:
             # 双logo模式：垂直排列，camera在上，film在下
             logo_w_target_dual = max(1, int(content_w_for_logo * 0.5))
-            film_logo_img = Image.open(film_logo_path).convert('RGBA')
-            camera_logo_img = Image.open(logo_file).convert('RGBA')
             
             # 调整两个logo到相同宽度
-            camera_ratio = camera_logo_img.height / max(1, camera_logo_img.width)
+            camera_w, camera_h0 = logo_size(logo_file)
+            camera_ratio = camera_h0 / max(1, camera_w)
             camera_h = max(1, int(logo_w_target_dual * camera_ratio))
-            camera_logo_img = camera_logo_img.resize((logo_w_target_dual, camera_h))
+            camera_logo_img = load_logo(logo_file, 'RGBA', (logo_w_target_dual, camera_h))
             
-            film_ratio = film_logo_img.height / max(1, film_logo_img.width)
+            film_w, film_h0 = logo_size(film_logo_path)
+            film_ratio = film_h0 / max(1, film_w)
             film_h = max(1, int(logo_w_target_dual * film_ratio*0.8))
-            film_logo_img = film_logo_img.resize((int(logo_w_target_dual*0.8), film_h))
+            film_logo_img = load_logo(film_logo_path, 'RGBA', (int(logo_w_target_dual*0.8), film_h))
             
             # 在左侧面板中水平居中
             logo_x = (left_panel_width - logo_w_target_dual) // 2
             
             # 垂直排列：camera在上，film在下（间距border_size）
             camera_y = current_y
-            film_y = current_y + camera_h + core.border_size
+            film_y = current_y + camera_h + m.border_size
             
             # 粘贴两个logo
             background.paste(camera_logo_img, (int(logo_x), int(camera_y)), camera_logo_img if camera_logo_img.mode == 'RGBA' else None)
             background.paste(film_logo_img, (int(logo_x+logo_w_target_dual*0.1), int(film_y)), film_logo_img if film_logo_img.mode == 'RGBA' else None)
         except Exception as e:
             print(f"Error loading logos: {e}")
-    elif os.path.exists(logo_file) and logo_block_h > 0:
+    elif path_exists(logo_file) and logo_block_h > 0:
         try:
             # 单logo模式
             logo_w_target_single = max(1, int(content_w_for_logo * 0.66))
-            logo_img = Image.open(logo_file).convert('RGBA')
-            logo_ratio = logo_img.height / max(1, logo_img.width)
+            src_w, src_h = logo_size(logo_file)
+            logo_ratio = src_h / max(1, src_w)
             logo_w = logo_w_target_single
             logo_h = max(1, int(logo_w * logo_ratio))
-            logo_img = logo_img.resize((logo_w, logo_h))
+            logo_img = load_logo(logo_file, 'RGBA', (logo_w, logo_h))
             logo_x = (left_panel_width - logo_w) // 2
             background.paste(logo_img, (int(logo_x), int(current_y)), logo_img if logo_img.mode == 'RGBA' else None)
         except Exception as e:
@@ -511,9 +510,9 @@ def _format_basic3(img: Image.Image, text: str, logo_file: str, suppli_info: str
     
     # Add main image on the right
     img_resized = img.resize((img_width, img_height), Image.Resampling.LANCZOS)
-    img_with_border = ImageOps.expand(img_resized, border=core.border_size, fill=core.border_color)
-    img_x = left_panel_width + core.exterior
-    img_y = core.exterior + img_y_offset
+    img_with_border = ImageOps.expand(img_resized, border=m.border_size, fill=m.border_color)
+    img_x = left_panel_width + m.exterior
+    img_y = m.exterior + img_y_offset
     background.paste(img_with_border, (img_x, img_y))
     
     # Handle square output if needed
@@ -542,7 +541,7 @@ AVAILABLE_FORMAT_KEYS = set(FORMAT_HANDLERS.keys())
 def process_one_image(img_input: Image.Image, text: str, logo_file: str, *args,
                       format: str = 'basic2', suppli_info: str = '', max_length: int = 2400,
                       add_black_border: bool = True, square: bool = False, film_file: str = '', film_name: str = '') -> Image.Image:
-    """Dispatch to a registered format handler after applying layout sizing via core.update_tgt_size.
+    """Dispatch to a registered format handler with layout sizing from core.compute_layout_metrics.
     Backward compatibility: extra positional arg treated as suppli_info unless it's a known format key.
     """
     # print("Process Params: ", "format: ", format, "suppli_info: ", suppli_info, "max_length: ", max_length, "add_black_border: ", add_black_border, "square: ", square, "film_name: ", film_name)
@@ -553,11 +552,11 @@ def process_one_image(img_input: Image.Image, text: str, logo_file: str, *args,
         else:
             suppli_info = candidate
 
-    core.update_tgt_size(max_length, add_black_border)
+    metrics = core.compute_layout_metrics(max_length, add_black_border)
     img = img_input
 
     handler = FORMAT_HANDLERS.get(format)
     if handler is None:
         raise ValueError('format not recognized')
     film_logo_file = film_file or film_name
-    return handler(img, text, logo_file, suppli_info=suppli_info, square=square, film_file=film_logo_file)
+    return handler(img, text, logo_file, suppli_info=suppli_info, square=square, film_file=film_logo_file, metrics=metrics)
@@ -5,6 +5,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
+import json
+import os
+import struct
+import threading
 import numpy as np
 
 
@@ -18,6 +22,15 @@ class CubeLUT:
 
 _CUBE_CACHE: dict[str, CubeLUT] = {}
 
+# Binary pack of every .cube in a directory: magic, uint32 header length, JSON
+# header, then 64-byte aligned float32 tables. Loaded with np.memmap so forked
+# workers share the tables through the page cache.
+LUT_PACK_NAME = 'luts.pack'
+_PACK_MAGIC = b'BELUTPK1'
+_PACK_ALIGN = 64
+_PACK_CACHE: dict[str, tuple] = {}
+_PACK_LOCK = threading.Lock()
+
 
 def load_cube_lut(cube_path: str | Path) -> CubeLUT:
     p = Path(cube_path)
@@ -26,6 +39,14 @@ def load_cube_lut(cube_path: str | Path) -> CubeLUT:
     if cached is not None:
         return cached
 
+    lut = _load_from_pack(p)
+    if lut is None:
+        lut = _parse_cube_text(p)
+    _CUBE_CACHE[key] = lut
+    return lut
+
+
+def _parse_cube_text(p: Path) -> CubeLUT:
     size = None
     domain_min = np.array([0.0, 0.0, 0.0], dtype=np.float32)
     domain_max = np.array([1.0, 1.0, 1.0], dtype=np.float32)
@@ -67,64 +88,309 @@ def load_cube_lut(cube_path: str | Path) -> CubeLUT:
     # So reshape as [R][G][B][3] via (R, G, B, 3) with B as the last varying axis.
     table = arr.reshape((size, size, size, 3))
 
-    lut = CubeLUT(size=size, table=table, domain_min=domain_min, domain_max=domain_max)
-    _CUBE_CACHE[key] = lut
-    return lut
+    return CubeLUT(size=size, table=table, domain_min=domain_min, domain_max=domain_max)
 
 
-def apply_cube_lut_float_rgb(arr_t: np.ndarray, lut: CubeLUT) -> np.ndarray:
-    if arr_t.ndim != 3 or arr_t.shape[2] != 3:
-        raise ValueError('arr_t must be HxWx3 float array')
+def _cube_stamp(p: Path) -> tuple[int, int] | None:
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
 
-    h, w, _ = arr_t.shape
-    flat = arr_t.reshape(-1, 3).astype(np.float32, copy=False)
 
+def build_cube_pack(cube_dir: str | Path, pack_path: str | Path | None = None) -> Path:
+    """Compile every ``*.cube`` under ``cube_dir`` into one binary pack."""
+    cube_dir = Path(cube_dir)
+    pack_path = Path(pack_path) if pack_path else cube_dir / LUT_PACK_NAME
+    entries = []
+    tables = []
+    offset = 0
+    for cube in sorted(cube_dir.glob('*.cube')):
+        lut = _parse_cube_text(cube)
+        table = np.ascontiguousarray(lut.table, dtype='<f4')
+        st_size, st_mtime_ns = _cube_stamp(cube)
+        entries.append({
+            'name': cube.name,
+            'size': lut.size,
+            'offset': offset,
+            'domain_min': [float(v) for v in lut.domain_min],
+            'domain_max': [float(v) for v in lut.domain_max],
+            'src_size': st_size,
+            'src_mtime_ns': st_mtime_ns,
+        })
+        tables.append(table)
+        offset += -(-table.nbytes // _PACK_ALIGN) * _PACK_ALIGN
+
+    header = json.dumps({'version': 1, 'entries': entries}).encode('utf-8')
+    data_start = -(-(len(_PACK_MAGIC) + 4 + len(header)) // _PACK_ALIGN) * _PACK_ALIGN
+    tmp_path = pack_path.with_name(pack_path.name + f'.tmp{os.getpid()}')
+    with tmp_path.open('wb') as f:
+        f.write(_PACK_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for entry, table in zip(entries, tables):
+            f.seek(data_start + entry['offset'])
+            f.write(table.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, pack_path)
+    return pack_path
+
+
+def _open_pack(pack_path: Path):
+    """Return (memmap, data_start, entries by name) for a pack, reopening it if it changed."""
+    key = str(pack_path)
+    stamp = _cube_stamp(pack_path)
+    if stamp is None:
+        return None
+    with _PACK_LOCK:
+        cached = _PACK_CACHE.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            with pack_path.open('rb') as f:
+                if f.read(len(_PACK_MAGIC)) != _PACK_MAGIC:
+                    return None
+                (header_len,) = struct.unpack('<I', f.read(4))
+                header = json.loads(f.read(header_len).decode('utf-8'))
+            data_start = -(-(len(_PACK_MAGIC) + 4 + header_len) // _PACK_ALIGN) * _PACK_ALIGN
+            mm = np.memmap(pack_path, dtype=np.uint8, mode='r')
+        except (OSError, ValueError):
+            return None
+        opened = (mm, data_start, {e['name']: e for e in header.get('entries', [])})
+        _PACK_CACHE[key] = (stamp, opened)
+        return opened
+
+
+def _load_from_pack(p: Path) -> CubeLUT | None:
+    opened = _open_pack(p.parent / LUT_PACK_NAME)
+    if opened is None:
+        return None
+    mm, data_start, entries = opened
+    entry = entries.get(p.name)
+    if entry is None:
+        return None
+    # A pack entry is stale once its source cube changed; a missing source is
+    # fine (deployments may ship the pack alone).
+    stamp = _cube_stamp(p)
+    if stamp is not None and stamp != (entry['src_size'], entry['src_mtime_ns']):
+        return None
+
+    size = int(entry['size'])
+    start = data_start + int(entry['offset'])
+    nbytes = size * size * size * 3 * 4
+    if start + nbytes > mm.shape[0]:
+        return None
+    table = mm[start:start + nbytes].view('<f4').reshape((size, size, size, 3))
+    return CubeLUT(
+        size=size,
+        table=table,
+        domain_min=np.asarray(entry['domain_min'], dtype=np.float32),
+        domain_max=np.asarray(entry['domain_max'], dtype=np.float32),
+    )
+
+
+INTERPOLATIONS = ('trilinear', 'tetrahedral')
+DEFAULT_INTERPOLATION = 'trilinear'
+
+
+def _lattice_coords(flat: np.ndarray, lut: CubeLUT):
+    """Return (base linear index, fractional offsets) of each pixel inside the cube."""
     dom_min = lut.domain_min
     dom_max = lut.domain_max
     dom_range = np.maximum(dom_max - dom_min, np.float32(1e-12))
     x = (flat - dom_min[None, :]) / dom_range[None, :]
-    x = np.clip(x, 0.0, 1.0)
     # Avoid x==1.0 edge producing i1==size.
     one_minus = np.nextafter(np.float32(1.0), np.float32(0.0))
-    x = np.minimum(x, one_minus)
+    np.clip(x, 0.0, one_minus, out=x)
 
     n = lut.size
-    scaled = x * np.float32(n - 1)
-    i0 = np.floor(scaled).astype(np.int32)
-    f = scaled - i0.astype(np.float32)
-    i1 = np.minimum(i0 + 1, n - 1)
-
-    # .cube BGR-fastest order: table is [B][G][R][3]
-    b0, g0, r0 = i0[:, 2], i0[:, 1], i0[:, 0]
-    b1, g1, r1 = i1[:, 2], i1[:, 1], i1[:, 0]
-    fb, fg, fr = f[:, 2:3], f[:, 1:2], f[:, 0:1]
-
-    t = lut.table
-    c000 = t[b0, g0, r0]
-    c001 = t[b0, g0, r1]
-    c010 = t[b0, g1, r0]
-    c011 = t[b0, g1, r1]
-    c100 = t[b1, g0, r0]
-    c101 = t[b1, g0, r1]
-    c110 = t[b1, g1, r0]
-    c111 = t[b1, g1, r1]
-
-    c00 = c000 * (1.0 - fr) + c001 * fr
-    c01 = c010 * (1.0 - fr) + c011 * fr
-    c10 = c100 * (1.0 - fr) + c101 * fr
-    c11 = c110 * (1.0 - fr) + c111 * fr
-    c0 = c00 * (1.0 - fg) + c01 * fg
-    c1 = c10 * (1.0 - fg) + c11 * fg
-    out = c0 * (1.0 - fb) + c1 * fb
+    x *= np.float32(n - 1)
+    i0 = x.astype(np.int32)
+    f = x
+    f -= i0
+
+    # .cube BGR-fastest order: table is [B][G][R][3]. Gather from the flattened
+    # table with one linear index per corner instead of three fancy indices;
+    # x < 1 guarantees i0 + 1 <= n - 1, so the +1 strides never leave the cube.
+    base = (i0[:, 2] * n + i0[:, 1]) * n + i0[:, 0]
+    return base, f
+
+
+def _trilinear(t: np.ndarray, n: int, base: np.ndarray, f: np.ndarray) -> np.ndarray:
+    fr, fg, fb = f[:, 0:1], f[:, 1:2], f[:, 2:3]
+    sr, sg, sb = 1, n, n * n
+
+    def corner(offset: int) -> np.ndarray:
+        return np.take(t, base + offset, axis=0)
+
+    c00 = corner(0)
+    c00 += (corner(sr) - c00) * fr
+    c01 = corner(sg)
+    c01 += (corner(sg + sr) - c01) * fr
+    c00 += (c01 - c00) * fg
+    c10 = corner(sb)
+    c10 += (corner(sb + sr) - c10) * fr
+    c11 = corner(sb + sg)
+    c11 += (corner(sb + sg + sr) - c11) * fr
+    c10 += (c11 - c10) * fg
+    c00 += (c10 - c00) * fb
+    return c00
+
+
+def _tetrahedral(t: np.ndarray, n: int, base: np.ndarray, f: np.ndarray) -> np.ndarray:
+    # Walk from the base corner to the opposite corner along the axes in order of
+    # decreasing fraction; the four visited corners span the enclosing tetrahedron.
+    fr, fg, fb = f[:, 0], f[:, 1], f[:, 2]
+    sr, sg, sb = 1, n, n * n
+    r_ge_g = fr >= fg
+    g_ge_b = fg >= fb
+    r_ge_b = fr >= fb
+    s_max = np.where(r_ge_g & r_ge_b, sr, np.where(g_ge_b, sg, sb))
+    s_min = np.where(~r_ge_g & ~r_ge_b, sr, np.where(~g_ge_b, sg, sb))
+    f_max = np.maximum(np.maximum(fr, fg), fb)
+    f_min = np.minimum(np.minimum(fr, fg), fb)
+    f_mid = fr + fg + fb - f_max - f_min
+    s_all = sr + sg + sb
+
+    out = np.take(t, base, axis=0)
+    out *= (1.0 - f_max)[:, None]
+    out += np.take(t, base + s_max, axis=0) * (f_max - f_mid)[:, None]
+    out += np.take(t, base + (s_all - s_min), axis=0) * (f_mid - f_min)[:, None]
+    out += np.take(t, base + s_all, axis=0) * f_min[:, None]
+    return out
+
 
+_KERNELS = {
+    'trilinear': _trilinear,
+    'tetrahedral': _tetrahedral,
+}
+
+
+def apply_cube_lut_float_rgb(arr_t: np.ndarray, lut: CubeLUT, interpolation: str | None = None) -> np.ndarray:
+    if arr_t.ndim != 3 or arr_t.shape[2] != 3:
+        raise ValueError('arr_t must be HxWx3 float array')
+    kernel = _KERNELS.get(interpolation or DEFAULT_INTERPOLATION)
+    if kernel is None:
+        raise ValueError(f'unknown LUT interpolation: {interpolation}')
+
+    h, w, _ = arr_t.shape
+    flat = arr_t.reshape(-1, 3).astype(np.float32, copy=False)
+    base, f = _lattice_coords(flat, lut)
+    out = kernel(lut.table.reshape(-1, 3), lut.size, base, f)
     return out.reshape(h, w, 3)
 
 
-def apply_cube_lut(arr_t: np.ndarray, lut: CubeLUT, strength: float = 1.0) -> np.ndarray:
+# Pixels per chunk for the streaming path. Each chunk allocates roughly
+# 100 bytes per pixel of temporaries (coords, four to eight gathered corners,
+# lerps), so 64K pixels keeps the transient peak around 6-7 MB regardless of
+# frame size; only the caller-visible output is frame sized.
+LUT_CHUNK_PIXELS = 1 << 16
+
+
+def _apply_chunks(src: np.ndarray, dst: np.ndarray, lut: CubeLUT, interpolation: str | None,
+                  strength: float, chunk_pixels: int | None) -> np.ndarray:
+    """Map Nx3 ``src`` into preallocated Nx3 ``dst`` chunk by chunk.
+
+    uint8 arrays are treated as 0..255 and converted per chunk, so a uint8 frame
+    never exists as a full-size float copy.
+    """
+    kernel = _KERNELS.get(interpolation or DEFAULT_INTERPOLATION)
+    if kernel is None:
+        raise ValueError(f'unknown LUT interpolation: {interpolation}')
+    t = lut.table.reshape(-1, 3)
+    n_pix = src.shape[0]
+    step = max(1, int(chunk_pixels)) if chunk_pixels else max(1, n_pix)
+    src_u8 = src.dtype == np.uint8
+    dst_u8 = dst.dtype == np.uint8
+    s = np.float32(strength)
+
+    for start in range(0, n_pix, step):
+        stop = min(start + step, n_pix)
+        chunk = src[start:stop]
+        if src_u8:
+            chunk = chunk.astype(np.float32) * np.float32(1.0 / 255.0)
+        else:
+            chunk = chunk.astype(np.float32, copy=False)
+        base, f = _lattice_coords(chunk, lut)
+        mapped = kernel(t, lut.size, base, f)
+        if s < 1:
+            mapped *= s
+            mapped += chunk * (np.float32(1.0) - s)
+        np.clip(mapped, 0.0, 1.0, out=mapped)
+        if dst_u8:
+            mapped *= np.float32(255.0)
+            mapped += np.float32(0.5)
+            dst[start:stop] = mapped.astype(np.uint8)
+        else:
+            dst[start:stop] = mapped
+    return dst
+
+
+def apply_cube_lut_float_rgb_chunked(arr_t: np.ndarray, lut: CubeLUT, interpolation: str | None = None,
+                                     chunk_pixels: int | None = LUT_CHUNK_PIXELS,
+                                     out: np.ndarray | None = None) -> np.ndarray:
+    """Streaming variant of ``apply_cube_lut_float_rgb`` writing into ``out``.
+
+    Unlike the whole-frame kernel, the result is clipped to [0, 1].
+    """
+    if arr_t.ndim != 3 or arr_t.shape[2] != 3:
+        raise ValueError('arr_t must be HxWx3 float array')
+    if out is None:
+        out = np.empty(arr_t.shape, dtype=np.float32)
+    elif out.shape != arr_t.shape:
+        raise ValueError('out must have the same shape as arr_t')
+    _apply_chunks(arr_t.reshape(-1, 3), out.reshape(-1, 3), lut, interpolation, 1.0, chunk_pixels)
+    return out
+
+
+def apply_cube_lut_u8(arr_u8: np.ndarray, lut: CubeLUT, strength: float = 1.0, interpolation: str | None = None,
+                      chunk_pixels: int | None = LUT_CHUNK_PIXELS) -> np.ndarray:
+    """Map an HxWx3 uint8 array through ``lut`` and blend by ``strength``, returning uint8."""
+    if arr_u8.ndim != 3 or arr_u8.shape[2] != 3:
+        raise ValueError('arr_u8 must be HxWx3 uint8 array')
+    src = np.ascontiguousarray(arr_u8, dtype=np.uint8)
+    s = float(strength)
+    if s <= 0:
+        return src.copy()
+    out = np.empty(src.shape, dtype=np.uint8)
+    _apply_chunks(src.reshape(-1, 3), out.reshape(-1, 3), lut, interpolation, min(s, 1.0), chunk_pixels)
+    return out
+
+
+def apply_cube_lut(arr_t: np.ndarray, lut: CubeLUT, strength: float = 1.0, interpolation: str | None = None,
+                   chunk_pixels: int | None = LUT_CHUNK_PIXELS) -> np.ndarray:
     s = float(strength)
     if s <= 0:
         return arr_t
-    if s >= 1:
-        return apply_cube_lut_float_rgb(arr_t, lut)
-    mapped = apply_cube_lut_float_rgb(arr_t, lut)
-    return np.clip(arr_t * (1.0 - s) + mapped * s, 0.0, 1.0)
\ No newline at end of file
+    if arr_t.ndim != 3 or arr_t.shape[2] != 3:
+        raise ValueError('arr_t must be HxWx3 float array')
+    out = np.empty(arr_t.shape, dtype=np.float32)
+    _apply_chunks(arr_t.reshape(-1, 3), out.reshape(-1, 3), lut, interpolation, min(s, 1.0), chunk_pixels)
+    return out
+
+
+def identity_lattice_u8(size: int) -> np.ndarray:
+    """uint8 RGB lattice laid out like ``CubeLUT.table`` ([B][G][R][3]).
+
+    ``size - 1`` must divide 255 so every node sits exactly on a uint8 level.
+    """
+    if size < 2 or 255 % (size - 1) != 0:
+        raise ValueError(f'LUT size {size} does not map onto uint8 levels')
+    levels = (np.arange(size, dtype=np.int32) * (255 // (size - 1))).astype(np.uint8)
+    b, g, r = np.meshgrid(levels, levels, levels, indexing='ij')
+    return np.stack([r, g, b], axis=-1)
+
+
+def bake_cube_lut(transform, size: int) -> CubeLUT:
+    """Sample a per-pixel ``transform(HxWx3 uint8) -> HxWx3 float`` into a CubeLUT."""
+    lattice = identity_lattice_u8(size)
+    flat = lattice.reshape(size * size, size, 3)
+    mapped = np.asarray(transform(flat), dtype=np.float32)
+    table = np.ascontiguousarray(mapped.reshape(size, size, size, 3))
+    return CubeLUT(
+        size=size,
+        table=table,
+        domain_min=np.array([0.0, 0.0, 0.0], dtype=np.float32),
+        domain_max=np.array([1.0, 1.0, 1.0], dtype=np.float32),
+    )
@@ -0,0 +1,108 @@
+"""
+结果图片的编码档位与输出格式协商。
+- 档位：fast（单遍 Huffman、4:2:0，编码最快）、balanced（默认，沿用此前固定的 quality=80、progressive、4:4:4）、
+  smallest（4:2:0，体积最小，编码最慢）
+- 格式：jpeg / webp / avif，后两者取决于 Pillow 是否编译了对应支持（PIL.features）
+显式的 output_format 参数优先；为 'auto' 或未指定时按 Accept 头协商：只认显式列出的类型，q 值高者优先，
+q=0 视为拒绝，同 q 时 avif > webp > jpeg；没有可用类型时返回 jpeg。
+"""
+from io import BytesIO
+
+from PIL import Image, features
+
+# 格式 → (Pillow 格式名, MIME 类型, 扩展名)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+    'webp': ('WEBP', 'image/webp', '.webp'),
+    'avif': ('AVIF', 'image/avif', '.avif'),
+}
+DEFAULT_OUTPUT_FORMAT = 'jpeg'
+
+ENCODE_PROFILES = {
+    'fast': {
+        'jpeg': dict(quality=80, optimize=False, progressive=False, subsampling=2),
+        'webp': dict(quality=80, method=0),
+        'avif': dict(quality=60, speed=10),
+    },
+    'balanced': {
+        'jpeg': dict(quality=80, optimize=True, progressive=True, subsampling=0),
+        'webp': dict(quality=80, method=2),
+        'avif': dict(quality=60, speed=8),
+    },
+    'smallest': {
+        'jpeg': dict(quality=76, optimize=True, progressive=True, subsampling=2),
+        'webp': dict(quality=76, method=6),
+        'avif': dict(quality=55, speed=6),
+    },
+}
+DEFAULT_ENCODE_PROFILE = 'balanced'
+
+_MIMETYPES = {ext: mime for _, mime, ext in OUTPUT_FORMATS.values()}
+_MIMETYPES['.jpeg'] = 'image/jpeg'
+
+
+def supported_formats() -> tuple:
+    """当前 Pillow 可编码的输出格式。"""
+    return tuple(k for k in OUTPUT_FORMATS if k == 'jpeg' or features.check(k))
+
+
+def negotiate_format(requested=None, accept=None) -> str:
+    """显式格式（受支持时）优先，否则按 Accept 头协商；都不满足时返回 jpeg。"""
+    requested = (requested or '').strip().lower()
+    if requested == 'jpg':
+        requested = 'jpeg'
+    supported = supported_formats()
+    if requested in supported:
+        return requested
+    qualities = parse_accept(accept)
+    best, best_q = DEFAULT_OUTPUT_FORMAT, 0.0
+    for fmt in ('avif', 'webp', 'jpeg'):
+        q = qualities.get(OUTPUT_FORMATS[fmt][1], 0.0)
+        if fmt in supported and q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def parse_accept(accept=None) -> dict:
+    """解析 Accept 头为 {媒体类型: q}；q 缺省为 1，无法解析的条目忽略，同一类型取最大 q。"""
+    qualities = {}
+    for item in (accept or '').lower().split(','):
+        mime, *params = [p.strip() for p in item.split(';')]
+        if not mime:
+            continue
+        q = 1.0
+        try:
+            for param in params:
+                name, _, value = param.partition('=')
+                if name.strip() == 'q':
+                    q = min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            continue
+        qualities[mime] = max(q, qualities.get(mime, 0.0))
+    return qualities
+
+
+def normalize_profile(profile=None) -> str:
+    profile = (profile or '').strip().lower()
+    return profile if profile in ENCODE_PROFILES else DEFAULT_ENCODE_PROFILE
+
+
+def encode_image(img: Image.Image, fmt: str = DEFAULT_OUTPUT_FORMAT, profile: str = DEFAULT_ENCODE_PROFILE) -> bytes:
+    """按格式与档位编码为字节。"""
+    pil_format = OUTPUT_FORMATS[fmt][0]
+    params = ENCODE_PROFILES[normalize_profile(profile)][fmt]
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    out = BytesIO()
+    img.save(out, pil_format, **params)
+    return out.getvalue()
+
+
+def extension_for(fmt: str) -> str:
+    return OUTPUT_FORMATS[fmt][2]
+
+
+def mimetype_for(filename: str) -> str:
+    """按扩展名返回结果文件的 MIME 类型（未知时按 JPEG）。"""
+    ext = '.' + filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return _MIMETYPES.get(ext, 'image/jpeg')
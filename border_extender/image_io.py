@@ -0,0 +1,72 @@
+from math import ceil
+
+from PIL import Image
+
+from .add_bd import apply_exif_orientation
+
+# EXIF Orientation 取值 5-8 时图像需要转置，宽高互换
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+# libjpeg 支持的 DCT 缩放倍数
+_DCT_FACTORS = (1, 2, 4, 8)
+
+
+def _reduce_scale(size, max_length=None, min_width=None) -> float:
+    """摆正后尺寸为 size 时，仍满足 长边>=max_length、宽>=min_width 的最小缩放比例（不超过 1）。"""
+    w, h = size
+    needed = []
+    if isinstance(max_length, (int, float)) and max_length > 0:
+        needed.append(float(max_length) / float(max(w, h)))
+    if isinstance(min_width, (int, float)) and min_width > 0:
+        needed.append(float(min_width) / float(w))
+    if not needed:
+        return 1.0
+    return min(1.0, max(needed))
+
+
+def _budget_factor(w, h, max_pixels) -> int:
+    """解码像素不超过 max_pixels 所需的 DCT 缩放倍数（1/2/4/8），8 倍仍超出时返回 0。"""
+    for factor in _DCT_FACTORS:
+        if ceil(w / factor) * ceil(h / factor) <= max_pixels:
+            return factor
+    return 0
+
+
+def open_rgb_reduced(fp, max_length=None, min_width=None, max_pixels=None) -> Image.Image:
+    """
+    解码为摆正的 RGB 图像，并尽量在解码阶段缩小：
+    JPEG 用 libjpeg DCT 缩放（Image.draft，1/2、1/4、1/8），其他格式解码后用 reduce() 整数倍缩小。
+    返回图像的长边仍 >= max_length、宽仍 >= min_width（原图更小时保持原尺寸），
+    调用方最后只需再做一次精确的 resample。
+    max_pixels 为解码像素预算：超出时 JPEG 强制按更大倍数 DCT 缩小（结果可能小于 max_length），
+    无法在预算内解码的图像（非 JPEG，或 1/8 仍超出）抛出 ValueError。
+    """
+    img = Image.open(fp)
+    orientation = img.getexif().get(0x0112, 1)
+    w, h = img.size
+    upright = (h, w) if orientation in _TRANSPOSED_ORIENTATIONS else (w, h)
+    scale = _reduce_scale(upright, max_length, min_width)
+
+    budget_factor = 1
+    if max_pixels and w * h > max_pixels:
+        budget_factor = _budget_factor(w, h, max_pixels) if img.format == 'JPEG' else 0
+        if not budget_factor:
+            raise ValueError(f'{img.format} {w}x{h} 超出解码像素预算 {max_pixels / 1e6:.0f} MP')
+
+    if scale < 1.0 or budget_factor > 1:
+        # 需要的解码尺寸（未摆正的原始方向）
+        req = (max(1, ceil(w * scale)), max(1, ceil(h * scale)))
+        if budget_factor > 1:
+            # draft 选取 <= min(w // req_w, h // req_h) 的最大倍数，请求 w // factor 保证至少缩小 factor 倍
+            req = (min(req[0], w // budget_factor), min(req[1], h // budget_factor))
+        if img.format == 'JPEG':
+            img.draft('RGB', req)
+        else:
+            factor = min(w // req[0], h // req[1])
+            if factor >= 2:
+                img = img.reduce(factor)
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    else:
+        img.load()
+    return apply_exif_orientation(img)
@@ -0,0 +1,156 @@
+"""
+进程内渲染任务队列：有界线程池执行任务，排队+执行中的任务数超过上限时拒绝提交（背压）。
+任务状态保存在内存中，完成后保留 result_ttl 秒供轮询。多 worker 部署时需让客户端轮询到同一进程
+（或替换为外部队列），接口保持不变。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import logging
+import threading
+import time
+import uuid
+
+# 默认值，实际取 config.py 中的同名配置
+JOB_WORKERS = 2
+JOB_QUEUE_MAX = 16
+JOB_RESULT_TTL = 3600
+
+# 各阶段对应的进度
+STAGE_PROGRESS = {
+    'queued': 0.0,
+    'decode': 0.1,
+    'render': 0.3,
+    'filter': 0.3,
+    'layout': 0.6,
+    'encode': 0.85,
+    'done': 1.0,
+}
+
+
+class QueueFull(RuntimeError):
+    """排队任务数已达上限。"""
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = 'queued'          # queued / running / done / error
+    stage: str = 'queued'
+    result: dict = field(default_factory=dict)
+    error: str = ''
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = 0.0
+
+    @property
+    def progress(self) -> float:
+        return STAGE_PROGRESS.get(self.stage, 0.0)
+
+    def snapshot(self) -> dict:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'result': dict(self.result),
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers=JOB_WORKERS, max_pending=JOB_QUEUE_MAX, result_ttl=JOB_RESULT_TTL):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='render-job')
+        self._jobs: dict = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, on_discard=None, **kwargs) -> Job:
+        """
+        fn(progress, *args, **kwargs) 的返回值（dict）作为任务结果；progress(stage) 用于上报阶段。
+        队列已满时抛出 QueueFull，此时会调用 on_discard() 释放调用方为任务准备的资源。
+        """
+        with self._lock:
+            self._expire_locked()
+            if self._pending >= self.max_pending:
+                if on_discard is not None:
+                    on_discard()
+                raise QueueFull(f'{self._pending} jobs pending (limit {self.max_pending})')
+            job = Job(id=uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            self._pending += 1
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def complete(self, result: dict) -> Job:
+        """登记一个已完成的任务（例如命中结果缓存），接口与正常任务一致，不占用队列。"""
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, status='done', stage='done', result=dict(result), finished_at=now)
+        with self._lock:
+            self._expire_locked()
+            self._jobs[job.id] = job
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs) -> None:
+        def progress(stage: str) -> None:
+            job.stage = stage
+
+        job.status = 'running'
+        try:
+            job.result = fn(progress, *args, **kwargs) or {}
+            job.stage = 'done'
+            job.status = 'done'
+        except Exception as e:
+            logging.info(f'render job {job.id} failed: {e}')
+            job.error = str(e)
+            job.status = 'error'
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job is not None else None
+
+    def queue_position(self, job_id: str) -> int:
+        """排在该任务之前、仍在等待执行的任务数；不在排队中时返回 0。"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != 'queued':
+                return 0
+            return sum(1 for j in self._jobs.values() if j.status == 'queued' and j.created_at < job.created_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'pending': self._pending, 'max_pending': self.max_pending, 'workers': self.max_workers, 'jobs': counts}
+
+    def _expire_locked(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        expired = [k for k, j in self._jobs.items() if j.finished_at and j.finished_at < cutoff]
+        for k in expired:
+            del self._jobs[k]
+
+
+_QUEUE = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_job_queue(config=None) -> JobQueue:
+    """进程内单例，首次使用时按 config 创建。"""
+    global _QUEUE
+    if _QUEUE is None:
+        with _QUEUE_LOCK:
+            if _QUEUE is None:
+                config = config or {}
+                _QUEUE = JobQueue(
+                    max_workers=config.get('JOB_WORKERS', JOB_WORKERS),
+                    max_pending=config.get('JOB_QUEUE_MAX', JOB_QUEUE_MAX),
+                    result_ttl=config.get('JOB_RESULT_TTL', JOB_RESULT_TTL),
+                )
+    return _QUEUE
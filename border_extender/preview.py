@@ -0,0 +1,272 @@
+"""
+滤镜预览：500px 宽的预览图只解码、缩放一次，多个滤镜在线程池中并行应用
+（LUT/numpy 与 Pillow 的大部分运算会释放 GIL）。
+结果可以拼成一张联系表（sprite，附每个滤镜的坐标），或作为 multipart/mixed 的多个 JPEG 部分返回。
+
+强度滑杆：按 (图片摘要, 预览尺寸, 滤镜) 缓存若干强度下的预览图（锚点），新的强度只做一次 uint8 blend。
+- LUT 滤镜对强度是线性的（只在最后做 base/mapped 混合），锚点为 s=0（原图）与 s=1
+- 其他滤镜（程序化胶片等）在 STRENGTH_SAMPLES 处采样，强度落在相邻两个采样点之间时线性插值；
+  采样点尚未算好时先按请求强度精确计算，同时在后台补齐采样点
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import threading
+import uuid
+from io import BytesIO
+
+from PIL import Image
+
+from . import add_bd
+from .image_io import open_rgb_reduced
+
+PREVIEW_WIDTH = 500
+PREVIEW_QUALITY = 50
+# 默认值，实际取 config.py 中的同名配置
+PREVIEW_BATCH_MAX = 32
+PREVIEW_WORKERS = None
+STRENGTH_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# 非线性滤镜的采样强度；s=0 时所有滤镜都输出原图
+STRENGTH_SAMPLES = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+
+def decode_preview(stream, max_pixels=None, width=PREVIEW_WIDTH) -> Image.Image:
+    """解码时用 DCT 缩小到不小于 width，再单次 resample 到 width 宽。"""
+    img = open_rgb_reduced(stream, min_width=width, max_pixels=max_pixels)
+    w, h = img.size
+    if w <= 0 or h <= 0:
+        raise ValueError('图片尺寸异常')
+    if w != width:
+        img = img.resize((width, max(1, int(round(h * width / float(w))))), Image.LANCZOS)
+    return img
+
+
+def encode_preview(img: Image.Image) -> bytes:
+    out = BytesIO()
+    img.save(out, format='JPEG', quality=PREVIEW_QUALITY, optimize=True, progressive=True, subsampling=0)
+    return out.getvalue()
+
+
+def _clamp_strength(value, default=0.5) -> float:
+    try:
+        s = float(value)
+    except (TypeError, ValueError):
+        s = default
+    return max(0.0, min(1.0, s))
+
+
+def parse_filter_specs(raw, default_strength=0.5, limit=PREVIEW_BATCH_MAX) -> list:
+    """
+    filters 参数 → [(filter_key, strength), ...]。
+    raw 为 JSON 数组，元素是滤镜名或 {"filter": 名称, "strength": 强度}；为空时使用全部滤镜。
+    未知滤镜名抛出 ValueError。
+    """
+    default_strength = _clamp_strength(default_strength)
+    items = json.loads(raw) if raw else list(add_bd.FILTER_HANDLERS)
+    if not isinstance(items, list):
+        raise ValueError('filters 必须是数组')
+    specs = []
+    for item in items:
+        if isinstance(item, dict):
+            key = item.get('filter') or item.get('filter_key') or 'none'
+            strength = _clamp_strength(item.get('strength', default_strength), default_strength)
+        else:
+            key, strength = item, default_strength
+        key = str(key).strip().lower()
+        if key not in add_bd.FILTER_HANDLERS:
+            raise ValueError(f'未知滤镜: {key}')
+        specs.append((key, strength))
+    if not specs:
+        raise ValueError('filters 为空')
+    if len(specs) > limit:
+        raise ValueError(f'一次最多预览 {limit} 个滤镜')
+    return specs
+
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_executor(max_workers=None) -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 1) + 2),
+                                               thread_name_prefix='filter-preview')
+    return _EXECUTOR
+
+
+def render_previews(img: Image.Image, specs: list, max_workers=None) -> list:
+    """
+    对同一张预览图并行应用各滤镜，按 specs 顺序返回 [(image, error), ...]；
+    单个滤镜失败（例如 LUT 文件缺失）时 image 为 None，不影响其他滤镜。
+    """
+    executor = _get_executor(max_workers)
+    futures = [executor.submit(add_bd.apply_filter, img, key, strength) for key, strength in specs]
+    results = []
+    for f in futures:
+        try:
+            results.append((f.result(), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def build_sprite(results: list, specs: list, columns: int = 4) -> tuple:
+    """
+    把成功的预览图按 columns 列拼成一张图，返回 (sprite, [{filter, strength, x, y, w, h}, ...])；
+    失败的滤镜不占位置，坐标项中只有 filter、strength 与 error。
+    """
+    images = [im for im, _ in results if im is not None]
+    columns = max(1, min(columns, len(images)))
+    tile_w = max(im.width for im in images)
+    tile_h = max(im.height for im in images)
+    rows = (len(images) + columns - 1) // columns
+    sprite = Image.new('RGB', (tile_w * columns, tile_h * rows))
+    coords = []
+    i = 0
+    for (im, error), (key, strength) in zip(results, specs):
+        if im is None:
+            coords.append({'filter': key, 'strength': strength, 'error': error})
+            continue
+        x, y = (i % columns) * tile_w, (i // columns) * tile_h
+        sprite.paste(im, (x, y))
+        coords.append({'filter': key, 'strength': strength, 'x': x, 'y': y, 'w': im.width, 'h': im.height})
+        i += 1
+    return sprite, coords
+
+
+def encode_multipart(parts: list) -> tuple:
+    """parts 为 [(headers dict, body bytes), ...]，返回 (body, content_type)。"""
+    boundary = uuid.uuid4().hex
+    out = BytesIO()
+    for headers, body in parts:
+        out.write(f'--{boundary}\r\n'.encode('ascii'))
+        for k, v in headers.items():
+            out.write(f'{k}: {v}\r\n'.encode('latin-1'))
+        out.write(b'\r\n')
+        out.write(body)
+        out.write(b'\r\n')
+    out.write(f'--{boundary}--\r\n'.encode('ascii'))
+    return out.getvalue(), f'multipart/mixed; boundary={boundary}'
+
+
+def is_linear_filter(filter_key: str) -> bool:
+    """输出是否为 s=0 与 s=1 结果按强度的线性混合（LUT 滤镜）。"""
+    return bool(getattr(add_bd.FILTER_HANDLERS.get(filter_key), 'linear_strength', False))
+
+
+class StrengthCache:
+    """(图片摘要, 预览尺寸, 滤镜) → {强度: 预览图}，按像素字节数 LRU。"""
+
+    def __init__(self, max_bytes=STRENGTH_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items: OrderedDict = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def anchors(self, key) -> dict:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return {}
+            self._items.move_to_end(key)
+            return dict(entry)
+
+    def add(self, key, strength: float, img: Image.Image) -> None:
+        nbytes = img.width * img.height * len(img.getbands())
+        with self._lock:
+            entry = self._items.setdefault(key, {})
+            self._items.move_to_end(key)
+            if strength in entry:
+                return
+            entry[strength] = img
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self.bytes -= sum(im.width * im.height * len(im.getbands()) for im in old.values())
+
+    def claim(self, key) -> bool:
+        """标记 key 的后台采样已开始；已在进行中时返回 False。"""
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            return True
+
+    def release(self, key) -> None:
+        with self._lock:
+            self._pending.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+_STRENGTH_CACHE = None
+
+
+def get_strength_cache(max_bytes=STRENGTH_CACHE_MAX_BYTES) -> StrengthCache:
+    global _STRENGTH_CACHE
+    if _STRENGTH_CACHE is None:
+        with _EXECUTOR_LOCK:
+            if _STRENGTH_CACHE is None:
+                _STRENGTH_CACHE = StrengthCache(max_bytes)
+    return _STRENGTH_CACHE
+
+
+def _sample_strengths(img, key, filter_key, strengths, cache) -> None:
+    try:
+        for s in strengths:
+            if s not in cache.anchors(key):
+                cache.add(key, s, add_bd.apply_filter(img, filter_key, s))
+    except Exception as e:
+        logging.info(f'strength samples for {filter_key} failed: {e}')
+    finally:
+        cache.release(key)
+
+
+def preview_at_strength(img: Image.Image, digest: str, filter_key: str, strength: float,
+                        cache: StrengthCache = None, max_workers=None) -> Image.Image:
+    """
+    img 为 500px 预览图，digest 为其来源图片的摘要。缓存命中时只做一次 Image.blend；
+    线性滤镜未命中时计算 s=1 结果后混合（代价与直接计算相同），非线性滤镜未命中时精确计算并在后台补齐采样点。
+    """
+    cache = cache or get_strength_cache()
+    strength = _clamp_strength(strength)
+    if filter_key not in add_bd.FILTER_HANDLERS:
+        # 与 apply_filter 一致：未知滤镜按 none 处理
+        filter_key = 'none'
+    if filter_key == 'none' or strength <= 0:
+        return img
+    # 同一张图的会话预览与上传预览缩放路径不同，高度可能差 1px，尺寸也是键的一部分
+    key = (digest, img.size, filter_key)
+    anchors = cache.anchors(key)
+
+    if is_linear_filter(filter_key):
+        full = anchors.get(1.0)
+        if full is None:
+            full = add_bd.apply_filter(img, filter_key, 1.0)
+            cache.add(key, 1.0, full)
+        return full if strength >= 1 else Image.blend(img.convert('RGB'), full, strength)
+
+    if strength in anchors:
+        return anchors[strength]
+    hi = min(s for s in STRENGTH_SAMPLES if s >= strength)
+    lo = max(s for s in STRENGTH_SAMPLES if s <= strength)
+    lo_img = img.convert('RGB') if lo == 0 else anchors.get(lo)
+    hi_img = anchors.get(hi)
+    if lo_img is not None and hi_img is not None:
+        return Image.blend(lo_img, hi_img, (strength - lo) / (hi - lo))
+
+    out = add_bd.apply_filter(img, filter_key, strength)
+    if cache.claim(key):
+        missing = [s for s in STRENGTH_SAMPLES if s > 0 and s not in anchors]
+        _get_executor(max_workers).submit(_sample_strengths, img, key, filter_key, missing, cache)
+    return out
@@ -0,0 +1,113 @@
+"""
+可选的多进程渲染后端：滤镜 + 边框排版（ImageDraw 文字、排版循环、主色提取等长时间持有 GIL 的部分）
+在子进程中执行，解码与 JPEG 编码仍在调用线程中完成。
+像素通过 multiprocessing.shared_memory 传递，不经过 pickle；只有 UploadOptions、块名称与 img.info
+（EXIF 等元数据，basic 系列格式据此生成边框文字）被序列化。
+
+config.py 中 RENDER_BACKEND = 'process' 时启用，进程数由 RENDER_PROCESSES 决定。
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import sys
+import threading
+
+from PIL import Image
+
+RENDER_BACKENDS = ('thread', 'process')
+
+# 进程池子进程与父进程共用同一个 resource_tracker（按名称去重）：创建时登记、unlink 时注销，
+# 附加方不需要额外处理。3.13+ 直接关闭跟踪，生命周期完全由本模块管理
+_TRACK_KW = {'track': False} if sys.version_info >= (3, 13) else {}
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    return shared_memory.SharedMemory(name=name, **_TRACK_KW)
+
+
+def _picklable_info(info: dict) -> dict:
+    """img.info 中可以跨进程传递的项（exif、icc_profile、dpi 等）。"""
+    return {k: v for k, v in info.items() if isinstance(v, (bytes, str, int, float, tuple))}
+
+
+def image_to_shm(img: Image.Image) -> tuple:
+    """把图像像素写入新建的共享内存块，返回 (shm, descriptor)；调用方负责 close/unlink。"""
+    data = img.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)), **_TRACK_KW)
+    shm.buf[:len(data)] = data
+    return shm, (shm.name, img.mode, img.size, len(data), _picklable_info(img.info))
+
+
+def image_from_shm(desc: tuple, unlink: bool = False) -> Image.Image:
+    """从共享内存块重建图像（复制到 Pillow 自己的内存，并恢复 img.info）后关闭该块；unlink=True 时同时释放。"""
+    name, mode, size, nbytes, info = desc
+    shm = _attach(name)
+    try:
+        view = shm.buf[:nbytes]
+        try:
+            img = Image.frombytes(mode, size, view)
+        finally:
+            view.release()
+        img.info.update(info)
+        return img
+    finally:
+        if unlink:
+            shm.unlink()
+        shm.close()
+
+
+def _render_worker(desc: tuple, opts) -> tuple:
+    """子进程：读取输入块 → render_image → 结果写入新块并返回其描述（由父进程释放）。"""
+    from .render_pipeline import render_image
+
+    img = image_from_shm(desc)
+    out = render_image(img, opts)
+    shm, out_desc = image_to_shm(out)
+    shm.close()
+    return out_desc
+
+
+class ProcessRenderPool:
+    def __init__(self, processes=None, start_method='spawn'):
+        self.processes = processes or os.cpu_count() or 1
+        ctx = multiprocessing.get_context(start_method)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=ctx)
+
+    def render_image(self, img: Image.Image, opts, progress=None) -> Image.Image:
+        """与 render_pipeline.render_image 相同，但在子进程中执行。"""
+        if progress is not None:
+            progress('render')
+        shm, desc = image_to_shm(img)
+        try:
+            out_desc = self._executor.submit(_render_worker, desc, opts).result()
+        finally:
+            shm.close()
+            shm.unlink()
+        return image_from_shm(out_desc, unlink=True)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_render_pool(config=None):
+    """RENDER_BACKEND 为 'process' 时返回进程内单例，否则返回 None（在调用线程中渲染）。"""
+    global _POOL
+    config = config or {}
+    backend = config.get('RENDER_BACKEND', 'thread')
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f'unknown render backend: {backend}')
+    if backend != 'process':
+        return None
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ProcessRenderPool(
+                    processes=config.get('RENDER_PROCESSES') or None,
+                    start_method=config.get('RENDER_START_METHOD', 'spawn'),
+                )
+    return _POOL
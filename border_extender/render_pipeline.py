@@ -0,0 +1,284 @@
+"""
+image_upload 的渲染流程（解析参数 → 解码 → 缩放 → 滤镜 → 边框排版 → JPEG 保存），
+同步接口与异步任务（jobs.py）共用。不依赖请求上下文，可在线程池中执行。
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import logging
+import os
+import threading
+import uuid
+
+from PIL import Image
+
+from . import add_bd
+from .add_bd import process_one_image, apply_filter
+from .encoding import (DEFAULT_ENCODE_PROFILE, DEFAULT_OUTPUT_FORMAT, encode_image, extension_for,
+                       negotiate_format, normalize_profile)
+from .image_io import open_rgb_reduced
+from .storage import shard_relpath
+from .upload_guard import UploadRejected, probe_image, UPLOAD_MAX_PIXELS, UPLOAD_HARD_MAX_PIXELS
+
+
+class RenderError(Exception):
+    """渲染失败；str(e) 即返回给客户端的错误信息。"""
+
+
+@dataclass(frozen=True)
+class UploadOptions:
+    add_black_border: bool = True
+    max_length: int = 2400
+    extend_to_square: bool = False
+    filter_key: str = 'none'
+    filter_strength: float = 0.5
+    format_key: str = 'basic1'
+    text: str = ''
+    logo_file: str = ''
+    suppli_info: str = ''
+    film_file: str = ''
+    output_format: str = DEFAULT_OUTPUT_FORMAT
+    encode_profile: str = DEFAULT_ENCODE_PROFILE
+    res_info: str = ''
+
+
+def _noop_progress(stage: str) -> None:
+    pass
+
+
+def parse_upload_options(form, accept=None) -> UploadOptions:
+    """
+    解析 control_params / infor_params 表单字段（不需要图片，先于解码执行）。
+    输出格式与编码档位取自 output_format / encode_profile 字段，未指定格式时按 accept（请求的 Accept 头）协商。
+    """
+    try:
+        #set default control parameters
+        add_black_border = True
+        max_length = 2400
+        extend_to_square=False
+        # default filter key
+        filter_key = 'none'
+        # default filter strength
+        filter_strength = 0.5
+        # default format key
+        format_key = 'basic1'
+
+        if 'control_params' in form:
+            params = json.loads(form.get('control_params', '{}'))
+            use_control_option=params.get('use_control_option') if params.get('use_control_option') else False
+            if use_control_option:
+              logging.info('收到控制参数，使用控制参数覆盖默认设定')
+              add_black_border = params.get('add_black_border') if params.get('add_black_border') else False
+              max_length = params.get('max_length') if params.get('max_length') else 2400
+              extend_to_square=params.get('extend_to_square') if params.get('extend_to_square') else False
+              # parse filter key from control params
+              filter_key = str(params.get('filter', 'none')).strip().lower()
+              # parse filter strength from control params, default 0.5
+              try:
+                  fs = float(params.get('filter_strength', 0.5))
+              except Exception:
+                  fs = 0.5
+              # clamp to [0,1]
+              filter_strength = max(0.0, min(1.0, fs))
+              # parse format key from control params
+              fmt = params.get('format')
+              if isinstance(fmt, str):
+                  candidate = fmt.strip()
+                  if candidate in add_bd.AVAILABLE_FORMAT_KEYS:
+                      format_key = candidate
+            else:
+              logging.info('不使用控制参数')
+        else:
+            logging.info('未收到控制参数，不使用控制参数')
+
+        #set default information
+        text=' \n\n '
+        logo_file='logos/hassel.jpg'
+        suppli_info=' '
+        film_file=''
+        if 'infor_params' in form:
+          params = json.loads(form.get('infor_params', '{}'))
+          use_info_option=params.get('use_info_option') if params.get('use_info_option') else False
+          if use_info_option:
+            res_info='收到处理选项,开始默认处理模式'
+            logging.info(res_info)
+            suppli_info = params.get('suppli_info') if params.get('suppli_info') else ' '
+            text = params.get('text') if params.get('text') else ' \n\n '
+            logo_file = params.get('logo_file') if params.get('logo_file') else 'logos/hassel.jpg'
+            film_file = params.get('film_file') if params.get('film_file') else (params.get('film_name') if params.get('film_name') else '')
+          else:
+              res_info='不使用信息参数'
+              logging.info(res_info)
+              text=''
+              logo_file=''
+              suppli_info=''
+        else:
+          res_info='没有收到处理选项,使用EXIF信息overwrite识别结果'
+          logging.info(res_info)
+          text=''
+          logo_file=''
+          suppli_info=''
+    except Exception as e:
+        logging.info(e)
+        raise RenderError(f'信息处理失败: {e}') from e
+
+    return UploadOptions(
+        add_black_border=add_black_border, max_length=max_length, extend_to_square=extend_to_square,
+        filter_key=filter_key, filter_strength=filter_strength, format_key=format_key,
+        text=text, logo_file=logo_file, suppli_info=suppli_info, film_file=film_file,
+        output_format=negotiate_format(form.get('output_format'), accept),
+        encode_profile=normalize_profile(form.get('encode_profile')),
+        res_info=res_info,
+    )
+
+
+def decode_upload(stream, opts: UploadOptions, max_pixels=UPLOAD_MAX_PIXELS, hard_max_pixels=UPLOAD_HARD_MAX_PIXELS) -> Image.Image:
+    """像素预算检查后按 max_length 缩小解码，并做最终的单次 resample。"""
+    max_length = opts.max_length
+    try:
+        # 解码前先读文件头做像素预算检查
+        stream.seek(0)
+        header = probe_image(stream, hard_max_pixels, max_pixels)
+        logging.info(f'image_upload: {header.format} {header.width}x{header.height}')
+
+        # 控制参数已解析：解码时直接用 DCT 缩放到不小于 max_length 的尺寸（超出像素预算时进一步缩小）
+        img = open_rgb_reduced(stream, max_length=max_length, max_pixels=max_pixels)
+    except UploadRejected as e:
+        raise RenderError(f'图片被拒绝: {e}') from e
+    except Exception as e:
+        logging.info(e)
+        raise RenderError(f'图片加载失败: {e}') from e
+
+    return fit_max_length(img, max_length)
+
+
+def fit_max_length(img: Image.Image, max_length) -> Image.Image:
+    """长边超过 max_length 时单次 LANCZOS 缩小，否则原样返回。"""
+    # Final resize: ensure long side <= max_length (single resample after reduced decoding)
+    try:
+        if isinstance(max_length, (int, float)) and max_length and max_length > 0:
+            w, h = img.size
+            long_side = max(w, h)
+            if long_side > max_length:
+                scale = float(max_length) / float(long_side)
+                new_w = max(1, int(round(w * scale)))
+                new_h = max(1, int(round(h * scale)))
+                img = img.resize((new_w, new_h), Image.LANCZOS)
+                logging.info(f'image_upload: resized from {w}x{h} to {new_w}x{new_h} (max_length={max_length})')
+            else:
+                logging.info(f'image_upload: no resize needed for size {w}x{h} (max_length={max_length})')
+    except Exception as e:
+        logging.info(f'image_upload: resize failed, continue without resize: {e}')
+    return img
+
+
+def render_image(img: Image.Image, opts: UploadOptions, progress=_noop_progress) -> Image.Image:
+    # apply filter
+    progress('filter')
+    try:
+        img=apply_filter(img,opts.filter_key, strength=opts.filter_strength)
+        logging.info(f'apply filter: {opts.filter_key} successful.')
+    except Exception as e:
+      logging.info(f'apply filter: {opts.filter_key} failed: {e}')
+    # apply border and text
+    progress('layout')
+    try:
+        return process_one_image(img,opts.text,opts.logo_file,opts.suppli_info,format=opts.format_key,max_length=opts.max_length,add_black_border=opts.add_black_border,square=opts.extend_to_square,film_file=opts.film_file)
+    except Exception as e:
+        raise RenderError(f'图片处理失败: {e}') from e
+
+
+def encode_result(img: Image.Image, opts: UploadOptions = None) -> bytes:
+    """按 opts 的输出格式与编码档位编码为字节（内存中），inline 响应与落盘共用。"""
+    opts = opts or UploadOptions()
+    try:
+        return encode_image(img, opts.output_format, opts.encode_profile)
+    except Exception as e:
+        raise RenderError(f'图片编码失败: {e}') from e
+
+
+def _new_relpath(fmt: str = DEFAULT_OUTPUT_FORMAT) -> str:
+    # 生成唯一的文件名
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    random_code = uuid.uuid4().hex[:8]
+    return shard_relpath(f'processed_{timestamp}_{random_code}{extension_for(fmt)}')
+
+
+def _write_bytes(data: bytes, output_dir: str, relpath: str) -> None:
+    filepath = os.path.join(output_dir, relpath)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    # 先写临时文件再改名，下载方不会读到写了一半的文件
+    tmp = f'{filepath}.{uuid.uuid4().hex[:8]}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, filepath)
+
+
+def save_result(img: Image.Image, output_dir: str, opts: UploadOptions = None) -> str:
+    """按 opts 编码后保存，返回相对于 output_dir 的分片路径（见 storage.shard_relpath）。"""
+    opts = opts or UploadOptions()
+    data = encode_result(img, opts)
+    relpath = _new_relpath(opts.output_format)
+    try:
+        _write_bytes(data, output_dir, relpath)
+        return relpath
+    except Exception as e:
+        raise RenderError(f'图片保存失败: {e}') from e
+
+
+_PERSIST_EXECUTOR = None
+_PERSIST_LOCK = threading.Lock()
+
+
+def persist_result_async(data: bytes, output_dir: str, fmt: str = DEFAULT_OUTPUT_FORMAT, on_saved=None) -> str:
+    """
+    在后台线程中把已编码的结果写入 output_dir，立即返回将要写入的相对路径。
+    写入完成后调用 on_saved(relpath)；写入失败只记录日志。
+    """
+    global _PERSIST_EXECUTOR
+    if _PERSIST_EXECUTOR is None:
+        with _PERSIST_LOCK:
+            if _PERSIST_EXECUTOR is None:
+                _PERSIST_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='persist-result')
+    relpath = _new_relpath(fmt)
+
+    def _persist():
+        try:
+            _write_bytes(data, output_dir, relpath)
+            if on_saved is not None:
+                on_saved(relpath)
+        except Exception as e:
+            logging.info(f'persist result {relpath} failed: {e}')
+
+    _PERSIST_EXECUTOR.submit(_persist)
+    return relpath
+
+
+def render_decoded(img: Image.Image, opts: UploadOptions, progress=_noop_progress, pool=None) -> Image.Image:
+    """已解码的图像（例如上传会话中保存的工作图）→ 缩放到 max_length → 滤镜 → 排版。"""
+    return _render(fit_max_length(img, opts.max_length), opts, progress, pool)
+
+
+def render_upload_image(stream, opts: UploadOptions, max_pixels=UPLOAD_MAX_PIXELS,
+                        hard_max_pixels=UPLOAD_HARD_MAX_PIXELS, progress=_noop_progress, pool=None) -> Image.Image:
+    """解码 → 滤镜 → 排版，返回未编码的结果图像；失败抛出 RenderError。"""
+    progress('decode')
+    return _render(decode_upload(stream, opts, max_pixels, hard_max_pixels), opts, progress, pool)
+
+
+def _render(img: Image.Image, opts: UploadOptions, progress, pool) -> Image.Image:
+    if pool is not None:
+        return pool.render_image(img, opts, progress)
+    return render_image(img, opts, progress)
+
+
+def render_upload(stream, opts: UploadOptions, output_dir: str, max_pixels=UPLOAD_MAX_PIXELS,
+                  hard_max_pixels=UPLOAD_HARD_MAX_PIXELS, progress=_noop_progress, pool=None) -> str:
+    """
+    完整流程：解码 → 滤镜 → 排版 → 保存到 output_dir，返回相对路径；失败抛出 RenderError。
+    pool 为 process_pool.ProcessRenderPool 时滤镜与排版在子进程中执行。
+    """
+    img = render_upload_image(stream, opts, max_pixels, hard_max_pixels, progress, pool)
+    progress('encode')
+    return save_result(img, output_dir, opts)
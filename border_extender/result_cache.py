@@ -0,0 +1,258 @@
+"""
+image_upload 结果缓存：键为 上传字节 + 规范化后的 UploadOptions 的摘要，命中时直接返回已生成的文件，
+不解码、不渲染。后端可替换：
+- memory: 进程内 LRU
+- disk:   索引以 JSON 文件保存在 RESULT_CACHE_DIR，按访问时间（mtime）LRU，多个进程/节点可共享同一目录
+两种后端都按结果文件总字节数限制大小，淘汰时同时删除对应的结果图片。
+同一个键已有可用的结果时 put 保留旧结果（先到先得）：相同上传并发渲染时，后完成的结果文件
+已经作为 URL 返回给了它的客户端，不能删除，交给 storage 的后台清理。
+"""
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+RESULT_CACHE_BACKENDS = ('none', 'memory', 'disk')
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RESULT_CACHE_DIR = 'cache/results'
+# 渲染结果发生变化（滤镜/排版调整）时递增，使旧缓存失效
+RESULT_CACHE_VERSION = 3
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    filename: str
+    res_info: str
+    nbytes: int
+
+
+def _options_hash(opts):
+    params = asdict(opts)
+    params.pop('res_info', None)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f'v{RESULT_CACHE_VERSION}\0'.encode())
+    h.update(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    h.update(b'\0')
+    return h
+
+
+def upload_digest(stream) -> str:
+    """上传内容的摘要；读取后把流位置恢复到开头。"""
+    h = hashlib.blake2b(digest_size=20)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(1 << 20), b''):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+def result_key(stream, opts) -> str:
+    """上传内容与渲染参数的摘要；读取后把流位置恢复到开头。"""
+    h = _options_hash(opts)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(1 << 20), b''):
+        h.update(chunk)
+    stream.seek(0)
+    return h.hexdigest()
+
+
+def session_result_key(session, opts) -> str:
+    """上传会话的结果缓存键：会话工作图由上传摘要与保存的尺寸决定。"""
+    h = _options_hash(opts)
+    h.update(f'session:{session.digest}:{session.full.width}x{session.full.height}'.encode())
+    return h.hexdigest()
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ResultCache:
+    """后端接口；output_dir 为结果图片所在目录。"""
+
+    def __init__(self, output_dir: str, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.output_dir = output_dir
+        self.max_bytes = max_bytes
+
+    def _result_path(self, filename: str) -> str:
+        return os.path.join(self.output_dir, filename)
+
+    def get(self, key: str):
+        return None
+
+    def put(self, key: str, filename: str, res_info: str = ''):
+        """登记结果并返回该键实际保存的 CachedResult；已有可用结果时保留旧结果。"""
+        return None
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryResultCache(ResultCache):
+    def __init__(self, output_dir: str, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        super().__init__(output_dir, max_bytes)
+        self.bytes = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if not os.path.isfile(self._result_path(entry.filename)):
+                # 结果文件已被外部清理
+                del self._items[key]
+                self.bytes -= entry.nbytes
+                return None
+            self._items.move_to_end(key)
+            return entry
+
+    def put(self, key: str, filename: str, res_info: str = ''):
+        try:
+            nbytes = os.path.getsize(self._result_path(filename))
+        except OSError:
+            return None
+        evicted = []
+        with self._lock:
+            old = self._items.get(key)
+            if old is not None:
+                if os.path.isfile(self._result_path(old.filename)):
+                    self._items.move_to_end(key)
+                    return old
+                # 旧结果文件已被外部清理，用新结果替换
+                del self._items[key]
+                self.bytes -= old.nbytes
+            entry = CachedResult(filename, res_info, nbytes)
+            self._items[key] = entry
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self.bytes -= old.nbytes
+                evicted.append(old.filename)
+        for name in evicted:
+            _remove_quietly(self._result_path(name))
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+class DiskResultCache(ResultCache):
+    def __init__(self, output_dir: str, index_dir: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        super().__init__(output_dir, max_bytes)
+        self.index_dir = index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        # 本进程对目录总大小的估计；超过上限时才扫描目录做真正的淘汰
+        self._approx_bytes = self._scan()[1]
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.index_dir, key[:2], key + '.json')
+
+    def _scan(self) -> tuple:
+        entries = []
+        total = 0
+        for root, _dirs, files in os.walk(self.index_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    mtime = os.path.getmtime(path)
+                except (OSError, ValueError):
+                    continue
+                entries.append((mtime, path, meta))
+                total += int(meta.get('nbytes', 0))
+        return entries, total
+
+    def get(self, key: str):
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.isfile(self._result_path(meta.get('filename', ''))):
+            _remove_quietly(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return CachedResult(meta['filename'], meta.get('res_info', ''), int(meta.get('nbytes', 0)))
+
+    def put(self, key: str, filename: str, res_info: str = ''):
+        try:
+            nbytes = os.path.getsize(self._result_path(filename))
+        except OSError:
+            return None
+        existing = self.get(key)
+        if existing is not None:
+            return existing
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'filename': filename, 'res_info': res_info, 'nbytes': nbytes, 'created_at': time.time()}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        with self._lock:
+            self._approx_bytes += nbytes
+            if self._approx_bytes > self.max_bytes:
+                self._evict_locked()
+        return CachedResult(filename, res_info, nbytes)
+
+    def _evict_locked(self) -> None:
+        entries, total = self._scan()
+        entries.sort(key=lambda e: e[0])
+        removed = 0
+        for _mtime, path, meta in entries:
+            if total <= self.max_bytes or len(entries) - removed <= 1:
+                break
+            _remove_quietly(path)
+            _remove_quietly(self._result_path(meta.get('filename', '')))
+            total -= int(meta.get('nbytes', 0))
+            removed += 1
+        if removed:
+            logging.info(f'result cache: evicted {removed} entries, {total} bytes kept')
+        self._approx_bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for _mtime, path, _meta in self._scan()[0]:
+                _remove_quietly(path)
+            self._approx_bytes = 0
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache(config, output_dir: str) -> ResultCache:
+    """按 RESULT_CACHE_BACKEND 创建的进程内单例；'none' 时返回不缓存的空实现。"""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                backend = config.get('RESULT_CACHE_BACKEND', 'memory')
+                max_bytes = config.get('RESULT_CACHE_MAX_BYTES', RESULT_CACHE_MAX_BYTES)
+                if backend == 'memory':
+                    _CACHE = MemoryResultCache(output_dir, max_bytes)
+                elif backend == 'disk':
+                    _CACHE = DiskResultCache(output_dir, config.get('RESULT_CACHE_DIR', RESULT_CACHE_DIR), max_bytes)
+                elif backend == 'none':
+                    _CACHE = ResultCache(output_dir, max_bytes)
+                else:
+                    raise ValueError(f'unknown result cache backend: {backend}')
+    return _CACHE
@@ -0,0 +1,298 @@
+"""
+上传会话：原图只上传、解码一次，保存两档工作图（full：长边 max_length；preview：500px 宽），
+之后的预览与渲染请求只带 session_id。
+会话保存在进程内 LRU（按像素字节数限制总量），超过 SESSION_TTL 未访问即过期；
+配置 SESSION_SPILL_DIR 时，内存中被挤出的会话以原始像素写入磁盘，再次访问时读回。
+多 worker 部署时与 jobs.py 相同，需让同一会话的请求落到同一进程（或共享 SESSION_SPILL_DIR）。
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from PIL import Image
+
+from .image_io import open_rgb_reduced
+from .preview import PREVIEW_WIDTH
+from .render_pipeline import fit_max_length
+
+# 默认值，实际取 config.py 中的同名配置
+SESSION_TTL = 1800
+SESSION_MAX_BYTES = 512 * 1024 * 1024
+SESSION_MAX_LENGTH = 2400
+SESSION_SPILL_DIR = None
+SESSION_DISK_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+_RE_SESSION_ID = re.compile(r'^[0-9a-f]{32}$')
+_LEVELS = ('full', 'preview')
+
+
+class SessionNotFound(KeyError):
+    """会话不存在或已过期。"""
+
+
+def _nbytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+@dataclass
+class UploadSession:
+    id: str
+    digest: str
+    full: Image.Image
+    preview: Image.Image
+    # 原图尺寸（文件头），未知时按 full 的尺寸
+    source_size: tuple = None
+    created_at: float = field(default_factory=time.time)
+    last_access: float = field(default_factory=time.time)
+
+    @property
+    def nbytes(self) -> int:
+        return _nbytes(self.full) + _nbytes(self.preview)
+
+    @property
+    def max_length(self) -> int:
+        """能按原图效果渲染的最大 max_length；原图本身不超过工作图时不受限制（返回 0）。"""
+        long_side = max(self.full.size)
+        return long_side if max(self.source_size or self.full.size) > long_side else 0
+
+    def covers(self, max_length) -> bool:
+        """按 max_length 渲染时工作图是否足够大（与直接上传原图得到相同尺寸）。"""
+        return not self.max_length or not max_length or max_length <= self.max_length
+
+    def describe(self, ttl: float) -> dict:
+        return {
+            'session_id': self.id,
+            'full_size': list(self.full.size),
+            'preview_size': list(self.preview.size),
+            'source_size': list(self.source_size or self.full.size),
+            # 渲染请求的 max_length 超过该值时被拒绝（0 表示不限制）
+            'max_length': self.max_length,
+            'expires_in': max(0, int(self.last_access + ttl - time.time())),
+        }
+
+
+def decode_session_images(stream, max_length=SESSION_MAX_LENGTH, max_pixels=None) -> tuple:
+    """解码一次得到 (full, preview)：full 长边不超过 max_length，preview 宽为 PREVIEW_WIDTH。"""
+    img = open_rgb_reduced(stream, max_length=max_length, min_width=PREVIEW_WIDTH, max_pixels=max_pixels)
+    full = fit_max_length(img, max_length)
+    w, h = img.size
+    preview = img.resize((PREVIEW_WIDTH, max(1, int(round(h * PREVIEW_WIDTH / float(w))))), Image.LANCZOS)
+    return full, preview
+
+
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL, max_bytes=SESSION_MAX_BYTES, spill_dir=SESSION_SPILL_DIR,
+                 disk_max_bytes=SESSION_DISK_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.bytes = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats = {'created': 0, 'hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'spilled': 0}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def create(self, digest: str, full: Image.Image, preview: Image.Image, source_size=None) -> UploadSession:
+        session = UploadSession(id=uuid.uuid4().hex, digest=digest, full=full, preview=preview,
+                                source_size=tuple(source_size) if source_size else None)
+        with self._lock:
+            self._stats['created'] += 1
+            # 先清理过期会话，避免按大小挤出仍在使用的会话
+            self._expire_locked(time.time())
+            self._insert_locked(session)
+            spill = self._evict_locked()
+        self._spill(spill)
+        return session
+
+    def get(self, session_id: str) -> UploadSession:
+        """取出会话并刷新访问时间；不存在或已过期时抛出 SessionNotFound。"""
+        if not _RE_SESSION_ID.match(session_id or ''):
+            raise SessionNotFound(session_id)
+        now = time.time()
+        with self._lock:
+            self._expire_locked(now)
+            session = self._items.get(session_id)
+            if session is not None:
+                session.last_access = now
+                self._items.move_to_end(session_id)
+                self._stats['hits'] += 1
+                return session
+
+        session = self._load(session_id)
+        if session is None:
+            with self._lock:
+                self._stats['misses'] += 1
+            raise SessionNotFound(session_id)
+        session.last_access = now
+        with self._lock:
+            self._stats['disk_hits'] += 1
+            self._insert_locked(session)
+            spill = self._evict_locked()
+        self._spill(spill)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._items.pop(session_id, None)
+            if session is not None:
+                self.bytes -= session.nbytes
+        removed = self._remove_spilled(session_id) if _RE_SESSION_ID.match(session_id or '') else False
+        return session is not None or removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out.update({'sessions': len(self._items), 'bytes': self.bytes, 'max_bytes': self.max_bytes, 'ttl': self.ttl})
+        return out
+
+    def _insert_locked(self, session: UploadSession) -> None:
+        old = self._items.pop(session.id, None)
+        if old is not None:
+            self.bytes -= old.nbytes
+        self._items[session.id] = session
+        self.bytes += session.nbytes
+
+    def _expire_locked(self, now: float) -> None:
+        cutoff = now - self.ttl
+        expired = [k for k, s in self._items.items() if s.last_access < cutoff]
+        for k in expired:
+            self.bytes -= self._items.pop(k).nbytes
+        self._stats['expired'] += len(expired)
+
+    def _evict_locked(self) -> list:
+        """超过内存上限时挤出最久未访问的会话，返回需要落盘的会话（在锁外写入）。"""
+        evicted = []
+        while self.bytes > self.max_bytes and len(self._items) > 1:
+            _, session = self._items.popitem(last=False)
+            self.bytes -= session.nbytes
+            evicted.append(session)
+        return evicted
+
+    # ---- 磁盘层 ----
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, session_id)
+
+    def _spill(self, sessions: list) -> None:
+        if not self.spill_dir or not sessions:
+            return
+        for session in sessions:
+            path = self._session_dir(session.id)
+            tmp = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+            try:
+                os.makedirs(tmp)
+                meta = {'digest': session.digest, 'created_at': session.created_at,
+                        'source_size': list(session.source_size or session.full.size), 'levels': {}}
+                for level in _LEVELS:
+                    img = getattr(session, level)
+                    with open(os.path.join(tmp, f'{level}.raw'), 'wb') as f:
+                        f.write(img.tobytes())
+                    meta['levels'][level] = [img.mode, img.width, img.height]
+                exif = session.full.info.get('exif')
+                if exif:
+                    with open(os.path.join(tmp, 'exif.bin'), 'wb') as f:
+                        f.write(exif)
+                with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+                    json.dump(meta, f)
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp, path)
+            except OSError as e:
+                logging.info(f'session spill {session.id} failed: {e}')
+                shutil.rmtree(tmp, ignore_errors=True)
+                continue
+            with self._lock:
+                self._stats['spilled'] += 1
+        self._prune_disk()
+
+    def _load(self, session_id: str):
+        if not self.spill_dir:
+            return None
+        path = self._session_dir(session_id)
+        with self._disk_lock:
+            try:
+                if time.time() - os.path.getmtime(os.path.join(path, 'meta.json')) > self.ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+                    return None
+                with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                images = {}
+                for level in _LEVELS:
+                    mode, w, h = meta['levels'][level]
+                    with open(os.path.join(path, f'{level}.raw'), 'rb') as f:
+                        images[level] = Image.frombytes(mode, (w, h), f.read())
+                exif_path = os.path.join(path, 'exif.bin')
+                if os.path.exists(exif_path):
+                    with open(exif_path, 'rb') as f:
+                        images['full'].info['exif'] = f.read()
+            except (OSError, ValueError, KeyError) as e:
+                logging.info(f'session load {session_id} failed: {e}')
+                return None
+            # 读回内存后磁盘副本不再需要
+            shutil.rmtree(path, ignore_errors=True)
+        source_size = meta.get('source_size')
+        return UploadSession(id=session_id, digest=meta.get('digest', ''), full=images['full'],
+                             preview=images['preview'], source_size=tuple(source_size) if source_size else None,
+                             created_at=meta.get('created_at', time.time()))
+
+    def _remove_spilled(self, session_id: str) -> bool:
+        if not self.spill_dir:
+            return False
+        path = self._session_dir(session_id)
+        if not os.path.isdir(path):
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def _prune_disk(self) -> None:
+        """删除过期的落盘会话，并按最早写入顺序删除到总大小不超过 disk_max_bytes。"""
+        with self._disk_lock:
+            entries = []
+            now = time.time()
+            for entry in os.scandir(self.spill_dir):
+                if not entry.is_dir() or not _RE_SESSION_ID.match(entry.name):
+                    continue
+                try:
+                    mtime = os.path.getmtime(os.path.join(entry.path, 'meta.json'))
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                except OSError:
+                    continue
+                if now - mtime > self.ttl:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                entries.append((mtime, size, entry.path))
+            total = sum(e[1] for e in entries)
+            for _mtime, size, path in sorted(entries):
+                if total <= self.disk_max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_session_store(config=None) -> SessionStore:
+    """进程内单例，首次使用时按 config 创建。"""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                config = config or {}
+                _STORE = SessionStore(
+                    ttl=config.get('SESSION_TTL', SESSION_TTL),
+                    max_bytes=config.get('SESSION_MAX_BYTES', SESSION_MAX_BYTES),
+                    spill_dir=config.get('SESSION_SPILL_DIR', SESSION_SPILL_DIR),
+                    disk_max_bytes=config.get('SESSION_DISK_MAX_BYTES', SESSION_DISK_MAX_BYTES),
+                )
+    return _STORE
@@ -0,0 +1,238 @@
+"""
+static/temp_images 的生命周期管理：
+- 结果文件按文件名摘要的前缀分片保存（<root>/<ab>/processed_xxx.jpg），避免单目录几十万个文件
+- 进程内索引记录每个文件的大小与最近访问时间；下载/缓存命中时更新访问时间（同时写入文件 atime，供其他进程的扫描看到；
+  mtime 保持不变，作为下载的 Last-Modified / ETag 依据）
+- 后台清理线程定期重新扫描目录同步索引，先删除超过 TTL 未访问的文件，再按 LRU 删除到总大小不超过上限；
+  写入中的 .tmp 文件在 STORAGE_TMP_GRACE 秒内不参与淘汰（超过后视为写入进程崩溃留下的残片）
+"""
+import hashlib
+import logging
+import os
+import stat
+import threading
+import time
+
+# 默认值，实际取 config.py 中的同名配置
+STORAGE_TTL = 24 * 3600
+STORAGE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+STORAGE_SWEEP_INTERVAL = 600
+STORAGE_TMP_GRACE = 3600
+
+
+def shard_relpath(filename: str) -> str:
+    """文件名 → 相对于存储根目录的分片路径；只由文件名决定，下载时可直接由文件名反推。"""
+    prefix = hashlib.blake2b(filename.encode('utf-8'), digest_size=1).hexdigest()
+    return f'{prefix}/{filename}'
+
+
+class StorageManager:
+    def __init__(self, root: str, ttl=STORAGE_TTL, max_bytes=STORAGE_MAX_BYTES, sweep_interval=STORAGE_SWEEP_INTERVAL,
+                 tmp_grace=STORAGE_TMP_GRACE):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.tmp_grace = tmp_grace
+        # relpath -> [size, last_access]
+        self._index: dict = {}
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats = {
+            'sweeps': 0,
+            'last_sweep_at': 0.0,
+            'last_sweep_ms': 0.0,
+            'evicted_ttl': 0,
+            'evicted_size': 0,
+            'evicted_bytes': 0,
+        }
+
+    def lookup(self, name: str):
+        """
+        文件名或分片相对路径 → (绝对路径, os.stat_result)；不存在或路径非法时返回 None。
+        兼容分片之前直接保存在根目录下的旧文件。
+        """
+        name = (name or '').replace('\\', '/').strip('/')
+        parts = name.split('/')
+        if not name or any(p in ('', '.', '..') for p in parts) or len(parts) > 2:
+            return None
+        filename = parts[-1]
+        candidates = [shard_relpath(filename), filename]
+        if len(parts) == 2:
+            candidates.insert(0, name)
+        for rel in candidates:
+            path = os.path.join(self.root, rel)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                return path, st
+        return None
+
+    def resolve(self, name: str):
+        """同 lookup，只返回绝对路径。"""
+        found = self.lookup(name)
+        return found[0] if found is not None else None
+
+    def register(self, relpath: str) -> None:
+        """新文件写入后登记大小与访问时间。"""
+        try:
+            size = os.path.getsize(os.path.join(self.root, relpath))
+        except OSError:
+            return
+        with self._lock:
+            self._index[relpath] = [size, time.time()]
+
+    def touch(self, path: str) -> None:
+        """记录一次访问；path 可以是 resolve() 返回的绝对路径或相对路径。"""
+        relpath = os.path.relpath(path, self.root) if os.path.isabs(path) else path
+        relpath = relpath.replace(os.sep, '/')
+        now = time.time()
+        with self._lock:
+            entry = self._index.get(relpath)
+            if entry is not None:
+                entry[1] = now
+        try:
+            path = os.path.join(self.root, relpath)
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except OSError:
+            pass
+
+    def _scan(self) -> dict:
+        found = {}
+
+        def add(rel, entry):
+            try:
+                st = entry.stat()
+            except OSError:
+                return
+            found[rel] = (st.st_size, max(st.st_atime, st.st_mtime))
+
+        try:
+            top = list(os.scandir(self.root))
+        except OSError:
+            return found
+        for entry in top:
+            if entry.is_dir(follow_symlinks=False):
+                try:
+                    with os.scandir(entry.path) as it:
+                        for sub in it:
+                            if sub.is_file(follow_symlinks=False):
+                                add(f'{entry.name}/{sub.name}', sub)
+                except OSError:
+                    continue
+            elif entry.is_file(follow_symlinks=False):
+                add(entry.name, entry)
+        return found
+
+    def sweep(self) -> dict:
+        """同步索引并按 TTL、总大小淘汰，返回本次统计。"""
+        with self._sweep_lock:
+            t0 = time.perf_counter()
+            found = self._scan()
+            with self._lock:
+                index = {}
+                for rel, (size, accessed) in found.items():
+                    old = self._index.get(rel)
+                    index[rel] = [size, max(accessed, old[1]) if old else accessed]
+                self._index = index
+                items = sorted(index.items(), key=lambda kv: kv[1][1])
+
+            now = time.time()
+            total = sum(v[0] for _, v in items)
+            evict_ttl, evict_size = [], []
+            for rel, (size, last_access) in items:
+                if rel.endswith('.tmp') and now - last_access < self.tmp_grace:
+                    # 可能仍在写入（render_pipeline._write_bytes 写完才 os.replace），删除会让结果保存失败
+                    continue
+                if self.ttl and now - last_access > self.ttl:
+                    evict_ttl.append(rel)
+                    total -= size
+                elif self.max_bytes and total > self.max_bytes:
+                    evict_size.append(rel)
+                    total -= size
+
+            freed = 0
+            for rel in evict_ttl + evict_size:
+                try:
+                    os.remove(os.path.join(self.root, rel))
+                except OSError:
+                    continue
+                with self._lock:
+                    entry = self._index.pop(rel, None)
+                if entry is not None:
+                    freed += entry[0]
+
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self._stats['sweeps'] += 1
+                self._stats['last_sweep_at'] = now
+                self._stats['last_sweep_ms'] = round(elapsed_ms, 1)
+                self._stats['evicted_ttl'] += len(evict_ttl)
+                self._stats['evicted_size'] += len(evict_size)
+                self._stats['evicted_bytes'] += freed
+            if evict_ttl or evict_size:
+                logging.info(f'storage sweep: removed {len(evict_ttl)} expired + {len(evict_size)} over cap, '
+                             f'{freed} bytes freed in {elapsed_ms:.0f} ms')
+            return self.stats()
+
+    def stats(self) -> dict:
+        with self._lock:
+            files = len(self._index)
+            total = sum(v[0] for v in self._index.values())
+            out = dict(self._stats)
+        out.update({
+            'files': files,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'sweep_interval': self.sweep_interval,
+            'sweeper_running': self._thread is not None and self._thread.is_alive(),
+        })
+        return out
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.info(f'storage sweep failed: {e}')
+            if self._stop.wait(self.sweep_interval):
+                return
+
+    def start(self) -> None:
+        """启动后台清理线程（启动时立即扫描一次建立索引）；sweep_interval 为 0 时不启动。"""
+        if not self.sweep_interval or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='storage-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_STORAGE = None
+_STORAGE_LOCK = threading.Lock()
+
+
+def get_storage(config, root: str) -> StorageManager:
+    """进程内单例，首次使用时按 config 创建。"""
+    global _STORAGE
+    if _STORAGE is None:
+        with _STORAGE_LOCK:
+            if _STORAGE is None:
+                os.makedirs(root, exist_ok=True)
+                _STORAGE = StorageManager(
+                    root,
+                    ttl=config.get('STORAGE_TTL', STORAGE_TTL),
+                    max_bytes=config.get('STORAGE_MAX_BYTES', STORAGE_MAX_BYTES),
+                    sweep_interval=config.get('STORAGE_SWEEP_INTERVAL', STORAGE_SWEEP_INTERVAL),
+                    tmp_grace=config.get('STORAGE_TMP_GRACE', STORAGE_TMP_GRACE),
+                )
+    return _STORAGE
@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+from io import BytesIO
+import tempfile
+
+from flask import Request, current_app
+from PIL import Image
+
+# 默认值，实际取 config.py 中的同名配置
+UPLOAD_SPOOL_THRESHOLD = 2 * 1024 * 1024
+UPLOAD_MAX_PIXELS = 60_000_000
+UPLOAD_HARD_MAX_PIXELS = 150_000_000
+
+
+class UploadRejected(ValueError):
+    """上传在解码前被拒绝（无法识别、像素超限或疑似解压炸弹）。"""
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    format: str
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+
+class SpooledUploadRequest(Request):
+    """上传文件超过 UPLOAD_SPOOL_THRESHOLD 时直接写入磁盘临时文件，不占用 worker 内存。"""
+
+    # 非文件表单字段（control_params 等）的内存上限
+    max_form_memory_size = 1024 * 1024
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        threshold = current_app.config.get('UPLOAD_SPOOL_THRESHOLD', UPLOAD_SPOOL_THRESHOLD)
+        if total_content_length is None or total_content_length > threshold:
+            return tempfile.TemporaryFile('rb+')
+        return BytesIO()
+
+
+def upload_limits(config=None) -> tuple:
+    """(max_pixels, hard_max_pixels)：超过前者只做缩小解码，超过后者直接拒绝。"""
+    config = config if config is not None else current_app.config
+    return (
+        config.get('UPLOAD_MAX_PIXELS', UPLOAD_MAX_PIXELS),
+        config.get('UPLOAD_HARD_MAX_PIXELS', UPLOAD_HARD_MAX_PIXELS),
+    )
+
+
+def probe_image(stream, hard_max_pixels=UPLOAD_HARD_MAX_PIXELS, max_pixels=None) -> ImageHeader:
+    """
+    只读取文件头得到格式与尺寸（不解码像素）。
+    超过 hard_max_pixels，或超过 max_pixels 且不是 JPEG（无法 DCT 缩小解码）时抛出 UploadRejected。
+    """
+    pos = stream.tell()
+    try:
+        with Image.open(stream) as img:
+            header = ImageHeader(img.format or '', img.width, img.height)
+    except Image.DecompressionBombError as e:
+        raise UploadRejected(f'图片像素过多: {e}') from e
+    except Exception as e:
+        raise UploadRejected(f'无法识别的图片: {e}') from e
+    finally:
+        stream.seek(pos)
+
+    if header.width <= 0 or header.height <= 0:
+        raise UploadRejected('图片尺寸异常')
+    if header.pixels > hard_max_pixels:
+        raise UploadRejected(
+            f'图片像素过多: {header.width}x{header.height} ({header.pixels / 1e6:.0f} MP) 超过上限 {hard_max_pixels / 1e6:.0f} MP'
+        )
+    if max_pixels and header.pixels > max_pixels and header.format != 'JPEG':
+        raise UploadRejected(
+            f'{header.format} 图片 {header.width}x{header.height} 超过解码像素预算 {max_pixels / 1e6:.0f} MP'
+        )
+    return header
+
+
+def stream_size(file_storage):
+    """上传文件的字节数；优先用 content_length，否则对（已落盘/内存中的）流 seek 到末尾。"""
+    size = getattr(file_storage, 'content_length', None)
+    if size:
+        return size
+    try:
+        stream = file_storage.stream
+        pos = stream.tell()
+        stream.seek(0, 2)
+        size = stream.tell()
+        stream.seek(pos)
+        return size
+    except Exception:
+        return None
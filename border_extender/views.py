@@ -1,18 +1,29 @@
 from datetime import datetime
-from flask import render_template, request, send_file, url_for, after_this_request, send_from_directory
+from flask import Response, render_template, request, send_file, url_for
 from werkzeug.routing import BuildError
 from border_extender.dao import delete_counterbyid, query_counterbyid, insert_counter, update_counterbyid
 from border_extender.model import Counters
 from border_extender.response import make_succ_empty_response, make_succ_response, make_err_response
-from PIL import Image,ImageDraw,ImageFont,ImageOps
-from PIL.ExifTags import TAGS
-import piexif
-import  os,glob,io
+import  os,io
+import shutil
+import tempfile
 import re
-import numpy as np
 import json
-import uuid
-from .add_bd import rotate_image_90_no_crop, process_one_image, apply_filter, AVAILABLE_FORMAT_KEYS as AVAILABLE_FORMAT_KEYS
+from urllib.parse import quote
+from PIL import Image
+from .preview import (build_sprite, decode_preview, encode_multipart, encode_preview, get_strength_cache,
+                      parse_filter_specs, preview_at_strength, render_previews)
+from .upload_guard import UploadRejected, probe_image, stream_size, upload_limits
+from .render_pipeline import (RenderError, encode_result, parse_upload_options, persist_result_async,
+                              render_decoded, render_upload, render_upload_image, save_result)
+from .jobs import QueueFull, get_job_queue
+from .process_pool import get_render_pool
+from .encoding import OUTPUT_FORMATS, mimetype_for
+from .result_cache import get_result_cache, result_key, session_result_key, upload_digest
+from .sessions import SessionNotFound, decode_session_images, get_session_store
+from .storage import get_storage
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.http import http_date, is_resource_modified
 import logging
 from run import app
 
@@ -33,6 +44,14 @@ temp_image_dir = 'temp_images'
 #     """
 #     return render_template('index.html')
 
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    limit = app.config.get('MAX_CONTENT_LENGTH')
+    resp = make_err_response(f'上传文件过大（上限 {limit / (1024 * 1024):.1f} MB）' if limit else '上传文件过大')
+    resp.status_code = 413
+    return resp
+
+
 @app.route('/api/debug_static')
 def debug_static():
     static_path = app.static_folder
@@ -321,183 +340,369 @@ def factorial():
 @app.route('/api/image_upload', methods=['POST'])
 def image_upload():
     """
-    上传一张图片
-    :return: 图片url
+    上传一张图片（或用 session_id 引用 /api/sessions 中已上传的图片）
+    :return: 图片url；response=inline 时直接返回 JPEG 字节（见 _inline_response）
     """
     # 获取请求体参数
     # 确保 tempimage 目录存在
     # os.makedirs('border_extender/static/'+temp_image_dir, exist_ok=True)
     os.makedirs(os.path.join(app.static_folder, temp_image_dir), exist_ok=True)
 
-    # params = request.get_json()
-    logging.info(request.files)
     logging.info(request.form)
-    # control_
-    #     infor_
-    # print(request)
     files = request.files
+    session = None
     # 检查img参数
-    if 'image' not in files:
-        return make_err_response('没有收到图片')
-    elif files['image'].filename == '':
+    if 'image' not in files or files['image'].filename == '':
+        if not request.values.get('session_id'):
             return make_err_response('没有收到图片')
+        try:
+            session = get_session_store(app.config).get(request.values.get('session_id'))
+        except SessionNotFound:
+            return _session_not_found()
     else:
         img_file = files['image']
-        # logging.info(img_file.stream)
+        # Log original upload size (bytes)
+        logging.info(f"Original upload size: {stream_size(img_file)} bytes")
+    max_pixels, hard_max_pixels = upload_limits()
+    try:
+        opts = parse_upload_options(request.values, request.headers.get('Accept'))
+    except RenderError as e:
+        return make_err_response(str(e))
+    if session is not None and not session.covers(opts.max_length):
+        return _session_too_small(session, opts)
+
+    # 相同图片 + 相同参数：直接返回已生成的结果，不解码、不渲染
+    cache = _result_cache()
+    key = session_result_key(session, opts) if session is not None else result_key(img_file.stream, opts)
+    hit = cache.get(key)
+    if hit is not None:
+        logging.info(f'image_upload: result cache hit {key[:12]} -> {hit.filename}')
+        _storage().touch(hit.filename)
+        image_url = url_for('static', filename=f"{temp_image_dir}/{hit.filename}", _external=True)
+        if _wants_inline():
+            # 与未命中时的响应相同（同一组响应头、不带 ETag / Content-Disposition）；尺寸只读文件头
+            path = os.path.join(app.static_folder, temp_image_dir, hit.filename)
+            with open(path, 'rb') as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as probe:
+                size = probe.size
+            resp = Response(data, mimetype=mimetype_for(hit.filename))
+            return _with_result_headers(resp, opts, image_url, size)
+        return make_succ_response({
+        'image_url': image_url,
+        'res_info': opts.res_info
+        })
+
+    pool = get_render_pool(app.config)
+    if session is not None:
+        # 会话中保存的是已解码、已缩放的工作图，跳过上传与解码
+        render = lambda: render_decoded(session.full, opts, pool=pool)
+    else:
+        render = lambda: render_upload_image(img_file.stream, opts, max_pixels=max_pixels,
+                                             hard_max_pixels=hard_max_pixels, pool=pool)
+
+    if _wants_inline():
+        return _inline_response(render, opts, cache, key)
+
+    try:
+        filename = save_result(render(), os.path.join(app.static_folder, temp_image_dir), opts)
+        # 微信小程序无法接收二进制文件流，这是因为uploadfile和request.files之间的区别导致的，这个问题时微信自己的api限制，并不是本程序的问题
+    except RenderError as e:
+        return make_err_response(str(e))
+    _storage().register(filename)
+    cache.put(key, filename, opts.res_info)
+
+    image_url = url_for('static', filename=f"{temp_image_dir}/{filename}", _external=True)
+    return make_succ_response({
+    'image_url': image_url,
+    'res_info': opts.res_info
+    })
+
+
+def _wants_inline() -> bool:
+    return (request.values.get('response') or '').strip().lower() == 'inline'
+
+
+def _flag(value) -> bool:
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _with_result_headers(resp, opts, image_url=None, size=None):
+    # 响应头只能是 latin-1，res_info 等中文信息做百分号编码
+    resp.headers['X-Res-Info'] = quote(opts.res_info or '')
+    if size is not None:
+        resp.headers['X-Image-Width'] = str(size[0])
+        resp.headers['X-Image-Height'] = str(size[1])
+    if image_url:
+        resp.headers['X-Image-Url'] = image_url
+    resp.headers['Cache-Control'] = 'no-store'
+    # 输出格式可能由 Accept 头协商得到
+    resp.vary.add('Accept')
+    return resp
+
+
+def _inline_response(render, opts, cache, key):
+    """
+    一次往返：render() 的结果在内存中编码后直接作为响应体返回，不写盘。
+    persist=1 时在后台线程落盘（写入完成后登记到存储与结果缓存），X-Image-Url 给出之后可下载的地址。
+    注意 X-Image-Url 随响应立即返回，此时文件可能还没写完：紧接着请求该地址可能得到 404，
+    客户端应优先使用响应体，稍后（或 404 时短暂重试）再通过该地址下载。
+    """
+    try:
+        img = render()
+        data = encode_result(img, opts)
+    except RenderError as e:
+        return make_err_response(str(e))
+
+    image_url = None
+    if _flag(request.values.get('persist')):
+        def on_saved(relpath):
+            _storage().register(relpath)
+            cache.put(key, relpath, opts.res_info)
+
+        relpath = persist_result_async(data, os.path.join(app.static_folder, temp_image_dir), opts.output_format,
+                                       on_saved=on_saved)
+        image_url = url_for('static', filename=f"{temp_image_dir}/{relpath}", _external=True)
+
+    resp = Response(data, mimetype=OUTPUT_FORMATS[opts.output_format][1])
+    return _with_result_headers(resp, opts, image_url, img.size)
+
+
+def _result_cache():
+    return get_result_cache(app.config, os.path.join(app.static_folder, temp_image_dir))
+
+
+def _storage():
+    return get_storage(app.config, os.path.join(app.static_folder, temp_image_dir))
+
+
+def _session_not_found():
+    resp = make_err_response('会话不存在或已过期，请重新上传')
+    resp.status_code = 404
+    return resp
+
+
+def _session_too_small(session, opts):
+    # 工作图按创建会话时的 max_length 保存，不能放大后冒充原图效果
+    return make_err_response(f'max_length={opts.max_length} 超过会话工作图的长边 {session.max_length}，'
+                             f'请在创建会话时指定更大的 max_length 或直接上传原图')
+
+
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    """
+    上传一次原图，保存解码后的工作图（长边 max_length 与 500px 预览），
+    之后 image_upload / filter_preview / jobs 接口用 session_id 代替 image。
+    原图大于 max_length 时，之后 max_length 更大的渲染请求会被拒绝（不会静默输出较小的图）。
+    :return: session_id、两档工作图尺寸、原图尺寸、可渲染的最大 max_length（0 为不限制）与剩余有效秒数
+    """
+    files = request.files
+    if 'image' not in files or files['image'].filename == '':
+        return make_err_response('没有收到图片')
+    img_file = files['image']
+    try:
+        max_length = int(request.values.get('max_length') or app.config.get('SESSION_MAX_LENGTH', 2400))
+    except ValueError:
+        return make_err_response('max_length 参数错误')
+    if max_length <= 0:
+        return make_err_response('max_length 参数错误')
+
+    max_pixels, hard_max_pixels = upload_limits()
+    try:
+        img_file.stream.seek(0)
+        header = probe_image(img_file.stream, hard_max_pixels, max_pixels)
+        digest = upload_digest(img_file.stream)
+        full, preview = decode_session_images(img_file.stream, max_length, max_pixels)
+    except UploadRejected as e:
+        return make_err_response(f'图片被拒绝: {e}')
+    except Exception as e:
+        logging.info(f'create_session: 图片加载失败: {e}')
+        return make_err_response(f'图片加载失败: {e}')
+
+    store = get_session_store(app.config)
+    session = store.create(digest, full, preview, source_size=(header.width, header.height))
+    return make_succ_response(session.describe(store.ttl))
+
+
+@app.route('/api/sessions/<session_id>', methods=['GET', 'DELETE'])
+def session_detail(session_id):
+    """
+    GET 查询会话（同时刷新有效期），DELETE 提前释放
+    """
+    store = get_session_store(app.config)
+    if request.method == 'DELETE':
+        if not store.delete(session_id):
+            return _session_not_found()
+        return make_succ_empty_response()
+    try:
+        session = store.get(session_id)
+    except SessionNotFound:
+        return _session_not_found()
+    return make_succ_response(session.describe(store.ttl))
+
+
+def _render_job(progress, spool, opts, output_dir, max_pixels, hard_max_pixels, pool, cache=None, key=None):
+    try:
+        filename = render_upload(spool, opts, output_dir, max_pixels=max_pixels,
+                                 hard_max_pixels=hard_max_pixels, progress=progress, pool=pool)
+    finally:
+        spool.close()
+    _storage().register(filename)
+    if cache is not None and key:
+        cache.put(key, filename, opts.res_info)
+    return {'filename': filename, 'res_info': opts.res_info}
+
+
+def _render_session_job(progress, session, opts, output_dir, pool, cache=None, key=None):
+    progress('render')
+    img = render_decoded(session.full, opts, progress=progress, pool=pool)
+    progress('encode')
+    filename = save_result(img, output_dir, opts)
+    _storage().register(filename)
+    if cache is not None and key:
+        cache.put(key, filename, opts.res_info)
+    return {'filename': filename, 'res_info': opts.res_info}
+
+
+@app.route('/api/jobs/image_upload', methods=['POST'])
+def submit_image_job():
+    """
+    异步版 image_upload：参数与 image_upload 相同，立即返回 job_id，
+    之后轮询 /api/jobs/<job_id> 获取进度与 image_url。队列已满时返回 503 + Retry-After。
+    """
+    os.makedirs(os.path.join(app.static_folder, temp_image_dir), exist_ok=True)
+    files = request.files
+    session = None
+    if 'image' not in files or files['image'].filename == '':
+        if not request.values.get('session_id'):
+            return make_err_response('没有收到图片')
         try:
-            # Log original upload size (bytes)
-            original_size_bytes = getattr(img_file, 'content_length', None)
-            if not original_size_bytes:
-                try:
-                    cur_pos = img_file.stream.tell()
-                    img_file.stream.seek(0, os.SEEK_END)
-                    original_size_bytes = img_file.stream.tell()
-                    img_file.stream.seek(cur_pos)
-                except Exception:
-                    original_size_bytes = None
-            logging.info(f"Original upload size: {original_size_bytes} bytes")
+            session = get_session_store(app.config).get(request.values.get('session_id'))
+        except SessionNotFound:
+            return _session_not_found()
+    else:
+        img_file = files['image']
+    max_pixels, hard_max_pixels = upload_limits()
+    try:
+        opts = parse_upload_options(request.values, request.headers.get('Accept'))
+        if session is None:
+            # 提交前只读文件头，超限的图片不进入队列
+            img_file.stream.seek(0)
+            probe_image(img_file.stream, hard_max_pixels, max_pixels)
+    except RenderError as e:
+        return make_err_response(str(e))
+    except UploadRejected as e:
+        return make_err_response(f'图片被拒绝: {e}')
+    if session is not None and not session.covers(opts.max_length):
+        return _session_too_small(session, opts)
+
+    queue = get_job_queue(app.config)
+    cache = _result_cache()
+    key = session_result_key(session, opts) if session is not None else result_key(img_file.stream, opts)
+    hit = cache.get(key)
+    if hit is not None:
+        # 命中结果缓存：登记为已完成的任务，客户端按原流程轮询即可
+        logging.info(f'submit_image_job: result cache hit {key[:12]} -> {hit.filename}')
+        _storage().touch(hit.filename)
+        job = queue.complete({'filename': hit.filename, 'res_info': opts.res_info})
+        return make_succ_response({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('image_job_status', job_id=job.id, _external=True),
+        })
 
+    output_dir = os.path.join(app.static_folder, temp_image_dir)
+    try:
+        if session is not None:
+            job = queue.submit(_render_session_job, session, opts, output_dir, get_render_pool(app.config),
+                               cache, key)
+        else:
+            # 请求结束后 werkzeug 会关闭上传流，先复制一份（大文件落盘）交给任务
+            spool = tempfile.SpooledTemporaryFile(max_size=app.config.get('UPLOAD_SPOOL_THRESHOLD', 2 * 1024 * 1024))
             img_file.stream.seek(0)
-            img = Image.open(img_file.stream).convert('RGB')
-        except Exception as e:
-            logging.info(e)
-            return make_err_response(f'图片加载失败: {e}')
-        try:
-            #set default control parameters
-            add_black_border = True
-            max_length = 2400
-            extend_to_square=False
-            # default filter key
-            filter_key = 'none'
-            # default filter strength
-            filter_strength = 0.5
-            # default format key
-            format_key = 'basic1'
-            # default film name
-            
-            if 'control_params' in request.form:
-                params = json.loads(request.form.get('control_params', '{}'))
-                use_control_option=params.get('use_control_option') if params.get('use_control_option') else False
-                if use_control_option:
-                  logging.info('收到控制参数，使用控制参数覆盖默认设定')
-                  add_black_border = params.get('add_black_border') if params.get('add_black_border') else False
-                  max_length = params.get('max_length') if params.get('max_length') else 2400
-                  extend_to_square=params.get('extend_to_square') if params.get('extend_to_square') else False
-                  # parse filter key from control params
-                  filter_key = str(params.get('filter', 'none')).strip().lower()
-                  # parse filter strength from control params, default 0.5
-                  try:
-                      fs = float(params.get('filter_strength', 0.5))
-                  except Exception:
-                      fs = 0.5
-                  # clamp to [0,1]
-                  filter_strength = max(0.0, min(1.0, fs))
-                  # parse format key from control params
-                  fmt = params.get('format')
-                  if isinstance(fmt, str):
-                      candidate = fmt.strip()
-                      if candidate in AVAILABLE_FORMAT_KEYS:
-                          format_key = candidate
-                  
-                else:
-                  logging.info('不使用控制参数')
-            else:
-                logging.info('未收到控制参数，不使用控制参数')
-
-            # Early resize to reduce compute: ensure long side <= max_length
-            try:
-                if isinstance(max_length, (int, float)) and max_length and max_length > 0:
-                    w, h = img.size
-                    long_side = max(w, h)
-                    if long_side > max_length:
-                        scale = float(max_length) / float(long_side)
-                        new_w = max(1, int(round(w * scale)))
-                        new_h = max(1, int(round(h * scale)))
-                        img = img.resize((new_w, new_h), Image.LANCZOS)
-                        logging.info(f'image_upload: resized from {w}x{h} to {new_w}x{new_h} (max_length={max_length})')
-                    else:
-                        logging.info(f'image_upload: no resize needed for size {w}x{h} (max_length={max_length})')
-            except Exception as e:
-                logging.info(f'image_upload: early resize failed, continue without resize: {e}')
-
-            #set default information
-            text=' \n\n '
-            logo_file='logos/hassel.jpg'
-            suppli_info=' '
-            film_file=''
-            if 'infor_params' in request.form:
-              params = json.loads(request.form.get('infor_params', '{}'))
-              use_info_option=params.get('use_info_option') if params.get('use_info_option') else False
-              if use_info_option:
-                res_info='收到处理选项,开始默认处理模式'
-                logging.info(res_info)
-                suppli_info = params.get('suppli_info') if params.get('suppli_info') else ' '
-                text = params.get('text') if params.get('text') else ' \n\n '
-                logo_file = params.get('logo_file') if params.get('logo_file') else 'logos/hassel.jpg'
-                film_file = params.get('film_file') if params.get('film_file') else (params.get('film_name') if params.get('film_name') else '')
-              # img=process_one_image(img,text,logo_file,suppli_info,max_length,add_black_border)
-              else:
-                  res_info='不使用信息参数'
-                  logging.info(res_info)
-                  text=''
-                  logo_file=''
-                  suppli_info=''
+            shutil.copyfileobj(img_file.stream, spool)
+            spool.seek(0)
+            job = queue.submit(_render_job, spool, opts, output_dir, max_pixels, hard_max_pixels,
+                               get_render_pool(app.config), cache, key, on_discard=spool.close)
+    except QueueFull as e:
+        logging.info(f'submit_image_job: queue full: {e}')
+        resp = make_err_response('服务繁忙，请稍后重试')
+        resp.status_code = 503
+        resp.headers['Retry-After'] = str(app.config.get('JOB_RETRY_AFTER', 2))
+        return resp
+
+    return make_succ_response({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('image_job_status', job_id=job.id, _external=True),
+    })
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def image_job_status(job_id):
+    """
+    :return: 任务状态 status(queued/running/done/error)、stage、progress，完成后返回 image_url
+    """
+    queue = get_job_queue(app.config)
+    job = queue.get(job_id)
+    if job is None:
+        resp = make_err_response('任务不存在或已过期')
+        resp.status_code = 404
+        return resp
+
+    payload = {k: job[k] for k in ('job_id', 'status', 'stage', 'progress')}
+    if job['status'] == 'queued':
+        payload['queue_position'] = queue.queue_position(job_id)
+    elif job['status'] == 'done':
+        result = job['result']
+        payload['image_url'] = url_for('static', filename=f"{temp_image_dir}/{result['filename']}", _external=True)
+        payload['res_info'] = result.get('res_info', '')
+    elif job['status'] == 'error':
+        payload['error'] = job['error']
+    return make_succ_response(payload)
 
-            else:
-              res_info='没有收到处理选项,使用EXIF信息overwrite识别结果'
-              logging.info(res_info)
-              text=''
-              logo_file=''
-              suppli_info=''
-              
-        except Exception as e:
-            logging.info(e)
-
-            return make_err_response(f'信息处理失败: {e}')
-        # apply filter
-        try:
-            img=apply_filter(img,filter_key, strength=filter_strength)
-            logging.info(f'apply filter: {filter_key} successful.')
-        except Exception as e:
-          logging.info(f'apply filter: {filter_key} failed: {e}')
-        # apply border and text
-        try:
-            img=process_one_image(img,text,logo_file,suppli_info,format=format_key,max_length=max_length,add_black_border=add_black_border,square=extend_to_square,film_file=film_file)
-            # 微信小程序无法接收二进制文件流，这是因为uploadfile和request.files之间的区别导致的，这个问题时微信自己的api限制，并不是本程序的问题
-            # # 返回处理后的图片(图片流)
-        except Exception as e:
-          return make_err_response(f'图片处理失败: {e}')
-        
+
+@app.route('/api/storage/stats', methods=['GET'])
+def storage_stats():
+    """
+    :return: temp_images 的文件数、总字节数与清理线程统计
+    """
+    return make_succ_response(_storage().stats())
+
+
+def _preview_source(endpoint, with_digest=False):
+    """
+    预览用的 500px 图像：上传了 image 时解码（DCT 缩放，避免完整解码几千万像素的原图），
+    否则取 session_id 对应会话中预先缩放好的预览图。
+    返回 (img, digest, None) 或 (None, None, 错误响应)；digest 为来源图片的摘要（with_digest=True 时计算）。
+    """
+    files = request.files
+    if 'image' not in files or not files['image'] or files['image'].filename == '':
+        if not request.values.get('session_id'):
+            return None, None, make_err_response('没有收到图片')
         try:
-            # 生成唯一的文件名
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            random_code = uuid.uuid4().hex[:8]
-            filename = f'processed_{timestamp}_{random_code}.jpg'
-            filepath = os.path.join(app.static_folder, temp_image_dir, filename)
-            img.save(filepath, 'JPEG', quality=80, optimize=True, progressive=True, subsampling=0)
-            # filename = f'processed_{timestamp}_{random_code}.webp'
-            # filepath = os.path.join(app.static_folder, temp_image_dir, filename)
-            # img.save(filepath, 'WEBP', quality=90, method=6)
-            image_url = url_for('static', filename=f"{temp_image_dir}/{filename}", _external=True)
-            
-
-            return make_succ_response({
-            'image_url': image_url,
-            'res_info': res_info
-            })
+            session = get_session_store(app.config).get(request.values.get('session_id'))
+            return session.preview, session.digest, None
+        except SessionNotFound:
+            return None, None, _session_not_found()
+
+    img_file = files['image']
+    try:
+        max_pixels, hard_max_pixels = upload_limits()
+        img_file.stream.seek(0)
+        probe_image(img_file.stream, hard_max_pixels, max_pixels)
+        digest = upload_digest(img_file.stream) if with_digest else None
+        return decode_preview(img_file.stream, max_pixels=max_pixels), digest, None
+    except UploadRejected as e:
+        return None, None, make_err_response(f'图片被拒绝: {e}')
+    except Exception as e:
+        logging.info(f'{endpoint}: 图片加载失败: {e}')
+        return None, None, make_err_response(f'图片加载失败: {e}')
 
-        except Exception as e:
-          return make_err_response(f'图片保存失败: {e}')
 
 @app.route('/api/filter_preview', methods=['POST'])
 def filter_preview():
   # Only accept multipart form upload: image + filter params
-  files = request.files
-  if 'image' not in files or not files['image'] or files['image'].filename == '':
-      return make_err_response('没有收到图片')
-
-  img_file = files['image']
-
   # Parse filter params
   filter_key = (request.form.get('filter') or request.form.get('filter_key') or 'none').strip().lower()
   try:
@@ -506,115 +711,151 @@ def filter_preview():
       filter_strength = 0.5
   filter_strength = max(0.0, min(1.0, filter_strength))
 
-  try:
-      img_file.stream.seek(0)
-      img = Image.open(img_file.stream).convert('RGB')
-  except Exception as e:
-      logging.info(f'filter_preview: 图片加载失败: {e}')
-      return make_err_response(f'图片加载失败: {e}')
-  
-  try:
-      target_w = 500
-      w, h = img.size
-      if w <= 0 or h <= 0:
-          return make_err_response('图片尺寸异常')
-      if w != target_w:
-          scale = float(target_w) / float(w)
-          target_h = max(1, int(round(h * scale)))
-          img = img.resize((target_w, target_h), Image.LANCZOS)
-  except Exception as e:
-      logging.info(f'filter_preview: resize failed: {e}')
-      return make_err_response(f'resize失败: {e}')
+  img, digest, err = _preview_source('filter_preview', with_digest=True)
+  if err is not None:
+      return err
 
   try:
-      img = apply_filter(img, filter_key, strength=filter_strength)
+      # 同一张图、同一滤镜只算一次（或几个采样强度），拖动强度滑杆时只做一次 blend
+      img = preview_at_strength(img, digest, filter_key, filter_strength, get_strength_cache(
+          app.config.get('STRENGTH_CACHE_MAX_BYTES', 128 * 1024 * 1024)), app.config.get('PREVIEW_WORKERS'))
   except Exception as e:
       logging.info(f'filter_preview: apply_filter failed (filter={filter_key}, strength={filter_strength}): {e}')
       return make_err_response(f'滤镜处理失败: {e}')
 
   
   try:
-      out = io.BytesIO()
-      img.save(out, format='JPEG', quality=50, optimize=True, progressive=True, subsampling=0)
-      out.seek(0)
-      return send_file(out, mimetype='image/jpeg')
+      return send_file(io.BytesIO(encode_preview(img)), mimetype='image/jpeg')
 
   except Exception as e:
       logging.info(f'filter_preview: save failed: {e}')
       return make_err_response(f'save失败: {e}')
 
-@app.route('/api/image_download', methods=['POST'])
+
+@app.route('/api/filter_preview/batch', methods=['POST'])
+def filter_preview_batch():
+    """
+    一次上传、一次解码，返回多个滤镜的预览。
+    表单：image、filters（JSON 数组，元素为滤镜名或 {"filter", "strength"}，缺省为全部滤镜）、
+    filter_strength（默认强度）、layout（sprite / multipart，默认 sprite）、columns（sprite 列数，默认 4）
+    :return: sprite 为一张 JPEG，各滤镜坐标在 X-Sprite-Map 响应头（JSON）；multipart 为 multipart/mixed，每个滤镜一个 JPEG
+    """
+    try:
+        specs = parse_filter_specs(request.form.get('filters'), request.form.get('filter_strength', 0.5),
+                                   limit=app.config.get('PREVIEW_BATCH_MAX', 32))
+    except ValueError as e:
+        return make_err_response(f'滤镜参数错误: {e}')
+    layout = (request.form.get('layout') or 'sprite').strip().lower()
+    if layout not in ('sprite', 'multipart'):
+        return make_err_response(f'不支持的 layout: {layout}')
+
+    img, _digest, err = _preview_source('filter_preview_batch')
+    if err is not None:
+        return err
+
+    results = render_previews(img, specs, app.config.get('PREVIEW_WORKERS'))
+    if all(im is None for im, _ in results):
+        logging.info(f'filter_preview_batch: all filters failed: {results[0][1]}')
+        return make_err_response(f'滤镜处理失败: {results[0][1]}')
+
+    if layout == 'multipart':
+        parts = []
+        for (key, strength), (preview, error) in zip(specs, results):
+            headers = {
+                'Content-Disposition': f'inline; name="{key}"',
+                'X-Filter': key,
+                'X-Filter-Strength': f'{strength:g}',
+            }
+            if preview is None:
+                # 单个滤镜失败：该部分为 JSON 错误信息
+                headers['Content-Type'] = 'application/json'
+                parts.append((headers, json.dumps({'error': error}).encode('utf-8')))
+            else:
+                headers['Content-Type'] = 'image/jpeg'
+                parts.append((headers, encode_preview(preview)))
+        body, content_type = encode_multipart(parts)
+        return Response(body, content_type=content_type)
+
+    try:
+        columns = int(request.form.get('columns', 4))
+    except ValueError:
+        columns = 4
+    sprite, coords = build_sprite(results, specs, columns)
+    resp = Response(encode_preview(sprite), mimetype='image/jpeg')
+    resp.headers['X-Sprite-Map'] = json.dumps(coords, separators=(',', ':'))
+    return resp
+
+def _download_response(path, st, filename):
+    """
+    下载响应：强 ETag（mtime_ns + size，结果文件写入后不再修改）与 Last-Modified，
+    If-None-Match / If-Modified-Since 命中时在打开文件前直接返回 304；支持 Range。
+    DOWNLOAD_OFFLOAD 为 'x-accel' / 'x-sendfile' 时只返回响应头，由前置代理发送文件内容。
+    POST 请求同样按 GET 语义处理条件请求（werkzeug 只对 GET/HEAD 生效）。
+    """
+    etag = f'{st.st_mtime_ns:x}-{st.st_size:x}'
+    environ = dict(request.environ, REQUEST_METHOD='GET')
+    if not is_resource_modified(environ, etag, last_modified=http_date(st.st_mtime)):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.last_modified = st.st_mtime
+        return resp
+
+    offload = app.config.get('DOWNLOAD_OFFLOAD') or ''
+    mimetype = mimetype_for(filename)
+    if offload == 'x-accel':
+        rel = os.path.relpath(path, os.path.join(app.static_folder, temp_image_dir)).replace(os.sep, '/')
+        resp = Response(mimetype=mimetype)
+        resp.headers['X-Accel-Redirect'] = app.config.get('DOWNLOAD_ACCEL_PREFIX', '/protected/temp_images/') + rel
+    elif offload == 'x-sendfile':
+        resp = Response(mimetype=mimetype)
+        resp.headers['X-Sendfile'] = path
+    else:
+        resp = send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename,
+                         conditional=False, etag=False)
+        resp.set_etag(etag)
+        resp.last_modified = st.st_mtime
+        resp.accept_ranges = 'bytes'
+        return resp.make_conditional(environ, accept_ranges=True, complete_length=st.st_size)
+
+    resp.headers.set('Content-Disposition', 'attachment', filename=filename)
+    resp.set_etag(etag)
+    resp.last_modified = st.st_mtime
+    return resp
+
+
+@app.route('/api/image_download', methods=['GET', 'POST'])
 def image_download():
     """
-    下载处理好的图片
+    下载处理好的图片（POST json {img_url} 或 GET ?img_url=），支持条件请求与 Range
     :return: 图片二进制流
     """
     # 获取请求体参数
-    try:
+    if request.method == 'GET':
+        img_url = request.args.get('img_url')
+    else:
         params = request.get_json(silent=True)
-    except Exception as e:
-        logging.error(f"image_download: failed to parse json body: {e}")
-        return make_err_response('缺少img_url参数')
-    logging.info(
-        f"image_download: request meta mimetype={request.mimetype}, content_type={request.content_type}, "
-        f"content_length={request.content_length}, remote_addr={request.remote_addr}, "
-        f"user_agent={request.user_agent}"
-    )
-    logging.info(f"image_download: raw params={params}")
-
-    # 检查img_url参数
-    try:
-        if not isinstance(params, dict) or 'img_url' not in params:
-            logging.warning("image_download: missing 'img_url' in params or params is not dict")
-            return make_err_response('缺少img_url参数')
-        img_url = params.get('img_url')
-    except Exception as e:
-        logging.error(f"image_download: error accessing img_url from params: {e}")
+        img_url = params.get('img_url') if isinstance(params, dict) else None
+    if not img_url:
+        logging.warning(f"image_download: missing 'img_url', content_type={request.content_type}")
         return make_err_response('缺少img_url参数')
 
-    # Extract the filename from the URL (Assuming the URL ends with '/filename.jpg')
-    try:
-        filename = str(img_url).split('/')[-1]
-    except Exception as e:
-        logging.error(f"image_download: failed to extract filename from img_url={img_url}: {e}")
-        return make_err_response('缺少img_url参数')
+    # Extract the filename from the URL (Assuming the URL ends with '/filename.jpg' / '.webp' / '.avif')
+    filename = str(img_url).split('/')[-1]
 
-    # Construct the local file path
-    try:
-        filepath = os.path.join(app.static_folder, temp_image_dir, filename)
-        logging.info(
-            f"image_download: resolved path filepath={filepath}, static_folder={app.static_folder}, "
-            f"temp_image_dir={temp_image_dir}, filename={filename}, img_url={img_url}"
-        )
-    except Exception as e:
-        logging.error(f"image_download: failed to construct filepath for filename={filename}: {e}")
+    # Resolve the local file path (sharded layout, legacy flat files as fallback)
+    storage = _storage()
+    found = storage.lookup(filename)
+    if found is None:
+        logging.warning(f"image_download: file not found for img_url={img_url}")
         return make_err_response('文件不存在')
+    filepath, st = found
+    storage.touch(filepath)
 
-    # Check if the file exists
     try:
-        if not os.path.isfile(filepath):
-            logging.warning(f"image_download: file not found at path={filepath}")
-            return make_err_response('文件不存在')
-    except Exception as e:
-        logging.error(f"image_download: os.path.isfile failed for {filepath}: {e}")
-        return make_err_response('文件不存在')
-
-    try:
-        try:
-            file_size = os.path.getsize(filepath)
-        except Exception as e:
-            file_size = None
-            logging.info(f"image_download: failed to get file size for {filepath}: {e}")
-
-        logging.info(
-            f"image_download: sending file path={filepath}, size={file_size} bytes, "
-            f"as_attachment=True, download_name={filename}, mimetype=image/jpeg"
-        )
-        return send_file(filepath, mimetype='image/jpeg', as_attachment=True, download_name=filename)
+        return _download_response(filepath, st, filename)
+    except HTTPException:
+        # 例如 Range 超出文件长度时的 416，按原状态码返回
+        raise
     except Exception as e:
         logging.error(f"image_download: failed to send file {filepath}: {e}")
         return make_err_response(f'文件发送失败: {e}')
-
-        
-
-    
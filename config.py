@@ -7,3 +7,59 @@ DEBUG = True
 username = os.environ.get("MYSQL_USERNAME", 'root')
 password = os.environ.get("MYSQL_PASSWORD", 'root')
 db_address = os.environ.get("MYSQL_ADDRESS", '127.0.0.1:3306')
+
+# 启动时预加载字体的输出长边尺寸（对应 max_length）
+FONT_PRELOAD_LENGTHS = (2400,)
+
+# 上传限制：请求体字节上限（超出返回 413）、超过多少字节落盘为临时文件
+MAX_CONTENT_LENGTH = 40 * 1024 * 1024
+UPLOAD_SPOOL_THRESHOLD = 2 * 1024 * 1024
+# 像素预算（按文件头尺寸，在解码前检查）：超过 UPLOAD_MAX_PIXELS 时 JPEG 只做 DCT 缩小解码、其他格式拒绝；
+# 超过 UPLOAD_HARD_MAX_PIXELS 直接拒绝
+UPLOAD_MAX_PIXELS = 60_000_000
+UPLOAD_HARD_MAX_PIXELS = 150_000_000
+
+# 异步渲染任务（/api/jobs/*）：线程池大小、排队+执行中任务上限（超出返回 503）、结果保留秒数、503 时建议的重试间隔
+JOB_WORKERS = 2
+JOB_QUEUE_MAX = 16
+JOB_RESULT_TTL = 3600
+JOB_RETRY_AFTER = 2
+
+# 渲染后端：'thread' 在请求/任务线程中渲染；'process' 时滤镜与排版在进程池中执行（像素经共享内存传递），
+# 进程数默认等于 CPU 核数。使用进程池时 JOB_WORKERS 建议不小于 RENDER_PROCESSES
+RENDER_BACKEND = 'thread'
+RENDER_PROCESSES = None
+
+# image_upload 结果缓存（相同图片 + 相同参数直接返回已有结果）：'memory' 进程内 LRU，'disk' 索引保存在
+# RESULT_CACHE_DIR（多个进程/节点可挂载同一目录共享），'none' 关闭；按结果文件总字节数淘汰
+RESULT_CACHE_BACKEND = 'memory'
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'results'))
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# static/temp_images 生命周期：超过 STORAGE_TTL 秒未访问的结果删除，总大小超过 STORAGE_MAX_BYTES 时按 LRU 删除；
+# 后台每 STORAGE_SWEEP_INTERVAL 秒清理一次（0 关闭清理线程）
+STORAGE_TTL = 24 * 3600
+STORAGE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+STORAGE_SWEEP_INTERVAL = 600
+# 写入中的 .tmp 文件在此秒数内不会被清理（超过后视为残片，按 TTL / 总大小正常淘汰）
+STORAGE_TMP_GRACE = 3600
+
+# image_download 由前置代理发送文件：'' 由 Flask 发送；'x-accel' 返回 X-Accel-Redirect（nginx，需配置 internal location，
+# 指向 static/temp_images，前缀为 DOWNLOAD_ACCEL_PREFIX）；'x-sendfile' 返回 X-Sendfile（Apache mod_xsendfile 等）
+DOWNLOAD_OFFLOAD = ''
+DOWNLOAD_ACCEL_PREFIX = '/protected/temp_images/'
+
+# /api/filter_preview/batch：单次请求最多预览的滤镜数、并行应用滤镜的线程数（None 时按 CPU 核数）
+PREVIEW_BATCH_MAX = 32
+PREVIEW_WORKERS = None
+
+# 上传会话（/api/sessions）：未访问超过 SESSION_TTL 秒过期；内存中工作图总字节上限；默认保存的长边尺寸；
+# SESSION_SPILL_DIR 不为空时，内存中被挤出的会话写入该目录（总量不超过 SESSION_DISK_MAX_BYTES）
+SESSION_TTL = 1800
+SESSION_MAX_BYTES = 512 * 1024 * 1024
+SESSION_MAX_LENGTH = 2400
+SESSION_SPILL_DIR = None
+SESSION_DISK_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 强度滑杆缓存：/api/filter_preview 按 (图片, 滤镜) 保存若干强度下的预览图，新强度只做混合；像素总字节上限
+STRENGTH_CACHE_MAX_BYTES = 128 * 1024 * 1024
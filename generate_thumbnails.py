@@ -104,12 +104,12 @@ def main():
                 processed.save(out_path, format='JPEG', quality=92)
                 print(f"Saved: {out_path}")
 
-                # if key.startswith('lut') and len(key) == 5 and key[3:].isdigit():
-                #     cube_name = f"Titanium_Cinematic_{key[3:]}.cube"
-                #     processed2 = apply_pylut(thumb, 0.5, f"cubes/{cube_name}")
-                #     out_path2 = os.path.join(pylut_filters_thumb_dir, f"filter_{key}.jpg")
-                #     processed2.save(out_path2, format='JPEG', quality=92)
-                #     print(f"Saved: {out_path2}")
+                if key.startswith('lut') and len(key) == 5 and key[3:].isdigit():
+                    cube_name = f"Titanium_Cinematic_{key[3:]}.cube"
+                    processed2 = apply_pylut(thumb, 0.5, f"cubes/{cube_name}")
+                    out_path2 = os.path.join(pylut_filters_thumb_dir, f"filter_{key}.jpg")
+                    processed2.save(out_path2, format='JPEG', quality=92)
+                    print(f"Saved: {out_path2}")
         except Exception as e:
             print(f"Failed on filter '{key}': {e}")
 
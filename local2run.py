@@ -17,6 +17,7 @@ from border_extender.effects.formats import (
 
 # 相机和镜头配置字典
 from border_extender.assets_data import text_dict, logo_dict
+from border_extender.add_bd import apply_exif_orientation
 
 
 def process_one_image(img_input, text, logo_file, *args, format='basic3', suppli_info='', 
@@ -161,7 +162,7 @@ def process_images(src, tgt, format='basic3', suppli_info='', max_length=2400,
                         print(f"\r处理进度 {indx+1}/{len(img_all)}...", end='', flush=True)
                     
                     # 读取图片
-                    img = Image.open(img_path).convert('RGB')
+                    img = apply_exif_orientation(Image.open(img_path).convert('RGB'))
                     
                     # 根据图片纵横比在 basic2 / basic3 之间自动切换
                     current_format = format
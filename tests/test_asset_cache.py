@@ -0,0 +1,71 @@
+"""
+字体与 logo 缓存：同一字体的多个字号共享文件映射，字号数量受总量限制。
+"""
+import os
+import unittest
+
+from border_extender.effects import asset_cache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONT = os.path.join(ROOT, 'fonts', 'OPPOSans-Medium.ttf')
+LOGO = os.path.join(ROOT, 'logos', 'hassel.jpg')
+
+
+def _anon_rss() -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class FontCacheTest(unittest.TestCase):
+    def setUp(self):
+        asset_cache.clear_asset_caches()
+
+    def tearDown(self):
+        asset_cache.clear_asset_caches()
+
+    def test_same_size_is_shared(self):
+        self.assertIs(asset_cache.get_font(FONT, 40), asset_cache.get_font(FONT, 40.0))
+        self.assertIsNot(asset_cache.get_font(FONT, 40), asset_cache.get_font(FONT, 41))
+
+    def test_each_face_charged(self):
+        for size in range(20, 30):
+            asset_cache.get_font(FONT, size)
+        self.assertEqual(len(asset_cache._FONT_CACHE), 10)
+        self.assertEqual(asset_cache._FONT_CACHE.bytes, 10 * asset_cache.FONT_FACE_BYTES)
+
+    def test_sizes_per_path_are_bounded(self):
+        # 字号跟随客户端的 max_length，不能无限增长
+        cache = asset_cache._FONT_CACHE
+        old_max = cache.max_bytes
+        cache.max_bytes = 8 * asset_cache.FONT_FACE_BYTES
+        try:
+            first = asset_cache.get_font(FONT, 10)
+            for size in range(11, 40):
+                asset_cache.get_font(FONT, size)
+            self.assertEqual(len(cache), 8)
+            self.assertLessEqual(cache.bytes, cache.max_bytes)
+            self.assertIsNot(asset_cache.get_font(FONT, 10), first)
+        finally:
+            cache.max_bytes = old_max
+
+    @unittest.skipUnless(os.path.exists('/proc/self/status'), '需要 /proc')
+    def test_sizes_do_not_copy_font_data(self):
+        before = _anon_rss()
+        for size in range(20, 40):
+            asset_cache.get_font(FONT, size)
+        # 每个字号复制一份字体文件时约为 20 × 文件大小
+        self.assertLess(_anon_rss() - before, 5 * os.path.getsize(FONT))
+
+
+class LogoCacheTest(unittest.TestCase):
+    def test_resized_logo_is_shared(self):
+        a = asset_cache.load_logo(LOGO, 'RGB', (64, 32))
+        self.assertEqual(a.size, (64, 32))
+        self.assertIs(asset_cache.load_logo(LOGO, 'RGB', (64, 32)), a)
+
+
+if __name__ == '__main__':
+    unittest.main()
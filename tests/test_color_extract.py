@@ -0,0 +1,105 @@
+"""
+主色提取：可选后端（user-010）与结果缓存（user-011）。
+"""
+import os
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from border_extender import color_extract
+from border_extender.color_extract import clear_palette_cache, extract_main_colors
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+
+
+def _blocks_image():
+    # 四块面积不同的纯色加轻微噪声；主色明确，各后端应得到相同结果
+    colors = [(230, 200, 40), (40, 120, 200), (200, 40, 60), (20, 20, 20)]
+    widths = [160, 120, 80, 40]
+    strips = [np.broadcast_to(np.array(c, dtype=np.int16), (100, w, 3)) for c, w in zip(colors, widths)]
+    noise = np.random.default_rng(0).integers(-4, 5, size=(100, sum(widths), 3))
+    arr = np.clip(np.concatenate(strips, axis=1) + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(arr, mode='RGB'), colors
+
+
+class PaletteBackendTest(unittest.TestCase):
+    def setUp(self):
+        clear_palette_cache()
+
+    def tearDown(self):
+        clear_palette_cache()
+
+    def test_backends_agree_on_distinct_colors(self):
+        img, colors = _blocks_image()
+        # 最暗的一个被丢弃，其余按亮度降序
+        expected = np.array(sorted(colors[:3], key=sum, reverse=True))
+        for backend in color_extract.PALETTE_BACKENDS:
+            out = extract_main_colors(img, 3, backend)
+            self.assertEqual(out.shape, (3, 3), backend)
+            self.assertLessEqual(np.abs(out - expected).max(), 6, backend)
+
+    def test_few_colors_keep_output_shape(self):
+        img = Image.new('RGB', (40, 40), (90, 160, 30))
+        for backend in ('quantize', 'histogram'):
+            out = extract_main_colors(img, 3, backend)
+            self.assertEqual(out.shape, (3, 3), backend)
+            self.assertTrue((np.abs(out - (90, 160, 30)) <= 8).all(), backend)
+
+    def test_accepts_non_rgb(self):
+        img = Image.new('RGBA', (40, 40), (200, 10, 10, 128))
+        self.assertEqual(extract_main_colors(img, 2, 'quantize').shape, (2, 3))
+
+    def test_unknown_backend_rejected(self):
+        with self.assertRaises(ValueError):
+            extract_main_colors(Image.new('RGB', (8, 8)), 3, 'median_cut')
+        with self.assertRaises(ValueError):
+            color_extract.set_default_palette_backend('median_cut')
+        self.assertIn(color_extract.DEFAULT_PALETTE_BACKEND, color_extract.PALETTE_BACKENDS)
+
+
+class PaletteCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with Image.open(SAMPLE) as src:
+            cls.img = src.convert('RGB').resize((600, 400))
+
+    def setUp(self):
+        clear_palette_cache()
+
+    def tearDown(self):
+        clear_palette_cache()
+
+    def test_hit_returns_equal_copy(self):
+        first = extract_main_colors(self.img, 4, 'histogram')
+        first[0, 0] = -1
+        second = extract_main_colors(self.img, 4, 'histogram')
+        self.assertNotEqual(second[0, 0], -1)
+        self.assertEqual(len(color_extract._PALETTE_CACHE), 1)
+
+    def test_key_includes_num_colors_and_backend(self):
+        extract_main_colors(self.img, 3, 'quantize')
+        extract_main_colors(self.img, 4, 'quantize')
+        extract_main_colors(self.img, 3, 'histogram')
+        self.assertEqual(len(color_extract._PALETTE_CACHE), 3)
+
+    def test_kmeans_is_deterministic_without_cache(self):
+        a = extract_main_colors(self.img, 3, 'kmeans')
+        clear_palette_cache()
+        b = extract_main_colors(self.img, 3, 'kmeans')
+        self.assertEqual(a.tolist(), b.tolist())
+
+    def test_cache_is_bounded(self):
+        old_max = color_extract.PALETTE_CACHE_MAX
+        color_extract.PALETTE_CACHE_MAX = 2
+        try:
+            for value in range(4):
+                extract_main_colors(Image.new('RGB', (32, 32), (value * 40, 10, 10)), 2, 'histogram')
+            self.assertEqual(len(color_extract._PALETTE_CACHE), 2)
+        finally:
+            color_extract.PALETTE_CACHE_MAX = old_max
+
+
+if __name__ == '__main__':
+    unittest.main()
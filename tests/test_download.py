@@ -0,0 +1,88 @@
+"""
+image_download：ETag / Last-Modified、304、Range，以及 POST 与 GET 相同的条件请求语义。
+"""
+import os
+import unittest
+
+from border_extender import app
+from border_extender.render_pipeline import _write_bytes
+from border_extender.storage import shard_relpath
+
+PAYLOAD = bytes(range(256)) * 16
+
+
+class ImageDownloadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app.config.update(STORAGE_TTL=0, STORAGE_MAX_BYTES=0, DOWNLOAD_OFFLOAD='')
+        cls.client = app.test_client()
+        cls.output_dir = os.path.join(app.static_folder, 'temp_images')
+        cls.filename = 'processed_19700101000000_testdl00.jpg'
+        cls.relpath = shard_relpath(cls.filename)
+        _write_bytes(PAYLOAD, cls.output_dir, cls.relpath)
+        cls.url = f'http://localhost/static/temp_images/{cls.relpath}'
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(os.path.join(cls.output_dir, cls.relpath))
+
+    def _get(self, headers=None):
+        return self.client.get('/api/image_download', query_string={'img_url': self.url}, headers=headers or {})
+
+    def _post(self, headers=None):
+        return self.client.post('/api/image_download', json={'img_url': self.url}, headers=headers or {})
+
+    def test_full_download_has_validators(self):
+        for resp in (self._get(), self._post()):
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.data, PAYLOAD)
+            self.assertTrue(resp.headers['ETag'])
+            self.assertIn('Last-Modified', resp.headers)
+            self.assertEqual(resp.headers['Accept-Ranges'], 'bytes')
+
+    def test_etag_stable_across_downloads(self):
+        # 下载会刷新访问时间，但不能改变 ETag
+        first = self._get().headers['ETag']
+        self.assertEqual(self._get().headers['ETag'], first)
+
+    def test_if_none_match_returns_304(self):
+        etag = self._get().headers['ETag']
+        for resp in (self._get({'If-None-Match': etag}), self._post({'If-None-Match': etag})):
+            self.assertEqual(resp.status_code, 304)
+            self.assertEqual(resp.data, b'')
+            self.assertEqual(resp.headers['ETag'], etag)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self._get().headers['Last-Modified']
+        self.assertEqual(self._post({'If-Modified-Since': last_modified}).status_code, 304)
+
+    def test_stale_etag_downloads_again(self):
+        self.assertEqual(self._get({'If-None-Match': '"stale"'}).status_code, 200)
+
+    def test_range(self):
+        for resp in (self._get({'Range': 'bytes=100-199'}), self._post({'Range': 'bytes=100-199'})):
+            self.assertEqual(resp.status_code, 206)
+            self.assertEqual(resp.data, PAYLOAD[100:200])
+            self.assertEqual(resp.headers['Content-Range'], f'bytes 100-199/{len(PAYLOAD)}')
+
+    def test_unsatisfiable_range(self):
+        self.assertEqual(self._get({'Range': f'bytes={len(PAYLOAD) + 10}-'}).status_code, 416)
+
+    def test_x_accel_offload(self):
+        app.config['DOWNLOAD_OFFLOAD'] = 'x-accel'
+        try:
+            resp = self._get()
+        finally:
+            app.config['DOWNLOAD_OFFLOAD'] = ''
+        self.assertEqual(resp.data, b'')
+        self.assertTrue(resp.headers['X-Accel-Redirect'].endswith('/' + self.relpath))
+        self.assertIn('ETag', resp.headers)
+
+    def test_missing_and_traversal(self):
+        for url in ('http://localhost/static/temp_images/nope.jpg', '../../config.py'):
+            resp = self.client.get('/api/image_download', query_string={'img_url': url})
+            self.assertNotEqual(resp.get_json()['code'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+编码档位与输出格式协商（user-022）。
+"""
+import unittest
+from io import BytesIO
+
+from PIL import Image, JpegImagePlugin
+
+from border_extender import encoding
+from border_extender.encoding import encode_image, negotiate_format, parse_accept
+
+HAS_WEBP = 'webp' in encoding.supported_formats()
+HAS_AVIF = 'avif' in encoding.supported_formats()
+
+
+class DefaultProfileTest(unittest.TestCase):
+    def test_balanced_jpeg_keeps_legacy_settings(self):
+        img = Image.radial_gradient('L').convert('RGB')
+        with Image.open(BytesIO(encode_image(img))) as out:
+            self.assertEqual(JpegImagePlugin.get_sampling(out), 0)
+            self.assertTrue(out.info.get('progressive'))
+
+    def test_fast_uses_420(self):
+        img = Image.radial_gradient('L').convert('RGB')
+        with Image.open(BytesIO(encode_image(img, 'jpeg', 'fast'))) as out:
+            self.assertEqual(JpegImagePlugin.get_sampling(out), 2)
+
+
+class NegotiateFormatTest(unittest.TestCase):
+    def test_parse_accept(self):
+        q = parse_accept('image/avif;q=0, image/webp; q=0.8 ,image/*;q=0.5, text/html;q=x, */*')
+        self.assertEqual(q['image/avif'], 0.0)
+        self.assertEqual(q['image/webp'], 0.8)
+        self.assertEqual(q['*/*'], 1.0)
+        self.assertNotIn('text/html', q)
+
+    def test_explicit_format_wins(self):
+        self.assertEqual(negotiate_format('jpg', 'image/avif,image/webp'), 'jpeg')
+
+    def test_wildcards_and_missing_header_give_jpeg(self):
+        self.assertEqual(negotiate_format(None, None), 'jpeg')
+        self.assertEqual(negotiate_format('auto', '*/*'), 'jpeg')
+        self.assertEqual(negotiate_format('auto', 'image/*'), 'jpeg')
+
+    @unittest.skipUnless(HAS_WEBP, '需要 WebP 支持')
+    def test_q_zero_excludes_type(self):
+        self.assertEqual(negotiate_format(None, 'image/avif;q=0,image/webp'), 'webp')
+        self.assertEqual(negotiate_format(None, 'image/webp;q=0'), 'jpeg')
+        self.assertEqual(negotiate_format(None, 'image/webp;q=0.0, image/avif;q=0'), 'jpeg')
+
+    @unittest.skipUnless(HAS_WEBP and HAS_AVIF, '需要 WebP 与 AVIF 支持')
+    def test_prefers_higher_q(self):
+        self.assertEqual(negotiate_format(None, 'image/avif;q=0.5,image/webp;q=0.9'), 'webp')
+        self.assertEqual(negotiate_format(None, 'image/avif,image/webp'), 'avif')
+        self.assertEqual(negotiate_format(None, 'image/jpeg,image/webp;q=0.5'), 'jpeg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+程序化胶片滤镜：预烘焙 52 节点 LUT（Pillow 后端）与直接逐像素计算的一致性。
+"""
+import os
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from border_extender.effects import filter_utils, filters
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+FILMS = ('kodak_5219', 'kodak_e100', 'fuji_c100', 'kodak_g200')
+STRENGTHS = (0.2, 0.5, 0.83, 1.0)
+
+
+def _u8(arr):
+    return (np.clip(arr, 0.0, 1.0) * 255.0 + 0.5).astype(int)
+
+
+class BakedFilmParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with Image.open(SAMPLE) as src:
+            photo = src.convert('RGB').resize((600, 400))
+        # 照片 + 覆盖整个色彩空间的随机像素
+        noise = np.random.default_rng(0).integers(0, 256, size=(200, 600, 3), dtype=np.uint8)
+        cls.img = Image.fromarray(np.concatenate([np.asarray(photo), noise]), mode='RGB')
+
+    @unittest.skipUnless(hasattr(filter_utils.ImageFilter, 'Color3DLUT'), '需要 Pillow Color3DLUT')
+    def test_baked_close_to_direct(self):
+        for film in FILMS:
+            color_fn = getattr(filters, f'_film_{film}_color')
+            for s in STRENGTHS:
+                baked = _u8(filter_utils.apply_baked_color(self.img, f'film_{film}', color_fn, s, 'pillow'))
+                direct = _u8(color_fn(self.img, s))
+                diff = np.abs(baked - direct)
+                # 插值误差加上强度按 0.05 量化的误差
+                self.assertLessEqual(diff.max(), 6, (film, s))
+                self.assertLess(diff.mean(), 1.0, (film, s))
+
+    def test_numpy_backend_uses_direct_transform(self):
+        for film in FILMS:
+            color_fn = getattr(filters, f'_film_{film}_color')
+            out = filter_utils.apply_baked_color(self.img, f'film_{film}', color_fn, 0.37, 'numpy')
+            np.testing.assert_array_equal(out, color_fn(self.img, 0.37))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+缩小解码：JPEG 用 draft（DCT 缩放），其他格式用 reduce()，结果摆正且不小于目标尺寸（user-014）。
+"""
+import os
+import unittest
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from border_extender.image_io import open_rgb_reduced
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+
+
+def _encoded(img, fmt, orientation=None):
+    kwargs = {}
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        kwargs['exif'] = exif.tobytes()
+    buf = BytesIO()
+    img.save(buf, fmt, **kwargs)
+    buf.seek(0)
+    return buf
+
+
+class OpenReducedTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with Image.open(SAMPLE) as src:
+            cls.full = src.convert('RGB')
+
+    def test_jpeg_uses_dct_scaling(self):
+        img = open_rgb_reduced(SAMPLE, max_length=600)
+        self.assertEqual(img.mode, 'RGB')
+        # 3000x2000 → 1/4 缩放为 750x500，长边仍不小于目标
+        self.assertEqual(img.size, (750, 500))
+
+    def test_reduced_decode_close_to_full_decode(self):
+        target = (600, 400)
+        reduced = open_rgb_reduced(SAMPLE, max_length=600).resize(target, Image.LANCZOS)
+        full = self.full.resize(target, Image.LANCZOS)
+        diff = np.abs(np.asarray(reduced, dtype=np.int16) - np.asarray(full, dtype=np.int16))
+        self.assertLess(diff.mean(), 2.0)
+
+    def test_min_width_respected(self):
+        img = open_rgb_reduced(SAMPLE, min_width=500)
+        self.assertGreaterEqual(img.width, 500)
+        self.assertLess(img.width, 1000)
+
+    def test_small_target_not_upscaled(self):
+        img = open_rgb_reduced(SAMPLE, max_length=5000)
+        self.assertEqual(img.size, self.full.size)
+
+    def test_orientation_applied_before_sizing(self):
+        # 横向存储、EXIF 要求顺时针旋转 90 度：摆正后为 800x1200，min_width 按摆正后的宽计算（1/4 缩放）
+        src = self.full.resize((1200, 800))
+        img = open_rgb_reduced(_encoded(src, 'JPEG', orientation=6), min_width=200)
+        self.assertGreater(img.height, img.width)
+        self.assertGreaterEqual(img.width, 200)
+        self.assertEqual(img.size, (200, 300))
+
+    def test_png_uses_integer_reduce(self):
+        src = self.full.resize((800, 600))
+        img = open_rgb_reduced(_encoded(src, 'PNG'), max_length=200)
+        self.assertEqual(img.size, (200, 150))
+
+    def test_rgba_png_converted(self):
+        src = Image.new('RGBA', (64, 32), (10, 20, 30, 40))
+        img = open_rgb_reduced(_encoded(src, 'PNG'))
+        self.assertEqual((img.mode, img.size), ('RGB', (64, 32)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+image_upload?response=inline：缓存命中与未命中返回相同的响应头。
+"""
+import json
+import os
+import time
+import unittest
+from urllib.parse import unquote
+
+from border_extender import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+# format_none 不绘制文字，不依赖字体文件
+CONTROL = json.dumps({'use_control_option': True, 'format': 'format_none', 'max_length': 600})
+RESULT_HEADERS = ('Content-Type', 'X-Res-Info', 'X-Image-Url', 'X-Image-Width', 'X-Image-Height', 'Vary')
+
+
+class InlineResponseTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app.config.update(STORAGE_TTL=0, STORAGE_MAX_BYTES=0, RESULT_CACHE_BACKEND='memory')
+        cls.client = app.test_client()
+        cls.output_dir = os.path.join(app.static_folder, 'temp_images')
+        cls.created = []
+
+    @classmethod
+    def tearDownClass(cls):
+        for rel in cls.created:
+            try:
+                os.remove(os.path.join(cls.output_dir, rel))
+            except OSError:
+                pass
+
+    def _post(self, query, encode_profile):
+        with open(SAMPLE, 'rb') as f:
+            return self.client.post(f'/api/image_upload?{query}', data={
+                'image': (f, 'P1032386.jpg'),
+                'control_params': CONTROL,
+                # 每个用例使用不同的参数，互不命中对方的缓存
+                'encode_profile': encode_profile,
+            })
+
+    def _wait_persisted(self, image_url, timeout=5.0):
+        rel = unquote(image_url.split('/temp_images/', 1)[1])
+        self.created.append(rel)
+        path = os.path.join(self.output_dir, rel)
+        deadline = time.time() + timeout
+        while not os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertTrue(os.path.exists(path), 'persist=1 的结果没有写入')
+        # 写入后 on_saved 登记缓存
+        time.sleep(0.05)
+
+    def test_hit_and_miss_send_same_headers(self):
+        miss = self._post('response=inline&persist=1', 'fast')
+        self.assertEqual(miss.status_code, 200)
+        self._wait_persisted(miss.headers['X-Image-Url'])
+
+        hit = self._post('response=inline', 'fast')
+        self.assertEqual(hit.status_code, 200)
+        for name in RESULT_HEADERS:
+            self.assertIn(name, hit.headers, name)
+            self.assertIn(name, miss.headers, name)
+        self.assertEqual(hit.headers['X-Image-Width'], miss.headers['X-Image-Width'])
+        self.assertEqual(hit.headers['X-Image-Height'], miss.headers['X-Image-Height'])
+        self.assertEqual(hit.headers['X-Image-Url'], miss.headers['X-Image-Url'])
+        self.assertEqual(hit.data, miss.data)
+        self.assertEqual(sorted(hit.headers.keys()), sorted(miss.headers.keys()))
+        self.assertEqual(int(miss.headers['X-Image-Width']), 600)
+
+    def test_inline_without_persist_is_not_cached(self):
+        first = self._post('response=inline', 'smallest')
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('X-Image-Url', first.headers)
+        # 没有落盘的结果不进入结果缓存，再次请求仍然渲染（同样没有可下载的地址）
+        second = self._post('response=inline', 'smallest')
+        self.assertNotIn('X-Image-Url', second.headers)
+        self.assertEqual(second.headers['X-Image-Width'], first.headers['X-Image-Width'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+异步渲染任务：有界队列的背压、进度与过期，以及 /api/jobs 提交-轮询流程（user-016）。
+"""
+import json
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.parse import unquote
+
+from border_extender import app
+from border_extender.jobs import JobQueue, QueueFull
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+# format_none 不绘制文字，不依赖字体文件；max_length 与其他用例不同，避免命中结果缓存
+CONTROL = json.dumps({'use_control_option': True, 'format': 'format_none', 'max_length': 640})
+
+
+def _wait(queue, job_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'error'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+class JobQueueTest(unittest.TestCase):
+    def test_result_and_stages(self):
+        queue = JobQueue(max_workers=1)
+        seen = []
+        submitted = threading.Event()
+
+        def work(progress, x):
+            submitted.wait(5)
+            for stage in ('decode', 'layout', 'encode'):
+                progress(stage)
+                seen.append(queue.get(job.id)['progress'])
+            return {'x': x}
+
+        job = queue.submit(work, 7)
+        submitted.set()
+        done = _wait(queue, job.id)
+        self.assertEqual((done['status'], done['stage'], done['progress'], done['result']), ('done', 'done', 1.0, {'x': 7}))
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(queue.stats()['pending'], 0)
+
+    def test_error_is_reported(self):
+        queue = JobQueue(max_workers=1)
+
+        def fail(progress):
+            raise RuntimeError('boom')
+
+        done = _wait(queue, queue.submit(fail).id)
+        self.assertEqual((done['status'], done['error']), ('error', 'boom'))
+        self.assertEqual(queue.stats()['pending'], 0)
+
+    def test_backpressure_and_queue_position(self):
+        queue = JobQueue(max_workers=1, max_pending=3)
+        release = threading.Event()
+        discarded = []
+
+        def block(progress):
+            release.wait(5)
+            return {}
+
+        jobs = []
+        for _ in range(3):
+            jobs.append(queue.submit(block))
+            time.sleep(0.01)
+        with self.assertRaises(QueueFull):
+            queue.submit(block, on_discard=lambda: discarded.append(True))
+        self.assertEqual(discarded, [True])
+        self.assertEqual(queue.queue_position(jobs[1].id), 0)
+        self.assertEqual(queue.queue_position(jobs[2].id), 1)
+
+        release.set()
+        for job in jobs:
+            self.assertEqual(_wait(queue, job.id)['status'], 'done')
+        self.assertEqual(queue.stats()['pending'], 0)
+        # 队列空出后可以再次提交
+        self.assertEqual(_wait(queue, queue.submit(block).id)['status'], 'done')
+
+    def test_finished_jobs_expire(self):
+        queue = JobQueue(max_workers=1, result_ttl=0)
+        job = queue.complete({'filename': 'a.jpg'})
+        self.assertEqual(queue.get(job.id)['status'], 'done')
+        time.sleep(0.01)
+        queue.complete({})
+        self.assertIsNone(queue.get(job.id))
+
+
+class JobEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app.config.update(STORAGE_TTL=0, STORAGE_MAX_BYTES=0)
+        cls.client = app.test_client()
+        cls.output_dir = os.path.join(app.static_folder, 'temp_images')
+
+    def _submit(self):
+        with open(SAMPLE, 'rb') as f:
+            return self.client.post('/api/jobs/image_upload', data={
+                'image': (f, 'P1032386.jpg'), 'control_params': CONTROL, 'encode_profile': 'fast'})
+
+    def test_submit_and_poll(self):
+        resp = self._submit()
+        data = json.loads(resp.data)['data']
+        deadline = time.time() + 20
+        while True:
+            status = json.loads(self.client.get(f"/api/jobs/{data['job_id']}").data)['data']
+            if status['status'] in ('done', 'error') or time.time() > deadline:
+                break
+            time.sleep(0.05)
+        self.assertEqual(status['status'], 'done', status)
+        self.assertEqual(status['progress'], 1.0)
+        rel = unquote(status['image_url'].split('/temp_images/', 1)[1])
+        path = os.path.join(self.output_dir, rel)
+        self.assertTrue(os.path.exists(path))
+        # 再次提交命中结果缓存时直接返回已完成的任务
+        again = json.loads(self._submit().data)['data']
+        if again['status'] == 'done':
+            self.assertEqual(json.loads(self.client.get(f"/api/jobs/{again['job_id']}").data)['data']['image_url'],
+                             status['image_url'])
+        os.remove(path)
+
+    def test_queue_full_returns_503(self):
+        with mock.patch('border_extender.views.get_job_queue', return_value=JobQueue(max_pending=0)):
+            resp = self._submit()
+        self.assertEqual(resp.status_code, 503)
+        self.assertIn('Retry-After', resp.headers)
+
+    def test_unknown_job_is_404(self):
+        resp = self.client.get('/api/jobs/does-not-exist')
+        self.assertEqual(resp.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
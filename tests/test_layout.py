@@ -0,0 +1,98 @@
+"""
+排版尺寸：每个请求独立计算的 LayoutMetrics 传给格式处理函数，不再读写 add_bd 的模块全局变量（user-007）。
+"""
+import dataclasses
+import os
+import threading
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from border_extender import add_bd
+from border_extender.effects import formats
+from border_extender.render_pipeline import UploadOptions, render_upload_image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+
+
+class LayoutMetricsTest(unittest.TestCase):
+    def test_compute_from_max_length(self):
+        m = add_bd.compute_layout_metrics(2000)
+        self.assertEqual((m.tgt_size, m.border_size, m.exterior, m.infor_area, m.font_size), (2000, 20, 60, 240, 48))
+        self.assertEqual(add_bd.compute_layout_metrics(2000, add_black_border=False).border_size, 0)
+
+    def test_metrics_are_immutable(self):
+        m = add_bd.compute_layout_metrics(1200)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            m.font_size = 1
+
+    def test_update_tgt_size_still_sets_legacy_globals(self):
+        before = add_bd.current_layout_metrics()
+        try:
+            add_bd.update_tgt_size(1000, add_black_border=False)
+            self.assertEqual(add_bd.current_layout_metrics(), add_bd.compute_layout_metrics(1000, False))
+        finally:
+            add_bd.update_tgt_size(before.tgt_size, before.border_size > int(0.0001 * before.tgt_size))
+        self.assertEqual(add_bd.current_layout_metrics(), before)
+
+
+class HandlerMetricsTest(unittest.TestCase):
+    def test_concurrent_requests_get_their_own_metrics(self):
+        seen = {}
+        barrier = threading.Barrier(4)
+
+        def handler(img, text, logo_file, suppli_info='', *, metrics=None, **kwargs):
+            # 所有线程都进入处理函数后再记录，模拟并发请求交错执行
+            barrier.wait(timeout=5)
+            seen[text] = metrics
+            return img
+
+        globals_before = add_bd.current_layout_metrics()
+        img = Image.new('RGB', (64, 48))
+        sizes = {'a': 800, 'b': 1600, 'c': 2400, 'd': 3200}
+        with mock.patch.dict(formats.FORMAT_HANDLERS, {'basic1': handler}):
+            threads = [threading.Thread(target=formats.process_one_image, args=(img, text, ''),
+                                        kwargs=dict(format='basic1', max_length=size, add_black_border=size > 1000))
+                       for text, size in sizes.items()]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        for text, size in sizes.items():
+            self.assertEqual(seen[text], add_bd.compute_layout_metrics(size, size > 1000))
+        self.assertEqual(add_bd.current_layout_metrics(), globals_before)
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(ROOT, add_bd.using_font)), f'缺少字体 {add_bd.using_font}')
+class ConcurrentRenderTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def _render(self, max_length):
+        with open(SAMPLE, 'rb') as f:
+            return render_upload_image(f, UploadOptions(max_length=max_length, format_key='basic2', text='layout'))
+
+    def test_sizes_match_serial_renders(self):
+        lengths = (900, 1500, 900, 1500)
+        serial = {n: self._render(n).size for n in set(lengths)}
+        results = [None] * len(lengths)
+
+        def run(i, n):
+            results[i] = self._render(n).size
+
+        threads = [threading.Thread(target=run, args=(i, n)) for i, n in enumerate(lengths)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [serial[n] for n in lengths])
+
+
+if __name__ == '__main__':
+    unittest.main()
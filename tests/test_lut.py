@@ -0,0 +1,158 @@
+"""
+LUT 内核：三线性 / 四面体插值、分块流式计算、Pillow Color3DLUT 后端与 pylut 的一致性。
+使用临时生成的 .cube 文件（仓库中不带 cubes/）。
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from border_extender.effects import filter_utils, lut_utils
+from border_extender.effects.lut_utils import (CubeLUT, apply_cube_lut, apply_cube_lut_float_rgb,
+                                               apply_cube_lut_float_rgb_chunked, apply_cube_lut_u8,
+                                               bake_cube_lut, build_cube_pack, load_cube_lut)
+
+
+def _transform(rgb: np.ndarray) -> np.ndarray:
+    """非线性、通道互相影响的映射，输出仍在 [0, 1]。"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    return np.stack([0.9 * r + 0.1 * r * g, 0.85 * g + 0.15 * b * b, 0.6 * b + 0.3 * b * b + 0.1 * r], axis=-1)
+
+
+def _write_cube(path, size=9, transform=_transform):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('TITLE "test"\n')
+        f.write(f'LUT_3D_SIZE {size}\n')
+        # .cube 数据 R 变化最快
+        for b in range(size):
+            for g in range(size):
+                for r in range(size):
+                    rgb = np.array([r, g, b], dtype=np.float64) / (size - 1)
+                    f.write('{:.6f} {:.6f} {:.6f}\n'.format(*transform(rgb)))
+
+
+def _identity_lut(size=6) -> CubeLUT:
+    return bake_cube_lut(lambda flat: flat.astype(np.float32) / 255.0, size)
+
+
+def _sample_image(h=61, w=83, seed=0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+
+
+class LutTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cube = os.path.join(self.tmp, 'test.cube')
+        _write_cube(self.cube)
+        lut_utils._CUBE_CACHE.clear()
+        lut_utils._PACK_CACHE.clear()
+
+    def tearDown(self):
+        lut_utils._CUBE_CACHE.clear()
+        lut_utils._PACK_CACHE.clear()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class KernelTest(LutTestCase):
+    def test_identity_for_both_kernels(self):
+        lut = _identity_lut()
+        arr = _sample_image().astype(np.float32) / 255.0
+        for interpolation in lut_utils.INTERPOLATIONS:
+            out = apply_cube_lut_float_rgb(arr, lut, interpolation)
+            np.testing.assert_allclose(out, arr, atol=1e-5, err_msg=interpolation)
+
+    def test_kernels_exact_on_lattice_nodes(self):
+        lut = load_cube_lut(self.cube)
+        n = lut.size
+        levels = np.arange(n, dtype=np.float32) / (n - 1)
+        b, g, r = np.meshgrid(levels, levels, levels, indexing='ij')
+        nodes = np.stack([r, g, b], axis=-1).reshape(n * n, n, 3)
+        for interpolation in lut_utils.INTERPOLATIONS:
+            out = apply_cube_lut_float_rgb(nodes, lut, interpolation)
+            np.testing.assert_allclose(out.reshape(lut.table.shape), lut.table, atol=1e-5, err_msg=interpolation)
+
+    def test_kernels_close_to_transform(self):
+        lut = load_cube_lut(self.cube)
+        arr = _sample_image().astype(np.float32) / 255.0
+        expected = _transform(arr.astype(np.float64))
+        for interpolation in lut_utils.INTERPOLATIONS:
+            out = apply_cube_lut_float_rgb(arr, lut, interpolation)
+            self.assertLess(np.abs(out - expected).max(), 0.02, interpolation)
+
+    def test_chunked_matches_whole_frame(self):
+        lut = load_cube_lut(self.cube)
+        arr = _sample_image().astype(np.float32) / 255.0
+        for interpolation in lut_utils.INTERPOLATIONS:
+            whole = np.clip(apply_cube_lut_float_rgb(arr, lut, interpolation), 0.0, 1.0)
+            for chunk in (1, 97, 1 << 16, None):
+                out = apply_cube_lut_float_rgb_chunked(arr, lut, interpolation, chunk_pixels=chunk)
+                np.testing.assert_allclose(out, whole, atol=1e-6, err_msg=f'{interpolation} chunk={chunk}')
+
+    def test_u8_path_matches_float_path(self):
+        lut = load_cube_lut(self.cube)
+        src = _sample_image()
+        arr = src.astype(np.float32) / 255.0
+        for s in (0.0, 0.3, 1.0):
+            out = apply_cube_lut_u8(src, lut, s, chunk_pixels=128)
+            ref = apply_cube_lut(arr, lut, s) if s > 0 else arr
+            ref_u8 = (np.clip(ref, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+            self.assertLessEqual(np.abs(out.astype(int) - ref_u8.astype(int)).max(), 1, s)
+
+    def test_unknown_interpolation(self):
+        with self.assertRaises(ValueError):
+            apply_cube_lut_float_rgb(np.zeros((2, 2, 3), np.float32), _identity_lut(), 'cubic')
+
+
+class BackendParityTest(LutTestCase):
+    def test_pillow_and_numpy_backends_agree(self):
+        lut = load_cube_lut(self.cube)
+        img = Image.fromarray(_sample_image(), mode='RGB')
+        pillow = np.asarray(filter_utils.lut_image(img, lut, 'pillow')).astype(int)
+        numpy_ = np.asarray(filter_utils.lut_image(img, lut, 'numpy')).astype(int)
+        # Color3DLUT 使用 16 位定点数，允许 ±1 级差异
+        self.assertLessEqual(np.abs(pillow - numpy_).max(), 1)
+
+    def test_apply_lut_strength_blend(self):
+        img = Image.fromarray(_sample_image(), mode='RGB')
+        for backend in filter_utils.LUT_BACKENDS:
+            self.assertEqual(filter_utils.apply_lut(img, 0.0, self.cube, backend).tobytes(), img.tobytes())
+            full = np.asarray(filter_utils.apply_lut(img, 1.0, self.cube, backend)).astype(float)
+            half = np.asarray(filter_utils.apply_lut(img, 0.5, self.cube, backend)).astype(float)
+            expected = (np.asarray(img).astype(float) + full) / 2
+            self.assertLessEqual(np.abs(half - expected).max(), 1.0, backend)
+
+    def test_pylut_compatible_engine(self):
+        try:
+            import pylut
+        except ImportError:
+            self.skipTest('未安装 pylut')
+        if not hasattr(pylut, 'LUT'):
+            self.skipTest('pylut 在当前 Python 版本下不可用')
+        img = Image.fromarray(_sample_image(16, 16), mode='RGB')
+        self.assertLess(filter_utils.pylut_parity(img, self.cube), 1e-6)
+
+
+class CubePackTest(LutTestCase):
+    def test_pack_matches_text(self):
+        text = lut_utils._parse_cube_text(lut_utils.Path(self.cube))
+        build_cube_pack(self.tmp)
+        packed = load_cube_lut(self.cube)
+        self.assertIsInstance(packed.table, np.memmap)
+        np.testing.assert_array_equal(np.asarray(packed.table), text.table)
+        self.assertEqual(packed.size, text.size)
+
+    def test_stale_pack_falls_back_to_text(self):
+        build_cube_pack(self.tmp)
+        _write_cube(self.cube, size=5)
+        os.utime(self.cube, ns=(os.stat(self.cube).st_atime_ns, os.stat(self.cube).st_mtime_ns + 10 ** 9))
+        lut = load_cube_lut(self.cube)
+        self.assertEqual(lut.size, 5)
+        self.assertNotIsInstance(lut.table, np.memmap)
+
+
+if __name__ == '__main__':
+    unittest.main()
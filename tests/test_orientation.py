@@ -0,0 +1,70 @@
+"""
+竖图排版的 90 度旋转（transpose）与 EXIF Orientation 摆正（user-013）。
+"""
+import unittest
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from border_extender.add_bd import apply_exif_orientation, rotate_image_90_no_crop
+
+
+def _asymmetric(size=(60, 40), mode='RGB'):
+    # 每个像素都不同，旋转方向错误时必然不相等
+    w, h = size
+    arr = np.arange(w * h * 3, dtype=np.uint32).reshape(h, w, 3) % 251
+    return Image.fromarray(arr.astype(np.uint8), mode='RGB').convert(mode)
+
+
+def _with_orientation(img, orientation):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    buf = BytesIO()
+    img.save(buf, 'PNG', exif=exif.tobytes())
+    buf.seek(0)
+    return Image.open(buf)
+
+
+class RotateTest(unittest.TestCase):
+    def test_matches_rotate_expand(self):
+        img = _asymmetric()
+        self.assertEqual(rotate_image_90_no_crop(img).tobytes(), img.rotate(90, expand=True).tobytes())
+        self.assertEqual(rotate_image_90_no_crop(img, reverse=True).tobytes(), img.rotate(270, expand=True).tobytes())
+
+    def test_round_trip_keeps_black_edges(self):
+        # 原实现用 getbbox 裁剪，会误删照片边缘的纯黑行列
+        img = Image.new('RGB', (50, 30), (0, 0, 0))
+        img.paste((200, 100, 50), (10, 5, 40, 25))
+        out = rotate_image_90_no_crop(rotate_image_90_no_crop(img), reverse=True)
+        self.assertEqual(out.size, img.size)
+        self.assertEqual(out.tobytes(), img.tobytes())
+
+    def test_converts_to_rgb(self):
+        out = rotate_image_90_no_crop(_asymmetric(mode='L'))
+        self.assertEqual((out.mode, out.size), ('RGB', (40, 60)))
+
+
+class ExifOrientationTest(unittest.TestCase):
+    def test_upright_returned_as_is(self):
+        img = _with_orientation(_asymmetric(), 1)
+        self.assertIs(apply_exif_orientation(img), img)
+        plain = _asymmetric()
+        self.assertIs(apply_exif_orientation(plain), plain)
+
+    def test_rotated_orientations(self):
+        img = _asymmetric()
+        expected = {
+            3: img.transpose(Image.Transpose.ROTATE_180),
+            6: img.transpose(Image.Transpose.ROTATE_270),
+            8: img.transpose(Image.Transpose.ROTATE_90),
+        }
+        for orientation, want in expected.items():
+            out = apply_exif_orientation(_with_orientation(img, orientation))
+            self.assertEqual(out.size, want.size, orientation)
+            self.assertEqual(out.tobytes(), want.tobytes(), orientation)
+            self.assertEqual(out.getexif().get(0x0112, 1), 1, orientation)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+滤镜预览：批量预览与 sprite、强度滑杆缓存（会话预览与上传预览共用缓存时尺寸不一致）。
+"""
+import io
+import json
+import os
+import time
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from border_extender import add_bd, app
+from border_extender.preview import (StrengthCache, build_sprite, decode_preview, encode_multipart,
+                                     parse_filter_specs, preview_at_strength, render_previews)
+from border_extender.sessions import decode_session_images
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+# 不依赖 cubes/ 的滤镜
+CUBE_FREE_FILTERS = ('black_white', 'vivid', 'retro')
+
+
+def _jpeg(size) -> io.BytesIO:
+    rng = np.random.default_rng(1)
+    arr = rng.integers(0, 256, size=(size[1] // 8 + 1, size[0] // 8 + 1, 3), dtype=np.uint8)
+    img = Image.fromarray(arr, mode='RGB').resize(size, Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, 'JPEG', quality=90)
+    buf.seek(0)
+    return buf
+
+
+class StrengthCacheSizeTest(unittest.TestCase):
+    def test_session_and_upload_previews_of_odd_sized_image(self):
+        data = _jpeg((1116, 2489))
+        _full, session_preview = decode_session_images(data, 2400)
+        data.seek(0)
+        upload_preview = decode_preview(data)
+        # 两条缩放路径的高度不同（500x1116 与 500x1115），正是需要区分的情况
+        self.assertNotEqual(session_preview.size, upload_preview.size)
+
+        cache = StrengthCache()
+        for filter_key in ('black_white', 'vivid'):
+            for src in (session_preview, upload_preview):
+                exact = preview_at_strength(src, 'same-digest', filter_key, 1.0, cache)
+                self.assertEqual(exact.size, src.size)
+            # 等待后台采样完成，之后的请求走 blend / 锚点命中
+            time.sleep(0.5)
+            for src in (session_preview, upload_preview, session_preview):
+                for strength in (0.1, 0.25, 0.6):
+                    out = preview_at_strength(src, 'same-digest', filter_key, strength, cache)
+                    self.assertEqual(out.size, src.size, (filter_key, strength))
+
+
+class StrengthInterpolationTest(unittest.TestCase):
+    def test_interpolated_preview_close_to_exact(self):
+        with open(SAMPLE, 'rb') as f:
+            img = decode_preview(f)
+        cache = StrengthCache()
+        preview_at_strength(img, 'sample', 'vivid', 0.3, cache)
+        time.sleep(0.5)
+        blended = np.asarray(preview_at_strength(img, 'sample', 'vivid', 0.6, cache)).astype(int)
+        exact = np.asarray(add_bd.apply_filter(img, 'vivid', 0.6)).astype(int)
+        self.assertLess(np.abs(blended - exact).mean(), 3.0)
+
+    def test_zero_strength_returns_source(self):
+        img = Image.new('RGB', (500, 300), (1, 2, 3))
+        self.assertIs(preview_at_strength(img, 'd', 'vivid', 0.0, StrengthCache()), img)
+
+
+class BatchPreviewTest(unittest.TestCase):
+    def test_parse_filter_specs(self):
+        specs = parse_filter_specs(json.dumps(['Vivid', {'filter': 'retro', 'strength': 2}]), 0.4)
+        self.assertEqual(specs, [('vivid', 0.4), ('retro', 1.0)])
+        self.assertEqual(len(parse_filter_specs('', 0.5)), len(add_bd.FILTER_HANDLERS))
+        for bad in ('["nope"]', '{"filter": "vivid"}', '[]'):
+            with self.assertRaises(ValueError):
+                parse_filter_specs(bad)
+        with self.assertRaises(ValueError):
+            parse_filter_specs(json.dumps(['vivid'] * 3), limit=2)
+
+    def test_render_previews_matches_single_filter(self):
+        img = Image.new('RGB', (500, 333), (120, 80, 40))
+        specs = [(k, 0.7) for k in CUBE_FREE_FILTERS]
+        results = render_previews(img, specs)
+        for (out, error), (key, strength) in zip(results, specs):
+            self.assertIsNone(error)
+            self.assertEqual(out.tobytes(), add_bd.apply_filter(img, key, strength).tobytes())
+
+    def test_sprite_layout_skips_failed_filters(self):
+        a = Image.new('RGB', (10, 6), (255, 0, 0))
+        b = Image.new('RGB', (10, 6), (0, 255, 0))
+        specs = [('a', 0.5), ('broken', 0.5), ('b', 0.5)]
+        sprite, coords = build_sprite([(a, None), (None, 'missing cube'), (b, None)], specs, columns=1)
+        self.assertEqual(sprite.size, (10, 12))
+        self.assertEqual(coords[1], {'filter': 'broken', 'strength': 0.5, 'error': 'missing cube'})
+        self.assertEqual((coords[2]['x'], coords[2]['y']), (0, 6))
+        self.assertEqual(sprite.getpixel((0, 7)), (0, 255, 0))
+
+    def test_multipart_body(self):
+        body, content_type = encode_multipart([({'X-Filter': 'a'}, b'AAA'), ({'X-Filter': 'b'}, b'BB')])
+        boundary = content_type.split('boundary=')[1]
+        self.assertEqual(body.count(f'--{boundary}'.encode()), 3)
+        self.assertTrue(body.endswith(f'--{boundary}--\r\n'.encode()))
+        self.assertIn(b'X-Filter: b\r\n\r\nBB\r\n', body)
+
+    def test_batch_endpoint(self):
+        client = app.test_client()
+        with open(SAMPLE, 'rb') as f:
+            resp = client.post('/api/filter_preview/batch', data={
+                'image': (f, 'P1032386.jpg'), 'filters': json.dumps(list(CUBE_FREE_FILTERS)), 'columns': '2'})
+        self.assertEqual(resp.mimetype, 'image/jpeg')
+        coords = json.loads(resp.headers['X-Sprite-Map'])
+        self.assertEqual([c['filter'] for c in coords], list(CUBE_FREE_FILTERS))
+        with Image.open(io.BytesIO(resp.data)) as sprite:
+            self.assertEqual(sprite.size, (1000, 2 * coords[0]['h']))
+
+
+if __name__ == '__main__':
+    unittest.main()
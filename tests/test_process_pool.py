@@ -0,0 +1,64 @@
+"""
+进程池渲染与线程内渲染的一致性。
+运行：python -m unittest discover -s tests
+"""
+import os
+import unittest
+
+from PIL import Image
+
+from border_extender import add_bd
+from border_extender.process_pool import ProcessRenderPool, image_from_shm, image_to_shm
+from border_extender.render_pipeline import UploadOptions, render_upload_image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+
+
+class ShmRoundTripTest(unittest.TestCase):
+    def test_pixels_and_exif_survive(self):
+        with Image.open(SAMPLE) as src:
+            img = src.convert('RGB')
+            img.info['exif'] = src.info['exif']
+        shm, desc = image_to_shm(img)
+        shm.close()
+        out = image_from_shm(desc, unlink=True)
+        self.assertEqual(out.tobytes(), img.tobytes())
+        self.assertEqual(out.info.get('exif'), img.info['exif'])
+
+
+@unittest.skipUnless(os.path.exists(os.path.join(ROOT, add_bd.using_font)), f'缺少字体 {add_bd.using_font}')
+class ProcessRenderParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cwd = os.getcwd()
+        # 字体、logo 路径相对于项目根目录
+        os.chdir(ROOT)
+        cls.pool = ProcessRenderPool(processes=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        os.chdir(cls.cwd)
+
+    def _render_both(self, opts):
+        with open(SAMPLE, 'rb') as f:
+            threaded = render_upload_image(f, opts)
+            f.seek(0)
+            pooled = render_upload_image(f, opts, pool=self.pool)
+        return threaded, pooled
+
+    def test_default_options_with_exif(self):
+        # 默认格式在 text 为空时由 EXIF 生成边框文字，丢失 EXIF 会返回无边框的原图
+        threaded, pooled = self._render_both(UploadOptions())
+        self.assertEqual(pooled.size, threaded.size)
+        self.assertEqual(pooled.tobytes(), threaded.tobytes())
+
+    def test_with_filter(self):
+        threaded, pooled = self._render_both(UploadOptions(filter_key='vivid', filter_strength=0.7))
+        self.assertEqual(pooled.size, threaded.size)
+        self.assertEqual(pooled.tobytes(), threaded.tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+结果缓存：同一个键的并发结果不删除已返回给客户端的文件；LRU 淘汰与外部清理。
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from border_extender.result_cache import DiskResultCache, MemoryResultCache, result_key
+from border_extender.render_pipeline import UploadOptions
+
+
+def _write(root, name, size=100):
+    with open(os.path.join(root, name), 'wb') as f:
+        f.write(b'x' * size)
+    return name
+
+
+class _ResultCacheCases:
+    def make_cache(self, max_bytes=10_000):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.tmp, 'out')
+        os.makedirs(self.output_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_concurrent_put_keeps_both_files(self):
+        cache = self.make_cache()
+        first = _write(self.output_dir, 'first.jpg')
+        second = _write(self.output_dir, 'second.jpg')
+        self.assertEqual(cache.put('k', first, 'a').filename, first)
+        # 第二个相同请求完成时第一个 URL 已经返回给客户端：保留旧结果，两个文件都不删除
+        self.assertEqual(cache.put('k', second, 'b').filename, first)
+        self.assertEqual(cache.get('k').filename, first)
+        self.assertTrue(os.path.isfile(os.path.join(self.output_dir, first)))
+        self.assertTrue(os.path.isfile(os.path.join(self.output_dir, second)))
+
+    def test_put_replaces_entry_whose_file_is_gone(self):
+        cache = self.make_cache()
+        first = _write(self.output_dir, 'first.jpg')
+        cache.put('k', first)
+        os.remove(os.path.join(self.output_dir, first))
+        second = _write(self.output_dir, 'second.jpg')
+        self.assertEqual(cache.put('k', second).filename, second)
+        self.assertEqual(cache.get('k').filename, second)
+
+    def test_get_drops_entry_whose_file_is_gone(self):
+        cache = self.make_cache()
+        name = _write(self.output_dir, 'gone.jpg')
+        cache.put('k', name)
+        os.remove(os.path.join(self.output_dir, name))
+        self.assertIsNone(cache.get('k'))
+
+    def test_size_cap_evicts_least_recently_used(self):
+        cache = self.make_cache(max_bytes=250)
+        for i in range(3):
+            cache.put(f'k{i}', _write(self.output_dir, f'{i}.jpg'))
+            # disk 后端按索引文件 mtime 排序，避免粗粒度时间戳相同
+            time.sleep(0.01)
+        self.assertIsNone(cache.get('k0'))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, '0.jpg')))
+        self.assertIsNotNone(cache.get('k2'))
+
+
+class MemoryResultCacheTest(_ResultCacheCases, unittest.TestCase):
+    def make_cache(self, max_bytes=10_000):
+        return MemoryResultCache(self.output_dir, max_bytes)
+
+
+class DiskResultCacheTest(_ResultCacheCases, unittest.TestCase):
+    def make_cache(self, max_bytes=10_000):
+        return DiskResultCache(self.output_dir, os.path.join(self.tmp, 'index'), max_bytes)
+
+
+class ResultKeyTest(unittest.TestCase):
+    def test_key_depends_on_bytes_and_options_not_res_info(self):
+        import io
+        a = io.BytesIO(b'image-a')
+        base = result_key(a, UploadOptions())
+        self.assertEqual(a.tell(), 0)
+        self.assertEqual(base, result_key(io.BytesIO(b'image-a'), UploadOptions(res_info='other')))
+        self.assertNotEqual(base, result_key(io.BytesIO(b'image-b'), UploadOptions()))
+        self.assertNotEqual(base, result_key(io.BytesIO(b'image-a'), UploadOptions(filter_key='vivid')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+上传会话：过期与 LRU、磁盘落盘往返、max_length 超出工作图时拒绝渲染。
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from PIL import Image
+
+from border_extender import app
+from border_extender.sessions import SessionNotFound, SessionStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+
+
+def _images(width=40, height=30, exif=None):
+    full = Image.new('RGB', (width, height), (10, 20, 30))
+    if exif:
+        full.info['exif'] = exif
+    return full, Image.new('RGB', (width // 2, height // 2), (1, 2, 3))
+
+
+class SessionStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_create_expires_stale_sessions_before_evicting_live_ones(self):
+        full, preview = _images()
+        one = full.width * full.height * 3 + preview.width * preview.height * 3
+        store = SessionStore(ttl=60, max_bytes=one * 2)
+        stale = store.create('a', *_images())
+        live = store.create('b', *_images())
+        stale.last_access = time.time() - 120
+        store.create('c', *_images())
+        # 过期的会话被清理，仍在使用的会话保留
+        self.assertIs(store.get(live.id), live)
+        with self.assertRaises(SessionNotFound):
+            store.get(stale.id)
+        self.assertEqual(store.stats()['expired'], 1)
+
+    def test_lru_eviction_when_full(self):
+        full, preview = _images()
+        one = full.width * full.height * 3 + preview.width * preview.height * 3
+        store = SessionStore(ttl=60, max_bytes=one * 2)
+        first = store.create('a', *_images())
+        second = store.create('b', *_images())
+        store.get(first.id)
+        store.create('c', *_images())
+        self.assertIs(store.get(first.id), first)
+        with self.assertRaises(SessionNotFound):
+            store.get(second.id)
+
+    def test_spill_round_trip_keeps_pixels_exif_and_source_size(self):
+        full, preview = _images(exif=b'Exif\x00\x00test')
+        one = full.width * full.height * 3 + preview.width * preview.height * 3
+        store = SessionStore(ttl=60, max_bytes=one, spill_dir=self.tmp)
+        spilled = store.create('a', full, preview, source_size=(400, 300))
+        store.create('b', *_images())
+        loaded = store.get(spilled.id)
+        self.assertIsNot(loaded, spilled)
+        self.assertEqual(loaded.full.tobytes(), full.tobytes())
+        self.assertEqual(loaded.preview.tobytes(), preview.tobytes())
+        self.assertEqual(loaded.full.info.get('exif'), b'Exif\x00\x00test')
+        self.assertEqual(loaded.source_size, (400, 300))
+        self.assertEqual(store.stats()['disk_hits'], 1)
+
+    def test_delete_and_invalid_ids(self):
+        store = SessionStore(ttl=60)
+        session = store.create('a', *_images())
+        self.assertTrue(store.delete(session.id))
+        self.assertFalse(store.delete(session.id))
+        for bad in ('', '../x', 'z' * 32):
+            with self.assertRaises(SessionNotFound):
+                store.get(bad)
+
+    def test_covers(self):
+        store = SessionStore(ttl=60)
+        downscaled = store.create('a', *_images(40, 30), source_size=(400, 300))
+        self.assertEqual(downscaled.max_length, 40)
+        self.assertTrue(downscaled.covers(40))
+        self.assertFalse(downscaled.covers(41))
+        # 原图本身就不大于工作图：任何 max_length 都与直接上传相同
+        small = store.create('b', *_images(40, 30), source_size=(40, 30))
+        self.assertEqual(small.max_length, 0)
+        self.assertTrue(small.covers(4000))
+
+
+class SessionEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app.config.update(STORAGE_TTL=0, STORAGE_MAX_BYTES=0)
+        cls.client = app.test_client()
+
+    def _create(self, max_length):
+        with open(SAMPLE, 'rb') as f:
+            resp = self.client.post('/api/sessions', data={'image': (f, 'P1032386.jpg'), 'max_length': max_length})
+        return resp.get_json()['data']
+
+    def _render(self, session_id, max_length):
+        control = json.dumps({'use_control_option': True, 'format': 'format_none', 'max_length': max_length})
+        return self.client.post('/api/image_upload?response=inline', data={
+            'session_id': session_id, 'control_params': control}, headers={'Accept': 'image/jpeg'})
+
+    def test_larger_max_length_is_rejected(self):
+        data = self._create(800)
+        self.assertEqual(data['full_size'], [800, 533])
+        self.assertEqual(data['source_size'], [3000, 2000])
+        self.assertEqual(data['max_length'], 800)
+
+        ok = self._render(data['session_id'], 600)
+        self.assertEqual(ok.status_code, 200)
+        self.assertEqual(ok.headers['X-Image-Width'], '600')
+
+        rejected = self._render(data['session_id'], 2400)
+        self.assertEqual(rejected.mimetype, 'application/json')
+        self.assertNotEqual(rejected.get_json()['code'], 0)
+
+        job = self.client.post('/api/jobs/image_upload', data={
+            'session_id': data['session_id'],
+            'control_params': json.dumps({'use_control_option': True, 'format': 'format_none', 'max_length': 2400}),
+        })
+        self.assertNotEqual(job.get_json()['code'], 0)
+
+    def test_get_and_delete(self):
+        session_id = self._create(600)['session_id']
+        self.assertEqual(self.client.get(f'/api/sessions/{session_id}').get_json()['data']['session_id'], session_id)
+        self.assertEqual(self.client.delete(f'/api/sessions/{session_id}').get_json()['code'], 0)
+        self.assertEqual(self.client.get(f'/api/sessions/{session_id}').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
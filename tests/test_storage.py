@@ -0,0 +1,103 @@
+"""
+temp_images 存储：分片路径、TTL / 总大小淘汰，以及清理线程只在 web 进程中启动。
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from border_extender.storage import StorageManager, shard_relpath
+
+
+def _thread_names_after_import() -> list:
+    import border_extender  # noqa: F401  与渲染子进程一样导入本包
+    return [t.name for t in threading.enumerate()]
+
+
+class StorageManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _write(self, name, size=100, age=0):
+        rel = shard_relpath(name)
+        path = os.path.join(self.root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        if age:
+            t = time.time() - age
+            os.utime(path, (t, t))
+        return rel
+
+    def test_lookup_sharded_and_legacy_files(self):
+        rel = self._write('processed_a.jpg')
+        with open(os.path.join(self.root, 'legacy.jpg'), 'wb') as f:
+            f.write(b'x')
+        storage = StorageManager(self.root, sweep_interval=0)
+        self.assertEqual(storage.resolve('processed_a.jpg'), os.path.join(self.root, rel))
+        self.assertEqual(storage.resolve(rel), os.path.join(self.root, rel))
+        self.assertEqual(storage.resolve('legacy.jpg'), os.path.join(self.root, 'legacy.jpg'))
+        for bad in ('', '../etc/passwd', 'a/../b.jpg', 'a/b/c.jpg', 'missing.jpg'):
+            self.assertIsNone(storage.resolve(bad), bad)
+
+    def test_sweep_removes_expired_files(self):
+        old = self._write('old.jpg', age=7200)
+        new = self._write('new.jpg')
+        stats = StorageManager(self.root, ttl=3600, max_bytes=0, sweep_interval=0).sweep()
+        self.assertFalse(os.path.exists(os.path.join(self.root, old)))
+        self.assertTrue(os.path.exists(os.path.join(self.root, new)))
+        self.assertEqual(stats['evicted_ttl'], 1)
+        self.assertEqual(stats['files'], 1)
+
+    def test_sweep_enforces_size_cap_lru(self):
+        rels = [self._write(f'{i}.jpg', size=100, age=100 - i * 10) for i in range(4)]
+        storage = StorageManager(self.root, ttl=0, max_bytes=250, sweep_interval=0)
+        # 最旧的文件刚被访问过，不应被淘汰
+        storage.touch(rels[0])
+        stats = storage.sweep()
+        remaining = [rel for rel in rels if os.path.exists(os.path.join(self.root, rel))]
+        self.assertEqual(remaining, [rels[0], rels[3]])
+        self.assertEqual(stats['evicted_size'], 2)
+        self.assertLessEqual(stats['bytes'], 250)
+
+    def test_sweep_keeps_fresh_tmp_files(self):
+        writing = self._write('processed_w.jpg.1a2b3c4d.tmp', size=400)
+        stale = self._write('processed_s.jpg.5e6f7a8b.tmp', size=100, age=7200)
+        done = self._write('done.jpg', size=100, age=50)
+        storage = StorageManager(self.root, ttl=0, max_bytes=250, sweep_interval=0, tmp_grace=600)
+        storage.sweep()
+        self.assertTrue(os.path.exists(os.path.join(self.root, writing)))
+        self.assertFalse(os.path.exists(os.path.join(self.root, stale)))
+        self.assertFalse(os.path.exists(os.path.join(self.root, done)))
+
+    def test_touch_keeps_mtime(self):
+        rel = self._write('keep.jpg', age=600)
+        path = os.path.join(self.root, rel)
+        before = os.stat(path).st_mtime_ns
+        StorageManager(self.root, sweep_interval=0).touch(path)
+        self.assertEqual(os.stat(path).st_mtime_ns, before)
+
+
+class SweeperProcessTest(unittest.TestCase):
+    def test_spawned_worker_does_not_start_sweeper(self):
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1) as pool:
+            names = pool.apply(_thread_names_after_import)
+        self.assertNotIn('storage-sweeper', names)
+
+    def test_web_process_starts_sweeper_on_first_request(self):
+        from border_extender import app
+        # 单例首次创建时读取配置：关闭 TTL 与总大小淘汰，测试不删除 static/temp_images 中的文件
+        app.config.update(STORAGE_TTL=0, STORAGE_MAX_BYTES=0)
+        resp = app.test_client().get('/api/storage/stats')
+        self.assertTrue(resp.get_json()['data']['sweeper_running'])
+
+
+if __name__ == '__main__':
+    unittest.main()
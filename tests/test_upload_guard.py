@@ -0,0 +1,114 @@
+"""
+上传限制：解码前按文件头检查像素预算、大文件落盘、请求体上限（user-015）。
+"""
+import json
+import os
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from border_extender import app
+from border_extender.image_io import open_rgb_reduced
+from border_extender.upload_guard import (SpooledUploadRequest, UploadRejected, probe_image, stream_size,
+                                          upload_limits)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, 'P1032386.jpg')
+
+
+def _encoded(size, fmt):
+    buf = BytesIO()
+    Image.new('RGB', size, (120, 80, 40)).save(buf, fmt)
+    buf.seek(0)
+    return buf
+
+
+class ProbeImageTest(unittest.TestCase):
+    def test_reads_header_and_restores_position(self):
+        with open(SAMPLE, 'rb') as f:
+            f.seek(0)
+            header = probe_image(f)
+            self.assertEqual(f.tell(), 0)
+        self.assertEqual((header.format, header.width, header.height, header.pixels), ('JPEG', 3000, 2000, 6_000_000))
+
+    def test_rejects_garbage(self):
+        with self.assertRaises(UploadRejected):
+            probe_image(BytesIO(b'not an image at all'))
+
+    def test_hard_limit(self):
+        with open(SAMPLE, 'rb') as f, self.assertRaises(UploadRejected):
+            probe_image(f, hard_max_pixels=1_000_000)
+
+    def test_soft_limit_only_allows_jpeg(self):
+        self.assertEqual(probe_image(_encoded((200, 200), 'JPEG'), max_pixels=10_000).format, 'JPEG')
+        with self.assertRaises(UploadRejected):
+            probe_image(_encoded((200, 200), 'PNG'), max_pixels=10_000)
+
+
+class DecodeBudgetTest(unittest.TestCase):
+    def test_jpeg_over_budget_decoded_smaller(self):
+        # 3000x2000 在 1 MP 预算内只能按 1/4 解码，即使 max_length 要求更大
+        img = open_rgb_reduced(SAMPLE, max_length=2400, max_pixels=1_000_000)
+        self.assertEqual(img.size, (750, 500))
+
+    def test_non_jpeg_over_budget_rejected(self):
+        with self.assertRaises(ValueError):
+            open_rgb_reduced(_encoded((200, 200), 'PNG'), max_pixels=10_000)
+
+
+class UploadRequestTest(unittest.TestCase):
+    def test_large_uploads_spool_to_disk(self):
+        with app.app_context():
+            req = SpooledUploadRequest.from_values()
+            threshold = app.config.get('UPLOAD_SPOOL_THRESHOLD')
+            self.assertIsInstance(req._get_file_stream(threshold, 'image/jpeg'), BytesIO)
+            spooled = req._get_file_stream(threshold + 1, 'image/jpeg')
+            self.assertNotIsInstance(spooled, BytesIO)
+            spooled.close()
+
+    def test_stream_size(self):
+        class Upload:
+            content_length = 0
+            stream = BytesIO(b'x' * 1234)
+
+        Upload.stream.seek(10)
+        self.assertEqual(stream_size(Upload), 1234)
+        self.assertEqual(Upload.stream.tell(), 10)
+
+    def test_limits_from_config(self):
+        self.assertEqual(upload_limits({'UPLOAD_MAX_PIXELS': 5, 'UPLOAD_HARD_MAX_PIXELS': 9}), (5, 9))
+
+
+class UploadLimitViewTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app.config.update(STORAGE_TTL=0, STORAGE_MAX_BYTES=0)
+        cls.client = app.test_client()
+
+    def _preview(self, **config):
+        old = {k: app.config.get(k) for k in config}
+        app.config.update(config)
+        try:
+            with open(SAMPLE, 'rb') as f:
+                return self.client.post('/api/filter_preview', data={'image': (f, 'P1032386.jpg'), 'filter': 'none'})
+        finally:
+            app.config.update(old)
+
+    def test_body_over_max_content_length(self):
+        resp = self._preview(MAX_CONTENT_LENGTH=64 * 1024)
+        self.assertEqual(resp.status_code, 413)
+        self.assertEqual(json.loads(resp.data)['code'], -1)
+
+    def test_pixels_over_hard_limit(self):
+        resp = self._preview(UPLOAD_HARD_MAX_PIXELS=1_000_000)
+        self.assertEqual(resp.mimetype, 'application/json')
+        self.assertIn('图片被拒绝', json.loads(resp.data)['errorMsg'])
+
+    def test_within_limits(self):
+        resp = self._preview(UPLOAD_MAX_PIXELS=1_000_000)
+        self.assertEqual(resp.mimetype, 'image/jpeg')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+结果图片编码档位对比：
+- 把测试图缩放到 --max-length 后，对每种可用格式（jpeg / webp / avif）与档位（fast / balanced / smallest）编码
+- 输出编码耗时（重复取最快）、输出字节数与相对原图的 PSNR；jpeg/balanced 即此前固定使用的
+  quality=80, optimize, progressive, 4:4:4 参数，可作为对照
+
+用法（在项目根目录）：
+    python -m utils.bench_encode --image P1032386.jpg --max-length 2400
+"""
+import argparse
+from io import BytesIO
+import time
+
+import numpy as np
+from PIL import Image
+
+from border_extender.encoding import ENCODE_PROFILES, OUTPUT_FORMATS, encode_image, supported_formats
+
+def psnr(a: Image.Image, data: bytes) -> float:
+    b = Image.open(BytesIO(data)).convert('RGB')
+    x = np.asarray(a, dtype=np.float64)
+    y = np.asarray(b, dtype=np.float64)
+    mse = ((x - y) ** 2).mean()
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='对比编码档位的耗时与体积')
+    parser.add_argument('--image', type=str, nargs='+', default=['P1032386.jpg'], help='测试图片路径')
+    parser.add_argument('--max-length', type=int, default=2400, help='编码前缩放到的长边')
+    parser.add_argument('--repeat', type=int, default=3, help='每个组合重复次数（取最快）')
+    parser.add_argument('--formats', type=str, nargs='+', default=None, help='只测试这些格式（默认全部可用格式）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    formats = [f for f in (args.formats or OUTPUT_FORMATS) if f in supported_formats()]
+    for path in args.image:
+        img = Image.open(path).convert('RGB')
+        img.thumbnail((args.max_length, args.max_length), Image.LANCZOS)
+        print(f'image: {path} -> {img.width}x{img.height}')
+        print(f'  {"format":<6} {"profile":<9} {"ms":>8} {"bytes":>10} {"psnr":>7}')
+
+        for fmt in formats:
+            for profile in ENCODE_PROFILES:
+                data, t = timed(lambda: encode_image(img, fmt, profile), args.repeat)
+                print(f'  {fmt:<6} {profile:<9} {t * 1000:8.1f} {len(data):10d} {psnr(img, data):7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+LUT 插值对比与计时：
+- 对同一张图分别用 trilinear / tetrahedral 插值应用 .cube LUT
+- 输出两者的 8-bit 差异（max / mean / p99）与各自耗时
+未指定 --cube 时使用 cubes/ 下的全部 .cube 文件
+
+用法（在项目根目录）：
+    python -m utils.bench_lut --image P1032386.jpg
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from border_extender.effects.lut_utils import load_cube_lut, apply_cube_lut_float_rgb, INTERPOLATIONS
+
+
+def _to_u8(arr_t: np.ndarray) -> np.ndarray:
+    return (np.clip(arr_t, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def compare_interpolations(arr_t: np.ndarray, cube_path: Path, repeat: int = 3) -> dict:
+    lut = load_cube_lut(cube_path)
+    outputs = {}
+    timings = {}
+    for mode in INTERPOLATIONS:
+        best = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = apply_cube_lut_float_rgb(arr_t, lut, mode)
+            best = min(best, time.perf_counter() - t0)
+        outputs[mode] = _to_u8(out).astype(np.int16)
+        timings[mode] = best
+
+    diff = np.abs(outputs['tetrahedral'] - outputs['trilinear'])
+    return {
+        'cube': cube_path.name,
+        'size': lut.size,
+        'max': int(diff.max()),
+        'mean': float(diff.mean()),
+        'p99': float(np.percentile(diff, 99)),
+        'timings': timings,
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='对比 trilinear 与 tetrahedral LUT 插值')
+    parser.add_argument('--image', type=str, default='P1032386.jpg', help='测试图片路径')
+    parser.add_argument('--cube', type=str, nargs='*', default=None, help='.cube 文件路径，默认 cubes/*.cube')
+    parser.add_argument('--max-length', type=int, default=2400, help='测试前将长边缩放到该尺寸')
+    parser.add_argument('--repeat', type=int, default=3, help='每种插值重复次数（取最快）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    cubes = [Path(p) for p in args.cube] if args.cube else sorted(Path('cubes').glob('*.cube'))
+    if not cubes:
+        raise SystemExit('没有找到 .cube 文件')
+
+    img = Image.open(args.image).convert('RGB')
+    img.thumbnail((args.max_length, args.max_length), Image.LANCZOS)
+    arr_t = np.asarray(img, dtype=np.float32) / 255.0
+    print(f'image: {args.image} {img.width}x{img.height}')
+
+    for cube_path in cubes:
+        res = compare_interpolations(arr_t, cube_path, repeat=args.repeat)
+        t = res['timings']
+        print(
+            f"{res['cube']:<36} n={res['size']:<3} "
+            f"diff max={res['max']} mean={res['mean']:.4f} p99={res['p99']:.1f} | "
+            f"trilinear {t['trilinear'] * 1000:.0f}ms tetrahedral {t['tetrahedral'] * 1000:.0f}ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
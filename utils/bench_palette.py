@@ -0,0 +1,75 @@
+"""
+主色提取后端对比与计时：
+- 对同一张图分别用 quantize / histogram / kmeans 提取主色
+- 输出各后端耗时、与 kmeans 参考结果的配对色差（RGB 欧氏距离），
+  以及把 256x256 缩略图映射到各自调色板后的平均重建误差（越小越能代表原图）
+
+用法（在项目根目录）：
+    python -m utils.bench_palette --image P1032386.jpg --num-colors 4
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+from PIL import Image
+
+from border_extender.color_extract import clear_palette_cache, extract_main_colors, PALETTE_BACKENDS
+
+
+def palette_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """两组颜色在最佳一一配对下的平均 RGB 距离。"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    best = float('inf')
+    for perm in itertools.permutations(range(len(b))):
+        d = np.sqrt(((a - b[list(perm)]) ** 2).sum(axis=1)).mean()
+        best = min(best, d)
+    return best
+
+
+def reconstruction_error(pixels: np.ndarray, colors: np.ndarray) -> float:
+    d2 = ((pixels[:, None, :] - np.asarray(colors, dtype=np.float64)[None, :, :]) ** 2).sum(axis=2)
+    return float(np.sqrt(d2.min(axis=1)).mean())
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='对比主色提取后端')
+    parser.add_argument('--image', type=str, nargs='+', default=['P1032386.jpg'], help='测试图片路径')
+    parser.add_argument('--num-colors', type=int, default=4, help='提取的主色数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每个后端重复次数（取最快）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    for path in args.image:
+        img = Image.open(path).convert('RGB')
+        print(f'image: {path} {img.width}x{img.height}')
+        # 预先缩放到 256x256，计时只包含各后端本身
+        img = img.resize((256, 256))
+        pixels = np.asarray(img, dtype=np.float64).reshape(-1, 3)
+
+        results = {}
+        for backend in PALETTE_BACKENDS:
+            best = float('inf')
+            for _ in range(args.repeat):
+                # 清空主色缓存，否则第 2 次起都是缓存命中，测不到后端本身
+                clear_palette_cache()
+                t0 = time.perf_counter()
+                colors = extract_main_colors(img, num_colors=args.num_colors, backend=backend)
+                best = min(best, time.perf_counter() - t0)
+            results[backend] = (colors, best)
+
+        ref = results['kmeans'][0]
+        for backend, (colors, best) in results.items():
+            print(
+                f'  {backend:<10} {best * 1000:8.1f}ms  '
+                f'vs kmeans={palette_distance(colors, ref):6.2f}  '
+                f'recon={reconstruction_error(pixels, colors):6.2f}  '
+                f'{colors.tolist()}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+竖图旋转对比：原 rotate_image_90_no_crop（对角线画布 + rotate(expand) + getbbox 裁剪）
+与当前 transpose 实现。
+- 每种实现在独立子进程中运行，用峰值 RSS（VmHWM，先经 /proc/self/clear_refs 重置）的增量衡量峰值内存
+- 输出耗时（取最快）、峰值内存增量与两者像素差异
+
+用法（在项目根目录）：
+    python -m utils.bench_rotate --image P1032386.jpg
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from border_extender.add_bd import rotate_image_90_no_crop
+
+METHODS = ('legacy', 'transpose')
+
+
+def rotate_legacy(image, reverse=False):
+    width, height = image.size
+    new_size = int((width ** 2 + height ** 2) ** 0.5)
+    new_image = Image.new("RGB", (new_size, new_size), (0, 0, 0))
+    new_image.paste(image, ((new_size - width) // 2, (new_size - height) // 2))
+    rotated_image = new_image.rotate(270 if reverse else 90, expand=True)
+    return rotated_image.crop(rotated_image.getbbox())
+
+
+def _rotate(method, img, reverse):
+    if method == 'legacy':
+        return rotate_legacy(img, reverse)
+    return rotate_image_90_no_crop(img, reverse)
+
+
+def _peak_rss_kb(reset: bool = False) -> int:
+    # 子进程会从父进程继承 ru_maxrss，Linux 上优先用可重置的 VmHWM
+    try:
+        if reset:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_one(method: str, image_path: str, repeat: int) -> dict:
+    img = Image.open(image_path).convert('RGB')
+    img.load()
+    before_kb = _peak_rss_kb(reset=True)
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        # 与 _format_basic1 一致：照片顺时针转一次，成品再逆时针转回
+        out = _rotate(method, _rotate(method, img, True), False)
+        best = min(best, time.perf_counter() - t0)
+        del out
+    after_kb = _peak_rss_kb()
+    return {'ms': best * 1000, 'peak_mb': (after_kb - before_kb) / 1024}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='对比 rotate_image_90_no_crop 新旧实现')
+    parser.add_argument('--image', type=str, default='P1032386.jpg', help='测试图片路径')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数（取最快）')
+    parser.add_argument('--child', type=str, choices=METHODS, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.child:
+        print(json.dumps(run_one(args.child, args.image, args.repeat)))
+        return
+
+    img = Image.open(args.image).convert('RGB')
+    print(f'image: {args.image} {img.width}x{img.height}')
+    for reverse in (False, True):
+        a = np.asarray(rotate_legacy(img, reverse), dtype=np.int16)
+        b = np.asarray(rotate_image_90_no_crop(img, reverse), dtype=np.int16)
+        if a.shape != b.shape:
+            print(f'  reverse={reverse}: shape legacy={a.shape} transpose={b.shape}')
+        else:
+            print(f'  reverse={reverse}: max pixel diff {int(np.abs(a - b).max())}')
+
+    for method in METHODS:
+        proc = subprocess.run(
+            [sys.executable, '-m', 'utils.bench_rotate', '--image', args.image,
+             '--repeat', str(args.repeat), '--child', method],
+            capture_output=True, text=True, check=True,
+        )
+        res = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"  {method:<10} {res['ms']:8.1f}ms per portrait render  peak +{res['peak_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
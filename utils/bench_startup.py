@@ -0,0 +1,80 @@
+"""
+冷启动导入耗时基准（python -X importtime）：
+- 在全新子进程中导入 border_extender（与 worker 启动一致），重复多次取最快
+- 输出总耗时与累计耗时最高的模块
+- 超出 --budget-ms，或冷启动时导入了 --forbid 中的重依赖（应在首次使用时再加载），返回非零退出码
+
+用法（在项目根目录）：
+    python -m utils.bench_startup --budget-ms 1500
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+_PROBE = (
+    'import json, sys, time\n'
+    't0 = time.perf_counter()\n'
+    'import {module}\n'
+    'ms = (time.perf_counter() - t0) * 1000\n'
+    'print(json.dumps({{"ms": ms, "modules": sorted(sys.modules)}}))\n'
+)
+
+
+def parse_importtime(stderr: str) -> list:
+    """解析 -X importtime 输出为 [(cumulative_us, self_us, module)]。"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cum_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(cum_us), int(self_us), name.strip()))
+    return rows
+
+
+def measure(module: str) -> tuple:
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f'导入 {module} 失败:\n{proc.stderr[-2000:]}')
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result['ms'], set(result['modules']), parse_importtime(proc.stderr)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='测量 border_extender 冷启动导入耗时')
+    parser.add_argument('--module', type=str, default='border_extender', help='要导入的模块')
+    parser.add_argument('--budget-ms', type=float, default=1500.0, help='导入耗时预算（毫秒），超出则失败')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最快）')
+    parser.add_argument('--top', type=int, default=15, help='显示累计耗时最高的模块数')
+    parser.add_argument('--forbid', type=str, nargs='*', default=['sklearn', 'numpy', 'piexif', 'pymysql'],
+                        help='冷启动时不应导入的顶层包')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    runs = [measure(args.module) for _ in range(max(1, args.repeat))]
+    best_ms, modules, rows = min(runs, key=lambda r: r[0])
+
+    print(f'import {args.module}: best {best_ms:.0f}ms of {len(runs)} (budget {args.budget_ms:.0f}ms)')
+    for cum_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f'  {cum_us / 1000:8.1f}ms cumulative {self_us / 1000:7.1f}ms self  {name}')
+
+    failed = False
+    loaded = sorted(p for p in args.forbid if p in modules)
+    if loaded:
+        print(f'FAIL: 冷启动时导入了重依赖: {", ".join(loaded)}')
+        failed = True
+    if best_ms > args.budget_ms:
+        print(f'FAIL: 导入耗时 {best_ms:.0f}ms 超出预算 {args.budget_ms:.0f}ms')
+        failed = True
+    if failed:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+将 cubes/ 下全部 .cube 编译为单个二进制 LUT 包（cubes/luts.pack）。
+load_cube_lut 会优先通过 np.memmap 读取该包；某个 .cube 修改后对应条目自动失效并回退到文本解析，
+重新执行本脚本即可刷新。
+
+用法（在项目根目录）：
+    python -m utils.build_lut_pack --cubes cubes
+"""
+import argparse
+import time
+
+from border_extender.effects.lut_utils import build_cube_pack
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='编译 .cube 文件为二进制 LUT 包')
+    parser.add_argument('--cubes', type=str, default='cubes', help='.cube 文件所在目录')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    t0 = time.perf_counter()
+    pack_path = build_cube_pack(args.cubes)
+    print(f'已生成: {pack_path} ({pack_path.stat().st_size / 1024 / 1024:.1f} MB, {time.perf_counter() - t0:.2f}s)')
+
+
+if __name__ == '__main__':
+    main()